@@ -7,10 +7,13 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 from models_denormalized import User
 from config import settings
+from utils.hashing import run_in_hash_pool
+from utils import user_cache
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -29,6 +32,16 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the bounded hashing pool - bcrypt would block the event loop"""
+    return await run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in the bounded hashing pool - bcrypt would block the event loop"""
+    return await run_in_hash_pool(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -55,17 +68,50 @@ def decode_access_token(token: str) -> dict:
         )
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get the current authenticated user"""
+# Claims that let AUTH_TRUST_TOKEN_CLAIMS build the user without a lookup
+TRUSTED_CLAIMS = ("sub", "uid", "role", "school_id")
+
+
+def user_token_claims(user: User) -> dict:
+    """JWT payload for a user"""
+    role_value = user.role.value if hasattr(user.role, "value") else user.role
+    return {
+        "sub": user.username,
+        "uid": user.id,
+        "role": role_value,
+        "school_id": user.school_id,
+        "school_name": user.school_name
+    }
+
+
+def _user_from_claims(payload: dict) -> User:
+    """Detached User built from signed token claims (no email/password fields)"""
+    return User(
+        id=payload["uid"],
+        username=payload["sub"],
+        role=payload["role"],
+        school_id=payload["school_id"],
+        school_name=payload.get("school_name"),
+        is_active=True
+    )
+
+
+async def load_user(username: str, db: AsyncSession) -> Optional[User]:
+    """User by username through the short-TTL cache"""
+    user = user_cache.get(username)
+    if user is None:
+        user = await db.scalar(select(User).filter(User.username == username))
+        if user is not None:
+            user_cache.put(user)
+    return user
+
+
+def _username_from_token(token: str) -> tuple:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
     try:
         payload = decode_access_token(token)
         username: str = payload.get("sub")
@@ -73,14 +119,45 @@ async def get_current_user(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    return username, payload, credentials_exception
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """
+    Get the current authenticated user
+    - AUTH_TRUST_TOKEN_CLAIMS: build the user from the signed claims, no database access
+      (deactivation then takes effect when the token expires)
+    - otherwise: users table through the short-TTL user cache
+    """
+    username, payload, credentials_exception = _username_from_token(token)
+    
+    if settings.AUTH_TRUST_TOKEN_CLAIMS and all(claim in payload for claim in TRUSTED_CLAIMS):
+        return _user_from_claims(payload)
     
-    user = db.query(User).filter(User.username == username).first()
+    user = await load_user(username, db)
     if user is None:
         raise credentials_exception
     
     return user
 
 
+async def get_current_db_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Current active user with all columns (email, last_login, ...), even in trust-claims mode"""
+    username, _, credentials_exception = _username_from_token(token)
+    user = await load_user(username, db)
+    if user is None:
+        raise credentials_exception
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Backfill Student.search_text and create the FULLTEXT index
+Run once after deploying full-text search (safe to re-run):
+
+    python backfill_search_text.py                 # all students
+    python backfill_search_text.py --only-missing  # rows with empty search_text
+"""
+import argparse
+from sqlalchemy import select, update, text
+from database import SessionLocal, engine
+from models_denormalized import Student
+from utils.search import SEARCH_TEXT_FIELDS, build_search_text
+
+INDEX_NAME = "ix_students_search_text"
+
+
+def ensure_fulltext_index():
+    """create_all() does not add indexes to an existing table - add the FULLTEXT index on MySQL"""
+    if engine.dialect.name != "mysql":
+        print(f"Skipping FULLTEXT index: {engine.dialect.name} uses the LIKE fallback")
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'students' AND index_name = :name"
+        ), {"name": INDEX_NAME}).scalar()
+        if exists:
+            print(f"FULLTEXT index {INDEX_NAME} already exists")
+            return
+        print(f"Creating FULLTEXT index {INDEX_NAME} (this can take a while on large tables)...")
+        conn.execute(text(f"ALTER TABLE students ADD FULLTEXT INDEX {INDEX_NAME} (search_text)"))
+        print("✅ FULLTEXT index created")
+
+
+def backfill(batch_size: int = 1000, only_missing: bool = False) -> int:
+    """Recompute search_text in id order, one executemany UPDATE and commit per batch"""
+    columns = [Student.id] + [getattr(Student, field) for field in SEARCH_TEXT_FIELDS]
+    db = SessionLocal()
+    updated = 0
+    last_id = 0
+    try:
+        while True:
+            query = select(*columns).filter(Student.id > last_id).order_by(Student.id).limit(batch_size)
+            if only_missing:
+                query = query.filter((Student.search_text == None) | (Student.search_text == ""))
+            rows = db.execute(query).all()
+            if not rows:
+                break
+            db.execute(update(Student), [
+                {"id": row.id, "search_text": build_search_text(row._asdict())} for row in rows
+            ])
+            db.commit()
+            updated += len(rows)
+            last_id = rows[-1].id
+            print(f"  {updated} students updated (last id {last_id})")
+    finally:
+        db.close()
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill students.search_text")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--only-missing", action="store_true", help="Only rows whose search_text is empty")
+    parser.add_argument("--skip-index", action="store_true", help="Do not create the FULLTEXT index")
+    args = parser.parse_args()
+
+    if not args.skip_index:
+        ensure_fulltext_index()
+    total = backfill(args.batch_size, args.only_missing)
+    print(f"✅ search_text backfilled for {total} students")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark list-endpoint serialization: ORM objects + jsonable_encoder vs column tuples + row encoders + orjson
+Seeds synthetic students and marks into a throwaway school, builds one page of
+each both ways, then removes the seeded rows. Point DATABASE_URL at a test database:
+
+    python benchmark_serialization.py --rows 1000 --repeat 10
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import date, datetime
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, insert, delete, func
+from database import SessionLocal, AsyncSessionLocal, engine, init_db, close_db
+from models_denormalized import Student, Mark
+from utils.encoders import FastJSONResponse
+from utils.pagination import paginate
+
+BENCH_SCHOOL_ID = 999998
+
+
+def seed(db, count: int, batch_size: int = 2000):
+    """Insert synthetic students and one mark per student, with most columns filled"""
+    rng = random.Random(7)
+    now = datetime.now()
+    for start in range(0, count, batch_size):
+        students, marks = [], []
+        for n in range(start, min(start + batch_size, count)):
+            students.append({
+                "school_id": BENCH_SCHOOL_ID, "school_name": "Bench School",
+                "admission_no": f"SER{n:07d}", "roll_no": f"R{n:04d}",
+                "first_name": f"First{n}", "last_name": "Last", "full_name": f"First{n} Last",
+                "gender": rng.choice(["male", "female"]), "date_of_birth": date(2012, 1 + n % 12, 1 + n % 28),
+                "email": f"s{n}@bench.example", "phone": f"98{rng.randrange(10**8):08d}",
+                "address": "42, Long Street, Near The Big Market, Some Nagar " * 3,
+                "city": "Pune", "state": "MH", "pincode": "411001",
+                "class_name": f"Grade {1 + n % 12}", "section": "A", "academic_year": "2026-2027",
+                "father_name": f"Father{n}", "mother_name": f"Mother{n}",
+                "medical_conditions": "None reported. " * 10, "behavioral_notes": "Attentive in class. " * 10,
+                "total_attendance_percentage": rng.uniform(60, 100), "current_percentage": rng.uniform(30, 100),
+                "is_active": True, "status": "active", "created_at": now,
+            })
+            marks.append({
+                "school_id": BENCH_SCHOOL_ID, "school_name": "Bench School",
+                "student_id": n + 1, "student_name": f"First{n} Last", "admission_no": f"SER{n:07d}",
+                "class_name": f"Grade {1 + n % 12}", "section": "A",
+                "exam_id": 1, "exam_name": "Term 1", "exam_type": "term",
+                "subject_id": 1, "subject_name": "Mathematics", "subject_code": "MATH",
+                "theory_marks": rng.uniform(0, 80), "practical_marks": rng.uniform(0, 20),
+                "total_marks_obtained": rng.uniform(0, 100), "max_marks": 100.0,
+                "percentage": rng.uniform(0, 100), "grade": "B", "is_absent": False, "pass_status": "pass",
+                "academic_year": "2026-2027", "entered_at": now, "custom_fields": {"moderated": False},
+            })
+        db.execute(insert(Student), students)
+        db.execute(insert(Mark), marks)
+        db.commit()
+        print(f"  seeded {min(start + batch_size, count)}/{count}")
+
+
+async def orm_page(model, rows: int) -> tuple:
+    """Previous path: ORM instances, jsonable_encoder, json.dumps"""
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        query = select(model).filter(model.school_id == BENCH_SCHOOL_ID).order_by(model.id).limit(rows + 1)
+        data = (await db.execute(query)).scalars().all()[:rows]
+        fetched = time.perf_counter()
+        body = JSONResponse(jsonable_encoder({"total": None, "next_cursor": None, "data": data})).body
+        return fetched - start, time.perf_counter() - fetched, len(body)
+
+
+async def tuple_page(model, rows: int) -> tuple:
+    """Current path: paginate() column tuples, row encoder, orjson"""
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        page = await paginate(db, select(model).filter(model.school_id == BENCH_SCHOOL_ID), model,
+                              limit=rows, include_total=False)
+        fetched = time.perf_counter()
+        body = FastJSONResponse(page).body
+        return fetched - start, time.perf_counter() - fetched, len(body)
+
+
+async def run(rows: int, repeat: int):
+    print(f"\nDatabase: {engine.dialect.name}, page size: {rows}, median of {repeat}")
+    print(f"{'endpoint':<10} {'path':<22} {'fetch ms':>9} {'serialize ms':>13} {'total ms':>9} {'bytes':>9}")
+    for name, model in (("students", Student), ("marks", Mark)):
+        for label, build in (("ORM + jsonable_encoder", orm_page), ("tuples + orjson", tuple_page)):
+            await build(model, rows)  # warm up
+            samples = [await build(model, rows) for _ in range(repeat)]
+            fetch = statistics.median(sample[0] for sample in samples) * 1000
+            serialize = statistics.median(sample[1] for sample in samples) * 1000
+            print(f"{name:<10} {label:<22} {fetch:>9.1f} {serialize:>13.1f} {fetch + serialize:>9.1f} {samples[0][2]:>9}")
+    await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List serialization benchmark")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per page (and rows seeded)")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded rows for another run")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        existing = db.execute(select(func.count()).filter(Student.school_id == BENCH_SCHOOL_ID)).scalar()
+        if existing < args.rows:
+            db.execute(delete(Student).filter(Student.school_id == BENCH_SCHOOL_ID))
+            db.execute(delete(Mark).filter(Mark.school_id == BENCH_SCHOOL_ID))
+            db.commit()
+            print(f"Seeding {args.rows} students and marks...")
+            seed(db, args.rows)
+        asyncio.run(run(args.rows, args.repeat))
+    finally:
+        if not args.keep:
+            db.execute(delete(Student).filter(Student.school_id == BENCH_SCHOOL_ID))
+            db.execute(delete(Mark).filter(Mark.school_id == BENCH_SCHOOL_ID))
+            db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
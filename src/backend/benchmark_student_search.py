@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark student search: seven-column LIKE '%x%' OR vs search_text (FULLTEXT on MySQL)
+Seeds synthetic students into a throwaway school, times both queries, then
+removes the seeded rows. Point DATABASE_URL at a test database:
+
+    python benchmark_student_search.py --students 100000 --terms john,ST012,98765
+"""
+import argparse
+import random
+import statistics
+import time
+from sqlalchemy import select, insert, delete, func, or_
+from database import SessionLocal, engine, init_db
+from models_denormalized import Student
+from utils.search import build_search_text, student_search_filter
+
+BENCH_SCHOOL_ID = 999999
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Diya", "Ananya", "Ishaan", "Saanvi", "Kabir", "John", "Mary", "Riya", "Arjun"]
+LAST_NAMES = ["Sharma", "Verma", "Reddy", "Iyer", "Khan", "Patel", "Singh", "Doe", "Smith", "Nair", "Gupta", "Das"]
+
+
+def seed(db, count: int, batch_size: int = 5000):
+    """Insert synthetic students, search_text included"""
+    rng = random.Random(42)
+    for start in range(0, count, batch_size):
+        rows = []
+        for n in range(start, min(start + batch_size, count)):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            row = {
+                "school_id": BENCH_SCHOOL_ID,
+                "admission_no": f"BENCH{n:07d}",
+                "roll_no": f"ST{n % 1000:03d}",
+                "first_name": first,
+                "last_name": last,
+                "full_name": f"{first} {last}",
+                "email": f"{first.lower()}.{last.lower()}{n}@student.school.com",
+                "phone": f"98{rng.randrange(10**8):08d}",
+            }
+            row["search_text"] = build_search_text(row)
+            rows.append(row)
+        db.execute(insert(Student), rows)
+        db.commit()
+        print(f"  seeded {min(start + batch_size, count)}/{count}")
+
+
+def like_filter(search: str):
+    """The previous ?search= implementation"""
+    return or_(
+        Student.first_name.contains(search),
+        Student.last_name.contains(search),
+        Student.full_name.contains(search),
+        Student.admission_no.contains(search),
+        Student.email.contains(search),
+        Student.phone.contains(search),
+        Student.roll_no.contains(search)
+    )
+
+
+def time_query(db, query, repeat: int) -> tuple:
+    timings = []
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = db.execute(select(func.count()).select_from(query.subquery())).scalar()
+        db.execute(query.limit(50)).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Student search benchmark")
+    parser.add_argument("--students", type=int, default=100000)
+    parser.add_argument("--terms", default="john,sharma,ST012,98765,diya patel")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded rows for another run")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        existing = db.execute(select(func.count()).filter(Student.school_id == BENCH_SCHOOL_ID)).scalar()
+        if existing < args.students:
+            db.execute(delete(Student).filter(Student.school_id == BENCH_SCHOOL_ID))
+            db.commit()
+            print(f"Seeding {args.students} students...")
+            seed(db, args.students)
+
+        dialect = engine.dialect.name
+        print(f"\nDatabase: {dialect}, students: {args.students}")
+        print(f"{'term':<14} {'LIKE ms':>9} {'rows':>7} {'search_text ms':>15} {'rows':>7}")
+        for term in [t.strip() for t in args.terms.split(",") if t.strip()]:
+            base = select(Student.id).filter(Student.school_id == BENCH_SCHOOL_ID)
+            like_ms, like_rows = time_query(db, base.filter(like_filter(term)), args.repeat)
+            search_filter, relevance = student_search_filter(term, dialect)
+            new_query = base.filter(search_filter)
+            if relevance is not None:
+                new_query = new_query.order_by(relevance.desc())
+            new_ms, new_rows = time_query(db, new_query, args.repeat)
+            print(f"{term:<14} {like_ms:>9.1f} {like_rows:>7} {new_ms:>15.1f} {new_rows:>7}")
+    finally:
+        if not args.keep:
+            db.execute(delete(Student).filter(Student.school_id == BENCH_SCHOOL_ID))
+            db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
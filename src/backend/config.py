@@ -25,6 +25,40 @@ class Settings(BaseSettings):
     # Alternative: Full database URL (for services like PlanetScale, Railway, etc.)
     DATABASE_URL: Optional[str] = None
     
+    # Connection pool (applies to both the sync and the async engine)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 3600  # seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True  # test connections on checkout (pessimistic disconnect handling)
+    
+    # Numbers reserved per worker for admission_no / roll_no / employee_id (1 = no reservation)
+    SEQUENCE_BLOCK_SIZE: int = 1
+    
+    # bcrypt runs in a bounded thread pool (~250 ms CPU per hash/verify)
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 0  # waiting calls before answering 503 (0 = unlimited)
+    
+    # Authenticated user cache (per worker); 0 disables it
+    USER_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    # Build the current user from signed token claims without any lookup
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False
+    
+    # Type-ahead index (per worker); rebuilt after this age to pick up other workers' writes
+    SUGGEST_INDEX_TTL_SECONDS: int = 300
+
+    # Denormalized copies (utils/propagation.py): rows per UPDATE/commit, and
+    # whether PUT handlers queue the work to a background worker instead of waiting
+    PROPAGATION_BATCH_SIZE: int = 1000
+    PROPAGATION_ASYNC: bool = False
+
+    # Read-through cache of schools/classes/subjects/fee structures (utils/reference_cache.py); 0 disables it
+    REFERENCE_CACHE_TTL_SECONDS: int = 300
+    REFERENCE_CACHE_MAX_ENTRIES: int = 10000
+    REFERENCE_CACHE_BACKEND: str = "memory"  # "memory" (per worker) or "redis" (shared, needs the redis package)
+    REDIS_URL: str = "redis://localhost:6379/0"
+    
     # JWT
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
     ALGORITHM: str = "HS256"
@@ -49,6 +83,19 @@ class Settings(BaseSettings):
             return self.DATABASE_URL
         return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
     
+    @property
+    def get_async_database_url(self) -> str:
+        """Get database URL for the asyncio engine - swaps the driver for its async equivalent"""
+        url = self.get_database_url
+        for sync_prefix, async_prefix in (
+            ("mysql+pymysql://", "mysql+aiomysql://"),
+            ("mysql://", "mysql+aiomysql://"),
+            ("sqlite://", "sqlite+aiosqlite://"),
+        ):
+            if url.startswith(sync_prefix):
+                return async_prefix + url[len(sync_prefix):]
+        return url
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -2,18 +2,37 @@
 Database connection and session management
 """
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
+from utils.db_metrics import InstrumentedQueuePool, InstrumentedAsyncAdaptedQueuePool
 import os
 
-# Create database engine
+# Pool sizing - tune via DB_POOL_* settings using the /metrics/db-pool endpoint
+POOL_OPTIONS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+# Create database engines
+# - engine: synchronous (PyMySQL), used by scripts such as create_admin_user.py
+# - async_engine: asyncio (aiomysql), used by the API request handlers
 try:
     engine = create_engine(
         settings.get_database_url,
-        pool_pre_ping=True,
-        pool_recycle=3600,
-        echo=settings.DEBUG
+        poolclass=InstrumentedQueuePool,
+        echo=settings.DEBUG,
+        **POOL_OPTIONS
+    )
+    async_engine = create_async_engine(
+        settings.get_async_database_url,
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        echo=settings.DEBUG,
+        **POOL_OPTIONS
     )
     print("✅ Database engine created successfully")
 except Exception as e:
@@ -21,16 +40,25 @@ except Exception as e:
     print(f"DATABASE_URL env var: {os.getenv('DATABASE_URL', 'Not set')}")
     raise
 
-# Create session factory
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# expire_on_commit=False: handlers return ORM objects after commit, and an
+# expired attribute would need a lazy (blocking) reload during serialization
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base class for models
 Base = declarative_base()
 
 
 def get_db():
     """
-    Dependency to get database session
+    Dependency to get a synchronous database session
     Usage: db: Session = Depends(get_db)
     """
     db = SessionLocal()
@@ -40,6 +68,21 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    Dependency to get an asyncio database session - does not block the event loop
+    Usage: db: AsyncSession = Depends(get_async_db)
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """Initialize database - create all tables"""
     Base.metadata.create_all(bind=engine)
+
+
+async def close_db():
+    """Dispose connection pools on shutdown"""
+    await async_engine.dispose()
+    engine.dispose()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Create indexes that were added to tables after those tables were deployed
+init_db()'s create_all() only creates missing tables - an index declared later on
+an existing table (attendance, marks, students, ...) is never added, and the
+lookups that rely on it fall back to scans. Run after deploying (safe to re-run):
+
+    python ensure_indexes.py
+
+A unique key is only created once the table holds no duplicates of it; the
+duplicate keys are listed instead so they can be cleaned up first.
+"""
+from sqlalchemy import Index, MetaData, Table, func, inspect, select
+from database import engine
+from models_denormalized import Base
+
+# (table, index or unique constraint name) declared on tables that may already exist
+ADDED_INDEXES = [
+    ("attendance", "ix_attendance_student_date_subject"),   # bulk attendance upsert key
+    ("marks", "uq_marks_student_exam_subject"),              # bulk marks upsert key
+    ("attendance", "ix_attendance_class_date"),              # /data/attendance/register range scan
+    ("marks", "ix_marks_exam_subject_total"),                # /data/marks/leaderboard subject toppers
+    ("students", "ix_students_class_teacher_id"),            # propagation of teacher edits
+    ("exam_scores", "ix_exam_scores_class_id"),              # propagation of class edits
+]
+
+# (table, index name, replaced by) of indexes dropped once their replacement exists
+REPLACED_INDEXES = [
+    ("marks", "ix_marks_student_exam_subject", "uq_marks_student_exam_subject"),
+]
+
+
+def _declared_index(table_name: str, index_name: str) -> Index:
+    """The model's Index, or a unique Index over the columns of its UniqueConstraint"""
+    table = Base.metadata.tables[table_name]
+    for index in table.indexes:
+        if index.name == index_name:
+            return index
+    constraint = next(constraint for constraint in table.constraints if constraint.name == index_name)
+    # Built on the reflected table so the model metadata is left as declared
+    existing = Table(table_name, MetaData(), autoload_with=engine)
+    return Index(index_name, *[existing.c[column.name] for column in constraint.columns], unique=True)
+
+
+def _duplicate_keys(index: Index, limit: int = 10) -> list:
+    columns = list(index.columns)
+    with engine.connect() as connection:
+        return connection.execute(
+            select(*columns, func.count()).group_by(*columns).having(func.count() > 1).limit(limit)
+        ).all()
+
+
+def ensure_indexes() -> int:
+    """Create every ADDED_INDEXES entry missing from the database, returning how many were created"""
+    inspector = inspect(engine)
+    created = 0
+    present = {}
+    for table_name, index_name in ADDED_INDEXES:
+        if not inspector.has_table(table_name):
+            continue  # init_db() creates the table with its indexes
+        if table_name not in present:
+            present[table_name] = {index["name"] for index in inspector.get_indexes(table_name)}
+            present[table_name] |= {constraint["name"] for constraint in inspector.get_unique_constraints(table_name)}
+        if index_name in present[table_name]:
+            print(f"Index {index_name} already exists")
+            continue
+        index = _declared_index(table_name, index_name)
+        if index.unique:
+            duplicates = _duplicate_keys(index)
+            if duplicates:
+                print(f"⚠ Cannot create unique index {index_name}: {table_name} has duplicate keys, e.g. {duplicates}")
+                continue
+        print(f"Creating index {index_name} on {table_name} (this can take a while on large tables)...")
+        index.create(engine)
+        present[table_name].add(index_name)
+        created += 1
+        print(f"✅ Index {index_name} created")
+
+    for table_name, index_name, replacement in REPLACED_INDEXES:
+        if index_name in present.get(table_name, ()) and replacement in present[table_name]:
+            table = Table(table_name, MetaData(), autoload_with=engine)
+            next(index for index in table.indexes if index.name == index_name).drop(engine)
+            print(f"✅ Index {index_name} dropped (replaced by {replacement})")
+    return created
+
+
+if __name__ == "__main__":
+    ensure_indexes()
@@ -1,141 +1,115 @@
 """
-Script to fetch data from MySQL database
-Fetches: students, users, schools, academic_years tables
+Script to fetch data from the database
+Fetches: schools, users, students, academic_years tables (or any --tables)
+
+Rows are streamed through a server-side cursor and written batch by batch with
+the same encoders as the /data/{entity}/export endpoints, so memory stays flat
+for attendance/marks-sized tables.
+
+    python fetch_data.py                                   # database_data.json
+    python fetch_data.py --format ndjson                   # <table>.ndjson per table
+    python fetch_data.py --format csv --tables attendance,marks
 """
-import pymysql
+import argparse
+import os
+import orjson
+from sqlalchemy import inspect, text
 from config import settings
-import json
-from datetime import date, datetime
-
-
-def json_serial(obj):
-    """JSON serializer for objects not serializable by default json code"""
-    if isinstance(obj, (datetime, date)):
-        return obj.isoformat()
-    raise TypeError(f"Type {type(obj)} not serializable")
-
-
-def get_db_connection():
-    """Create MySQL database connection"""
-    return pymysql.connect(
-        host=settings.DB_HOST,
-        port=settings.DB_PORT,
-        user=settings.DB_USER,
-        password=settings.DB_PASSWORD,
-        database=settings.DB_NAME,
-        cursorclass=pymysql.cursors.DictCursor
-    )
-
-
-def fetch_schools():
-    """Fetch all schools from database"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cursor:
-            sql = "SELECT * FROM schools"
-            cursor.execute(sql)
-            result = cursor.fetchall()
-            return result
-    finally:
-        conn.close()
-
-
-def fetch_users():
-    """Fetch all users from database"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cursor:
-            sql = "SELECT * FROM users"
-            cursor.execute(sql)
-            result = cursor.fetchall()
-            return result
-    finally:
-        conn.close()
-
-
-def fetch_students():
-    """Fetch all students from database"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cursor:
-            sql = "SELECT * FROM students"
-            cursor.execute(sql)
-            result = cursor.fetchall()
-            return result
-    finally:
-        conn.close()
-
-
-def fetch_academic_years():
-    """Fetch all academic years from database"""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cursor:
-            sql = "SELECT * FROM academic_years"
-            cursor.execute(sql)
-            result = cursor.fetchall()
-            return result
-    finally:
-        conn.close()
-
-
-def fetch_all_data():
-    """Fetch all required data from database"""
+from database import engine
+from utils.encoders import row_encoder
+from utils.export import EXPORT_BATCH_SIZE, csv_header, encode_batch
+
+DEFAULT_TABLES = ("schools", "users", "students", "academic_years")
+
+
+def stream_table(table: str, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield (column names, rows) batches of a whole table via a server-side cursor"""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            text(f"SELECT * FROM {table}")
+        )
+        keys = tuple(result.keys())
+        for rows in result.partitions():
+            yield keys, rows
+
+
+def write_table(table: str, fmt: str, output_dir: str) -> int:
+    """Write one table to <table>.ndjson or <table>.csv, returning the row count"""
+    count = 0
+    with open(os.path.join(output_dir, f"{table}.{fmt}"), "wb") as f:
+        header_written = False
+        for keys, rows in stream_table(table):
+            if fmt == "csv" and not header_written:
+                f.write(csv_header(keys))
+                header_written = True
+            f.write(encode_batch(keys, rows, fmt))
+            count += len(rows)
+    return count
+
+
+def write_json(tables, filename: str) -> dict:
+    """Write {"table": [rows...], ...} to one JSON file, one row per line"""
+    counts = {}
+    with open(filename, "wb") as f:
+        f.write(b"{")
+        for position, table in enumerate(tables):
+            f.write(b"," if position else b"")
+            f.write(b"\n  " + orjson.dumps(table) + b": [")
+            count = 0
+            for keys, rows in stream_table(table):
+                encode = row_encoder(keys)
+                for row in rows:
+                    f.write(b"," if count else b"")
+                    f.write(b"\n    " + orjson.dumps(encode(row)))
+                    count += 1
+            f.write(b"\n  ]" if count else b"]")
+            counts[table] = count
+        f.write(b"\n}\n")
+    return counts
+
+
+def fetch_all_data(tables, fmt: str = "json", output: str = "database_data.json") -> dict:
+    """Export the given tables, returning {table: row count}"""
     print("Connecting to database...")
     print(f"Database: {settings.DB_NAME}")
     print(f"Host: {settings.DB_HOST}")
     print(f"User: {settings.DB_USER}")
     print("-" * 50)
-    
-    try:
-        schools = fetch_schools()
-        print(f"✓ Fetched {len(schools)} schools")
-        
-        users = fetch_users()
-        print(f"✓ Fetched {len(users)} users")
-        
-        students = fetch_students()
-        print(f"✓ Fetched {len(students)} students")
-        
-        academic_years = fetch_academic_years()
-        print(f"✓ Fetched {len(academic_years)} academic years")
-        
-        print("-" * 50)
-        print("Data fetch complete!")
-        
-        return {
-            "schools": schools,
-            "users": users,
-            "students": students,
-            "academic_years": academic_years
-        }
-    except Exception as e:
-        print(f"Error fetching data: {str(e)}")
-        return None
-
-
-def save_to_json(data, filename="database_data.json"):
-    """Save fetched data to JSON file"""
-    if data:
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=2, default=json_serial)
-        print(f"Data saved to {filename}")
+
+    existing = set(inspect(engine).get_table_names())
+    missing = [table for table in tables if table not in existing]
+    for table in missing:
+        print(f"✗ Table {table} does not exist - skipped")
+    tables = [table for table in tables if table in existing]
+
+    if fmt == "json":
+        counts = write_json(tables, output)
+        print(f"Data saved to {output}")
+    else:
+        output_dir = output if os.path.isdir(output) else "."
+        counts = {table: write_table(table, fmt, output_dir) for table in tables}
+    for table, count in counts.items():
+        print(f"✓ Fetched {count} {table}")
+
+    print("-" * 50)
+    print("Data fetch complete!")
+    return counts
 
 
 if __name__ == "__main__":
-    # Fetch all data
-    data = fetch_all_data()
-    
-    if data:
-        # Save to JSON file
-        save_to_json(data)
-        
-        # Print summary
-        print("\n" + "=" * 50)
-        print("DATA SUMMARY")
-        print("=" * 50)
-        print(f"Schools: {len(data['schools'])}")
-        print(f"Users: {len(data['users'])}")
-        print(f"Students: {len(data['students'])}")
-        print(f"Academic Years: {len(data['academic_years'])}")
-        print("=" * 50)
+    parser = argparse.ArgumentParser(description="Export database tables")
+    parser.add_argument("--tables", default=",".join(DEFAULT_TABLES), help="Comma-separated table names")
+    parser.add_argument("--format", choices=("json", "ndjson", "csv"), default="json")
+    parser.add_argument("--output", default="database_data.json",
+                        help="JSON file name, or the directory for ndjson/csv files")
+    args = parser.parse_args()
+
+    counts = fetch_all_data([t.strip() for t in args.tables.split(",") if t.strip()], args.format, args.output)
+
+    # Print summary
+    print("\n" + "=" * 50)
+    print("DATA SUMMARY")
+    print("=" * 50)
+    for table, count in counts.items():
+        print(f"{table}: {count}")
+    print("=" * 50)
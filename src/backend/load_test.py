@@ -0,0 +1,120 @@
+"""
+Concurrent-request load test for the API
+Measures throughput (req/s) and latency percentiles at increasing concurrency.
+
+Run it against a build before and after a change with the same arguments, e.g.:
+
+    python load_test.py --username admin --password secret \
+        --path /data/students?limit=50 --concurrency 1,8,32 --requests 400
+
+Login throughput (bcrypt verification per worker) is measured with --login,
+which POSTs the credentials to /auth/login-json for every request:
+
+    python load_test.py --username admin --password secret --login --concurrency 1,4,16
+
+Uses only the standard library so it can run from any machine.
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_BASE_URL = "http://localhost:8000/api/v1"
+
+
+def login(base_url: str, username: str, password: str) -> str:
+    """Login via /auth/login-json and return the bearer token"""
+    body = json.dumps({"username": username, "password": password}).encode()
+    request = urllib.request.Request(
+        f"{base_url}/auth/login-json",
+        data=body,
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())["access_token"]
+
+
+def timed_get(url: str, headers: dict, body: bytes = None) -> tuple:
+    """Perform one GET (or POST when body is given) and return (status, seconds)"""
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST" if body else "GET")
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except urllib.error.URLError:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_level(url: str, headers: dict, concurrency: int, total_requests: int, body: bytes = None) -> dict:
+    """Fire total_requests requests with the given number of concurrent workers"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: timed_get(url, headers, body), range(total_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [seconds for status, seconds in results if 200 <= status < 300]
+    errors = len(results) - len(latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-request load test")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--path", default="/data/students?limit=50", help="Endpoint path under the base URL")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--token", help="Bearer token (skips login)")
+    parser.add_argument("--login", action="store_true", help="Benchmark /auth/login-json itself instead of --path")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    args = parser.parse_args()
+
+    body = None
+    if args.login:
+        url = f"{args.base_url}/auth/login-json"
+        body = json.dumps({"username": args.username, "password": args.password or ""}).encode()
+        headers = {"Content-Type": "application/json"}
+    else:
+        token = args.token
+        if not token and args.username:
+            token = login(args.base_url, args.username, args.password or "")
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        url = args.base_url + args.path
+
+    print(f"Target: {url}")
+    print(f"{'conc':>5} {'req/s':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for level in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        result = run_level(url, headers, level, args.requests, body)
+        print(
+            f"{result['concurrency']:>5} {result['throughput_rps']:>9} {result['mean_ms']:>9} "
+            f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9} {result['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from config import settings
 import uvicorn
-from database import init_db
+from database import init_db, close_db
+from utils.hashing import shutdown_pools
+from utils.encoders import FastJSONResponse
+from utils import propagation
 
 # Import routers
-from routers import auth, students_denormalized, teachers_denormalized, classes_denormalized, exams_denormalized, transport_denormalized, schools, users
+from routers import auth, students_denormalized, teachers_denormalized, classes_denormalized, exams_denormalized, transport_denormalized, schools, users, metrics
 from routers.all_denormalized_routers import attendance_router, subjects_router, marks_router, fee_payments_router, fee_structure_router, timetable_router
 from test_auth import test_router
 
@@ -21,6 +24,7 @@ app = FastAPI(
     version=settings.API_VERSION,
     docs_url="/api/docs",
     redoc_url="/api/redoc",
+    default_response_class=FastJSONResponse,
 )
 
 # Configure CORS
@@ -73,6 +77,9 @@ app.include_router(fee_payments_router, prefix=API_PREFIX)
 app.include_router(timetable_router, prefix=API_PREFIX)
 app.include_router(transport_denormalized.router, prefix=API_PREFIX)
 
+# Operational endpoints (not versioned, like /health)
+app.include_router(metrics.router)
+
 
 # Exception handlers
 @app.exception_handler(Exception)
@@ -101,6 +108,10 @@ async def startup_event():
         print("Database tables initialized successfully")
     except Exception as e:
         print(f"Error initializing database: {e}")
+    
+    # Denormalized copies are rewritten in the background instead of inside PUT requests
+    if settings.PROPAGATION_ASYNC:
+        propagation.worker.start()
 
 
 # Shutdown event
@@ -108,6 +119,9 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     print(f"Shutting down {settings.APP_NAME}")
+    await propagation.worker.stop()
+    await close_db()
+    shutdown_pools()
 
 
 # Run the application
@@ -2,7 +2,7 @@
 Denormalized SQLAlchemy Models - Single Table Design
 All related data stored in one table, use API filters instead of JOINs
 """
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text, Enum, Time, JSON
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text, Enum, Time, JSON, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from database import Base
 import enum
@@ -26,6 +26,10 @@ class Student(Base):
     Use API filters to query specific subsets
     """
     __tablename__ = "students"
+    __table_args__ = (
+        # MATCH ... AGAINST index for ?search= (see utils/search.py)
+        Index("ix_students_search_text", "search_text", mysql_prefix="FULLTEXT"),
+    )
     
     # Primary Key
     id = Column(Integer, primary_key=True, index=True)
@@ -76,7 +80,7 @@ class Student(Base):
     academic_year = Column(String(20), index=True)
     
     # Class Teacher Details (Denormalized)
-    class_teacher_id = Column(Integer)
+    class_teacher_id = Column(Integer, index=True)
     class_teacher_name = Column(String(200))
     class_teacher_phone = Column(String(20))
     class_teacher_email = Column(String(100))
@@ -123,7 +127,7 @@ class Student(Base):
     transport_fee = Column(Float)
     
     # ==================== ACADEMIC PERFORMANCE ====================
-    current_grade = Column(String(10))  # A+, A, B+, etc.
+    current_grade = Column(String(10))  # CBSE A1, A2, B1, ... E
     current_percentage = Column(Float)
     current_rank = Column(Integer)
     total_attendance_percentage = Column(Float, index=True)
@@ -541,6 +545,12 @@ class Subject(Base):
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        # Natural key used by the bulk upsert (one row per student per day per subject)
+        Index("ix_attendance_student_date_subject", "student_id", "date", "subject_id"),
+        # Range scan behind the class register (/data/attendance/register)
+        Index("ix_attendance_class_date", "class_id", "date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, index=True)
     school_name = Column(String(200), index=True)
@@ -571,6 +581,12 @@ class Attendance(Base):
 
 class Mark(Base):
     __tablename__ = "marks"
+    __table_args__ = (
+        # Natural key used by the bulk upsert (one row per student per exam per subject)
+        UniqueConstraint("student_id", "exam_id", "subject_id", name="uq_marks_student_exam_subject"),
+        # Subject toppers (/data/marks/leaderboard?subject_id=)
+        Index("ix_marks_exam_subject_total", "exam_id", "subject_id", "total_marks_obtained"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, index=True)
     school_name = Column(String(200), index=True)
@@ -691,4 +707,79 @@ class Timetable(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
-    custom_fields = Column(JSON)
\ No newline at end of file
+    custom_fields = Column(JSON)
+
+# ==================== ATTENDANCE ROLLUPS ====================
+
+class AttendanceRollup(Base):
+    """
+    Per-student monthly attendance counts (utils/attendance_rollups.py)
+    One row per (student_id, academic_year, month), kept current by the attendance
+    handlers; /data/attendance/summary reads only this table.
+    """
+    __tablename__ = "attendance_rollups"
+    __table_args__ = (
+        UniqueConstraint("student_id", "academic_year", "month", name="uq_attendance_rollups_student_year_month"),
+        Index("ix_attendance_rollups_class_year_month", "class_id", "academic_year", "month"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    school_id = Column(Integer, index=True)
+    student_id = Column(Integer, nullable=False)
+    student_name = Column(String(200))
+    class_id = Column(Integer)
+    academic_year = Column(String(20), nullable=False, default="")  # "" when the records had none
+    month = Column(Integer, nullable=False)
+    present = Column(Integer, nullable=False, default=0)
+    absent = Column(Integer, nullable=False, default=0)
+    late = Column(Integer, nullable=False, default=0)
+    half_day = Column(Integer, nullable=False, default=0)
+    on_leave = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+# ==================== EXAM SCORES (LEADERBOARDS) ====================
+
+class ExamScore(Base):
+    """
+    Per-student exam totals across subjects (utils/leaderboard.py)
+    One row per (exam_id, student_id), kept current by the marks handlers; the
+    leaderboard reads the top rows straight off the (exam_id, ..., percentage) indexes.
+    """
+    __tablename__ = "exam_scores"
+    __table_args__ = (
+        UniqueConstraint("exam_id", "student_id", name="uq_exam_scores_exam_student"),
+        Index("ix_exam_scores_exam_percentage", "exam_id", "percentage"),
+        Index("ix_exam_scores_exam_class_name_percentage", "exam_id", "class_name", "percentage"),
+        Index("ix_exam_scores_exam_class_percentage", "exam_id", "class_id", "percentage"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    school_id = Column(Integer, index=True)
+    exam_id = Column(Integer, nullable=False)
+    student_id = Column(Integer, nullable=False, index=True)
+    student_name = Column(String(200))
+    roll_no = Column(String(50))
+    class_id = Column(Integer, index=True)  # propagation of class edits
+    class_name = Column(String(100))
+    section = Column(String(10))
+    total_obtained = Column(Float, nullable=False, default=0)
+    total_max_marks = Column(Float, nullable=False, default=0)
+    papers = Column(Integer, nullable=False, default=0)       # mark rows counted
+    papers_sat = Column(Integer, nullable=False, default=0)   # of which not absent
+    percentage = Column(Float)                                # NULL when absent from every paper
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+# ==================== SEQUENCES (ID ALLOCATION) ====================
+
+class Sequence(Base):
+    """
+    Per-school counters for human-readable numbers (admission_no, roll_no, ...)
+    One row per (school_id, name); value is the last number handed out.
+    """
+    __tablename__ = "sequences"
+    __table_args__ = (
+        UniqueConstraint("school_id", "name", name="uq_sequences_school_name"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    school_id = Column(Integer, nullable=False, default=0)  # 0 = not school specific
+    name = Column(String(100), nullable=False)  # e.g. "admission_no:2026", "roll_no:ST"
+    value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Rebuild attendance_rollups from the raw attendance rows
+Run once after deploying rollups, and whenever counts may have drifted (e.g.
+rows changed directly in the database). Also refreshes
+Student.total_attendance_percentage:
+
+    python rebuild_attendance_rollups.py                # all schools
+    python rebuild_attendance_rollups.py --school-id 1
+"""
+import argparse
+from sqlalchemy import func, select
+from database import engine, init_db
+from models_denormalized import AttendanceRollup
+from utils.attendance_rollups import rebuild_statements
+
+
+def rebuild(school_id=None) -> int:
+    """Replace the rollups in one transaction, returning the number of rollup rows"""
+    with engine.begin() as conn:
+        for statement in rebuild_statements(school_id):
+            conn.execute(statement)
+        query = select(func.count(AttendanceRollup.id))
+        if school_id is not None:
+            query = query.filter(AttendanceRollup.school_id == school_id)
+        return conn.execute(query).scalar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild attendance rollups")
+    parser.add_argument("--school-id", type=int, default=None)
+    args = parser.parse_args()
+
+    init_db()  # creates attendance_rollups on first run
+    count = rebuild(args.school_id)
+    print(f"✅ {count} attendance rollups rebuilt")
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Rebuild exam_scores (the marks leaderboards) from the marks
+Run once after deploying leaderboards, and whenever totals may have drifted
+(e.g. marks changed directly in the database):
+
+    python rebuild_leaderboards.py               # all exams
+    python rebuild_leaderboards.py --exam-id 7
+"""
+import argparse
+from sqlalchemy import func, select
+from database import engine, init_db
+from models_denormalized import ExamScore
+from utils.leaderboard import rebuild_statements
+
+
+def rebuild(exam_id=None) -> int:
+    """Replace the exam scores in one transaction, returning the number of rows"""
+    with engine.begin() as conn:
+        for statement in rebuild_statements(exam_id):
+            conn.execute(statement)
+        query = select(func.count(ExamScore.id))
+        if exam_id is not None:
+            query = query.filter(ExamScore.exam_id == exam_id)
+        return conn.execute(query).scalar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild exam leaderboards")
+    parser.add_argument("--exam-id", type=int, default=None)
+    args = parser.parse_args()
+
+    init_db()  # creates exam_scores on first run
+    count = rebuild(args.exam_id)
+    print(f"✅ {count} exam scores rebuilt")
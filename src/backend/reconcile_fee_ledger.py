@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Recompute the students' fee balance fields from fee_structures and fee_payments
+The payment handlers keep them current (utils/fee_ledger.py); run this after
+deploying the ledger or when paid amounts / balances were edited by hand. A
+student's own total_annual_fee is kept; --recompute-totals replaces every total
+with the fee structures sum (after fee structures change). One grouped SELECT per
+school, then batched UPDATEs by primary key:
+
+    python reconcile_fee_ledger.py                  # every school
+    python reconcile_fee_ledger.py --school-id 1
+    python reconcile_fee_ledger.py --school-id 1 --recompute-totals
+"""
+import argparse
+from sqlalchemy import select, update
+from database import SessionLocal
+from models_denormalized import School, Student
+from utils.fee_ledger import reconcile_query, reconcile_values
+
+
+def reconcile(school_id: int, batch_size: int = 1000, recompute_totals: bool = False) -> int:
+    """Rewrite the balance fields of every student of a school, returning the number of students"""
+    db = SessionLocal()
+    try:
+        values = reconcile_values(db.execute(reconcile_query(school_id, recompute_totals)).all())
+        for start in range(0, len(values), batch_size):
+            db.execute(update(Student), values[start:start + batch_size])
+        db.commit()
+        return len(values)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile student fee balances")
+    parser.add_argument("--school-id", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--recompute-totals", action="store_true",
+                        help="ignore stored total_annual_fee and use the fee structures sum")
+    args = parser.parse_args()
+
+    if args.school_id:
+        school_ids = [args.school_id]
+    else:
+        db = SessionLocal()
+        school_ids = db.execute(select(School.id).order_by(School.id)).scalars().all()
+        db.close()
+    for school_id in school_ids:
+        count = reconcile(school_id, args.batch_size, args.recompute_totals)
+        print(f"✅ School {school_id}: {count} student balances reconciled")
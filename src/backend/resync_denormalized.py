@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Recompute denormalized copies from their sources (utils/propagation.COPIES)
+Repairs copies that drifted, e.g. edits made before propagation existed or jobs
+lost when a worker stopped with PROPAGATION_ASYNC queued work. Each copy is
+rewritten by one correlated UPDATE per id range, committed per batch:
+
+    python resync_denormalized.py                       # every copy
+    python resync_denormalized.py --sources classes,teachers
+"""
+import argparse
+from sqlalchemy import func, select
+from database import SessionLocal
+from ensure_indexes import ensure_indexes
+from utils.propagation import COPIES, resync_statement
+
+
+def resync(sources=None, batch_size: int = 5000) -> dict:
+    """Rewrite every copy of the given source tables, returning rows matched per (source, target)"""
+    counts = {}
+    db = SessionLocal()
+    try:
+        for source, copies in COPIES.items():
+            if sources and source.__tablename__ not in sources:
+                continue
+            for copy in copies:
+                target = copy.target
+                first, last = db.execute(select(func.min(target.id), func.max(target.id))).one()
+                matched = 0
+                for start in range(first or 0, (last or 0) + 1, batch_size):
+                    matched += db.execute(resync_statement(source, copy, start, start + batch_size - 1)).rowcount
+                    db.commit()
+                label = f"{source.__tablename__} -> {target.__tablename__}.{copy.key}"
+                counts[label] = matched
+                print(f"✓ {label}: {matched} rows")
+    finally:
+        db.close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute denormalized copies from their sources")
+    parser.add_argument("--sources", default="", help="Comma-separated source tables (default: all)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    ensure_indexes()  # the copy keys' indexes on tables deployed before they existed
+    resync({name.strip() for name in args.sources.split(",") if name.strip()}, args.batch_size)
+    print("Resync complete!")
@@ -2,14 +2,30 @@
 Complete Denormalized Routers for ALL Entities
 Subjects, Attendance, Marks, Fee Payments - All with advanced filtering
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, or_, and_, func
+from sqlalchemy.exc import IntegrityError
 from typing import Optional, List
 from datetime import date, datetime
-from database import get_db
-from models_denormalized import Subject, Attendance, Mark, FeeStructure, FeePayment, Timetable, School, Class, Teacher
-from auth import get_current_active_user, get_password_hash
+from database import get_async_db
+from models_denormalized import Subject, Attendance, Mark, FeeStructure, FeePayment, Timetable, School, Class, Teacher, Student, Exam, AttendanceRollup
+from schemas import AttendanceBulkCreate, MarkBulkCreate
+from utils.grading import compute_results, pass_percentage
+from utils.pagination import paginate
+from utils.projection import fields_param
+from utils.encoders import json_response
+from utils.export import export_response
+from utils.etag import conditional_json
+from utils.enrichment import Lookup
+from utils import propagation
+from utils.reference_cache import reference_cache
+from utils.attendance_rollups import RollupChanges, ROLLUP_STATUSES, percentage_column
+from utils.attendance_register import build_register
+from utils.report_cards import CCE_SETS, generate_report_cards
+from utils.leaderboard import ScoreChanges, dense_ranks, exam_leaderboard_query, subject_leaderboard_query
+from utils.fee_ledger import LedgerChanges
+from auth import get_current_active_user
 
 
 # ==================== SUBJECTS ROUTER ====================
@@ -17,11 +33,7 @@ from auth import get_current_active_user, get_password_hash
 subjects_router = APIRouter(prefix="/data/subjects", tags=["Subjects (Denormalized)"])
 
 
-@subjects_router.get("/")
-@subjects_router.get("")
-async def get_subjects(
-    skip: int = 0,
-    limit: int = 100,
+async def subject_filters(
     school_id: Optional[int] = None,
     class_id: Optional[int] = None,
     class_name: Optional[str] = None,
@@ -29,11 +41,10 @@ async def get_subjects(
     teacher_name: Optional[str] = None,
     subject_type: Optional[str] = None,
     academic_year: Optional[str] = None,
-    search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    search: Optional[str] = None
 ):
-    """Get subjects with filters"""
-    query = db.query(Subject)
+    """Filtered select(Subject) - the query parameters shared by the list and export endpoints"""
+    query = select(Subject)
     
     if school_id:
         query = query.filter(Subject.school_id == school_id)
@@ -59,52 +70,93 @@ async def get_subjects(
             )
         )
     
-    total = query.count()
-    subjects = query.offset(skip).limit(limit).all()
-    
-    return {"total": total, "data": subjects}
+    return query
+
+
+@subjects_router.get("/")
+@subjects_router.get("")
+async def get_subjects(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(subject_filters),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get subjects with filters"""
+    return json_response(await paginate(db, query, Subject, skip=skip, limit=limit, cursor=cursor, include_total=include_total, fields=fields))
+
+
+@subjects_router.get("/export")
+async def export_subjects(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(subject_filters),
+    current_user = Depends(get_current_active_user)
+):
+    """Stream every subject matching the list filters as NDJSON or CSV (server-side cursor)"""
+    return export_response(query, Subject, format, fields, "subjects")
+
+
+@subjects_router.get("/{subject_id}")
+async def get_subject(
+    subject_id: int,
+    fields: Optional[List[str]] = Depends(fields_param),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get single subject (read-through cache)"""
+    subject = await reference_cache.get_fields(db, Subject, subject_id, fields)
+    if not subject:
+        raise HTTPException(status_code=404, detail="Subject not found")
+    return json_response(subject)
 
 
 @subjects_router.post("/")
-async def create_subject(subject_data: dict, db: Session = Depends(get_db)):
+async def create_subject(subject_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Create subject with all data in single request"""
     subject = Subject(**subject_data)
     db.add(subject)
-    db.commit()
-    db.refresh(subject)
+    await db.commit()
+    await db.refresh(subject)
     return subject
 
 
 @subjects_router.put("/{subject_id}")
-async def update_subject(subject_id: int, update_data: dict, db: Session = Depends(get_db)):
+async def update_subject(subject_id: int, update_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Update subject - any field"""
-    subject = db.query(Subject).filter(Subject.id == subject_id).first()
+    subject = await db.get(Subject, subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
+    before = propagation.snapshot(subject)
     
     for field, value in update_data.items():
         if hasattr(subject, field):
             setattr(subject, field, value)
     
-    db.commit()
-    db.refresh(subject)
+    await db.commit()
+    await db.refresh(subject)
+    await reference_cache.invalidate(Subject, subject_id)
+    await propagation.propagate_changes(subject, before)
     return subject
 
 
 @subjects_router.delete("/{subject_id}")
-async def delete_subject(subject_id: int, hard_delete: bool = False, db: Session = Depends(get_db)):
+async def delete_subject(subject_id: int, hard_delete: bool = False, db: AsyncSession = Depends(get_async_db)):
     """Delete subject - soft delete by default, hard delete if hard_delete=true"""
-    subject = db.query(Subject).filter(Subject.id == subject_id).first()
+    subject = await db.get(Subject, subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
     
     if hard_delete:
-        db.delete(subject)
-        db.commit()
+        await db.delete(subject)
+        await db.commit()
+        await reference_cache.invalidate(Subject, subject_id)
         return {"message": "Subject permanently deleted"}
     else:
         subject.is_active = False
-        db.commit()
+        await db.commit()
+        await reference_cache.invalidate(Subject, subject_id)
         return {"message": "Subject soft deleted"}
 
 
@@ -113,11 +165,7 @@ async def delete_subject(subject_id: int, hard_delete: bool = False, db: Session
 attendance_router = APIRouter(prefix="/data/attendance", tags=["Attendance (Denormalized)"])
 
 
-@attendance_router.get("/")
-@attendance_router.get("")
-async def get_attendance(
-    skip: int = 0,
-    limit: int = 100,
+async def attendance_filters(
     school_id: Optional[int] = None,
     student_id: Optional[int] = None,
     student_name: Optional[str] = None,
@@ -128,11 +176,10 @@ async def get_attendance(
     status: Optional[str] = None,
     academic_year: Optional[str] = None,
     month: Optional[int] = None,
-    subject_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    subject_id: Optional[int] = None
 ):
-    """Get attendance with filters"""
-    query = db.query(Attendance)
+    """Filtered select(Attendance) - the query parameters shared by the list and export endpoints"""
+    query = select(Attendance)
     
     if school_id:
         query = query.filter(Attendance.school_id == school_id)
@@ -157,52 +204,317 @@ async def get_attendance(
     if subject_id:
         query = query.filter(Attendance.subject_id == subject_id)
     
-    total = query.count()
-    attendance = query.offset(skip).limit(limit).all()
+    return query
+
+
+@attendance_router.get("/")
+@attendance_router.get("")
+async def get_attendance(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(attendance_filters),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get attendance with filters"""
+    return json_response(await paginate(db, query, Attendance, skip=skip, limit=limit, cursor=cursor, include_total=include_total, fields=fields))
+
+
+@attendance_router.get("/export")
+async def export_attendance(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(attendance_filters),
+    current_user = Depends(get_current_active_user)
+):
+    """Stream every attendance record matching the list filters as NDJSON or CSV (server-side cursor)"""
+    return export_response(query, Attendance, format, fields, "attendance")
+
+
+ROLLUP_GROUP_BY_FIELDS = ("student_id", "class_id", "academic_year", "month")
+
+
+def _rollup_summary_row(row) -> dict:
+    """Counts and percentage of one aggregate rollup row"""
+    counts = {status: int(getattr(row, status)) for status in ROLLUP_STATUSES}
+    return {**counts, "percentage": float(row.percentage) if row.percentage is not None else None}
+
+
+@attendance_router.get("/summary")
+async def get_attendance_summary(
+    request: Request,
+    school_id: Optional[int] = None,
+    class_id: Optional[int] = None,
+    student_id: Optional[int] = None,
+    academic_year: Optional[str] = None,
+    month: Optional[int] = None,
+    group_by: str = Query("student_id", description="Comma-separated: student_id, class_id, academic_year, month"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Attendance counts and percentage from attendance_rollups - raw attendance rows are not read
+
+    Examples:
+    - Class register for a month: ?class_id=3&academic_year=2026-2027&month=9
+    - One student's months: ?student_id=42&academic_year=2026-2027&group_by=month
+    - Per class for a school: ?school_id=1&group_by=class_id
+    """
+    group_fields = [f.strip() for f in group_by.split(',') if f.strip()]
+    invalid = [f for f in group_fields if f not in ROLLUP_GROUP_BY_FIELDS]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid group_by field(s): {', '.join(invalid)}. Allowed: {', '.join(ROLLUP_GROUP_BY_FIELDS)}"
+        )
+    group_columns = [getattr(AttendanceRollup, f) for f in group_fields]
+    if "student_id" in group_fields:
+        group_columns.append(func.max(AttendanceRollup.student_name).label("student_name"))
+    
+    aggregates = [func.coalesce(func.sum(getattr(AttendanceRollup, status)), 0).label(status) for status in ROLLUP_STATUSES]
+    filters = []
+    if school_id:
+        filters.append(AttendanceRollup.school_id == school_id)
+    if class_id:
+        filters.append(AttendanceRollup.class_id == class_id)
+    if student_id:
+        filters.append(AttendanceRollup.student_id == student_id)
+    if academic_year:
+        filters.append(AttendanceRollup.academic_year == academic_year)
+    if month:
+        filters.append(AttendanceRollup.month == month)
+    
+    totals = (await db.execute(select(*aggregates, percentage_column().label("percentage")).filter(*filters))).one()
+    groups = []
+    if group_fields:
+        keys = [getattr(AttendanceRollup, f) for f in group_fields]
+        rows = (await db.execute(
+            select(*group_columns, *aggregates, percentage_column().label("percentage"))
+            .filter(*filters).group_by(*keys).order_by(*keys)
+        )).all()
+        groups = [
+            {
+                **{field: getattr(row, field) for field in group_fields},
+                **({"student_name": row.student_name} if "student_id" in group_fields else {}),
+                **_rollup_summary_row(row)
+            }
+            for row in rows
+        ]
+    return conditional_json(request, {"group_by": group_fields, "totals": _rollup_summary_row(totals), "groups": groups})
+
+
+REGISTER_MAX_DAYS = 92
+
+
+@attendance_router.get("/register")
+async def get_attendance_register(
+    request: Request,
+    class_id: int,
+    date_from: date,
+    date_to: date,
+    subject_id: Optional[int] = Query(None, description="Period-wise register for one subject; default is day-level attendance"),
+    encoding: str = Query("ints", regex="^(ints|rle)$", description="ints (small-int arrays) or rle (run-length strings)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Attendance of one class as a student x day matrix (one range scan on class_id, date)
+
+    Example: ?class_id=3&date_from=2026-09-01&date_to=2026-09-30
+    Returns students, dates, the statuses legend and matrix[student][day] = status code
+    (0 = not marked). Students without any record in the range are not listed.
+    """
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to must not be before date_from")
+    if (date_to - date_from).days >= REGISTER_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Register range is limited to {REGISTER_MAX_DAYS} days")
     
-    return {"total": total, "data": attendance}
+    subject_filter = (
+        Attendance.subject_id == subject_id if subject_id
+        else Attendance.subject_id.is_(None)
+    )
+    rows = (await db.execute(
+        select(Attendance.student_id, Attendance.student_name, Attendance.roll_no, Attendance.date, Attendance.status)
+        .filter(Attendance.class_id == class_id, Attendance.date.between(date_from, date_to), subject_filter)
+        .order_by(Attendance.roll_no, Attendance.student_id, Attendance.date)
+    )).all()
+    register = build_register(rows, date_from, date_to, encoding)
+    return conditional_json(request, {"class_id": class_id, "subject_id": subject_id, **register})
 
 
 @attendance_router.post("/")
-async def create_attendance(attendance_data: dict, db: Session = Depends(get_db)):
+async def create_attendance(attendance_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Create attendance record"""
     attendance = Attendance(**attendance_data)
     db.add(attendance)
-    db.commit()
-    db.refresh(attendance)
+    changes = RollupChanges()
+    changes.add(attendance)
+    await changes.apply(db)
+    await db.commit()
+    await db.refresh(attendance)
     return attendance
 
 
+ATTENDANCE_STATUSES = ("present", "absent", "late", "half_day", "on_leave")
+
+
+@attendance_router.post("/bulk")
+async def create_attendance_bulk(bulk_data: AttendanceBulkCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Mark attendance for a whole class in one request
+    - Student/class details are loaded with one batched query
+    - Existing rows for (student_id, date, subject_id) are updated, the rest are
+      written with a single multi-row INSERT
+    """
+    entries = {}
+    for entry in bulk_data.attendance_list:
+        if entry.status not in ATTENDANCE_STATUSES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid status '{entry.status}' for student {entry.student_id}. Allowed: {', '.join(ATTENDANCE_STATUSES)}"
+            )
+        entries[entry.student_id] = entry  # last entry wins for duplicates
+    if not entries:
+        raise HTTPException(status_code=400, detail="attendance_list is empty")
+    
+    class_info = await db.get(Class, bulk_data.class_id)
+    if not class_info:
+        raise HTTPException(status_code=404, detail="Class not found")
+    
+    student_ids = list(entries)
+    students = {
+        row.id: row for row in (await db.execute(
+            select(
+                Student.id, Student.full_name, Student.admission_no, Student.roll_no,
+                Student.school_id, Student.school_name
+            ).filter(Student.id.in_(student_ids))
+        )).all()
+    }
+    missing = [student_id for student_id in student_ids if student_id not in students]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Students not found: {missing}")
+    
+    subject_name = None
+    if bulk_data.subject_id:
+        subject = await db.get(Subject, bulk_data.subject_id)
+        if not subject:
+            raise HTTPException(status_code=404, detail="Subject not found")
+        subject_name = subject.subject_name
+    
+    teacher = await db.get(Teacher, bulk_data.marked_by)
+    
+    subject_filter = (
+        Attendance.subject_id == bulk_data.subject_id if bulk_data.subject_id
+        else Attendance.subject_id.is_(None)
+    )
+    existing = {
+        row.student_id: row for row in (await db.execute(
+            select(
+                Attendance.student_id, Attendance.id, Attendance.status,
+                Attendance.academic_year, Attendance.month, Attendance.date
+            ).filter(
+                Attendance.date == bulk_data.date,
+                subject_filter,
+                Attendance.student_id.in_(student_ids)
+            )
+        )).all()
+    }
+    
+    marked_at = datetime.utcnow()
+    shared = {
+        "class_id": class_info.id,
+        "class_name": class_info.class_name,
+        "section": class_info.section,
+        "academic_year": class_info.academic_year,
+        "date": bulk_data.date,
+        "month": bulk_data.date.month,
+        "week": bulk_data.date.isocalendar()[1],
+        "subject_id": bulk_data.subject_id,
+        "subject_name": subject_name,
+        "marked_by_id": bulk_data.marked_by,
+        "marked_by_name": teacher.full_name if teacher else None,
+        "marked_at": marked_at
+    }
+    
+    new_rows, changed_rows = [], []
+    rollups = RollupChanges()
+    for student_id, entry in entries.items():
+        student = students[student_id]
+        row = {
+            **shared,
+            "school_id": student.school_id,
+            "school_name": student.school_name,
+            "student_id": student_id,
+            "student_name": student.full_name,
+            "admission_no": student.admission_no,
+            "roll_no": student.roll_no,
+            "status": entry.status,
+            "remarks": entry.remarks,
+            "reason": entry.reason,
+            "late_by_minutes": entry.late_by_minutes
+        }
+        if student_id in existing:
+            changed_rows.append({"id": existing[student_id].id, **row})
+            rollups.remove(existing[student_id])
+        else:
+            new_rows.append(row)
+        rollups.add(row)
+    
+    if new_rows:
+        await db.execute(insert(Attendance).values(new_rows))
+    if changed_rows:
+        await db.execute(update(Attendance), changed_rows)
+    await rollups.apply(db)
+    await db.commit()
+    
+    return {
+        "message": "Attendance marked successfully",
+        "class_id": class_info.id,
+        "date": bulk_data.date,
+        "subject_id": bulk_data.subject_id,
+        "total": len(entries),
+        "inserted": len(new_rows),
+        "updated": len(changed_rows)
+    }
+
+
 @attendance_router.put("/{attendance_id}")
-async def update_attendance(attendance_id: int, update_data: dict, db: Session = Depends(get_db)):
+async def update_attendance(attendance_id: int, update_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Update attendance record"""
-    attendance = db.query(Attendance).filter(Attendance.id == attendance_id).first()
+    attendance = await db.get(Attendance, attendance_id)
     if not attendance:
         raise HTTPException(status_code=404, detail="Attendance not found")
+    changes = RollupChanges()
+    changes.remove(attendance)
     
     for field, value in update_data.items():
         if hasattr(attendance, field):
             setattr(attendance, field, value)
     
-    db.commit()
-    db.refresh(attendance)
+    changes.add(attendance)
+    await changes.apply(db)
+    await db.commit()
+    await db.refresh(attendance)
     return attendance
 
 
 @attendance_router.delete("/{attendance_id}")
-async def delete_attendance(attendance_id: int, hard_delete: bool = False, db: Session = Depends(get_db)):
+async def delete_attendance(attendance_id: int, hard_delete: bool = False, db: AsyncSession = Depends(get_async_db)):
     """Delete attendance record - soft delete by default, hard delete if hard_delete=true"""
-    attendance = db.query(Attendance).filter(Attendance.id == attendance_id).first()
+    attendance = await db.get(Attendance, attendance_id)
     if not attendance:
         raise HTTPException(status_code=404, detail="Attendance not found")
+    changes = RollupChanges()
+    changes.remove(attendance)
+    await changes.apply(db)
     
     if hard_delete:
-        db.delete(attendance)
-        db.commit()
+        await db.delete(attendance)
+        await db.commit()
         return {"message": "Attendance permanently deleted"}
     else:
         attendance.status = "deleted"
-        db.commit()
+        await db.commit()
         return {"message": "Attendance soft deleted"}
 
 
@@ -211,11 +523,7 @@ async def delete_attendance(attendance_id: int, hard_delete: bool = False, db: S
 marks_router = APIRouter(prefix="/data/marks", tags=["Marks (Denormalized)"])
 
 
-@marks_router.get("/")
-@marks_router.get("")
-async def get_marks(
-    skip: int = 0,
-    limit: int = 100,
+async def mark_filters(
     school_id: Optional[int] = None,
     student_id: Optional[int] = None,
     student_name: Optional[str] = None,
@@ -229,11 +537,10 @@ async def get_marks(
     pass_status: Optional[str] = None,
     academic_year: Optional[str] = None,
     percentage_min: Optional[float] = None,
-    percentage_max: Optional[float] = None,
-    db: Session = Depends(get_db)
+    percentage_max: Optional[float] = None
 ):
-    """Get marks with filters"""
-    query = db.query(Mark)
+    """Filtered select(Mark) - the query parameters shared by the list and export endpoints"""
+    query = select(Mark)
     
     if school_id:
         query = query.filter(Mark.school_id == school_id)
@@ -264,52 +571,399 @@ async def get_marks(
     if percentage_max:
         query = query.filter(Mark.percentage <= percentage_max)
     
-    total = query.count()
-    marks = query.offset(skip).limit(limit).all()
+    return query
+
+
+@marks_router.get("/")
+@marks_router.get("")
+async def get_marks(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(mark_filters),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get marks with filters"""
+    return json_response(await paginate(db, query, Mark, skip=skip, limit=limit, cursor=cursor, include_total=include_total, fields=fields))
+
+
+@marks_router.get("/export")
+async def export_marks(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(mark_filters),
+    current_user = Depends(get_current_active_user)
+):
+    """Stream every mark matching the list filters as NDJSON or CSV (server-side cursor)"""
+    return export_response(query, Mark, format, fields, "marks")
+
+
+@marks_router.get("/leaderboard")
+async def get_marks_leaderboard(
+    request: Request,
+    exam_id: int,
+    scope: str = Query("school", regex="^(school|class|section)$", description="school, class (all sections of a class name) or section (one class_id)"),
+    class_id: Optional[int] = None,
+    class_name: Optional[str] = None,
+    subject_id: Optional[int] = Query(None, description="Subject toppers instead of exam totals"),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Top students of an exam with dense ranks, read straight off the leaderboard indexes
+
+    Examples:
+    - Top 10 in school: ?exam_id=7
+    - Top 10 in a section: ?exam_id=7&scope=section&class_id=3
+    - Class toppers across sections: ?exam_id=7&scope=class&class_name=Grade 5 (or class_id=3)
+    - Subject toppers: ?exam_id=7&subject_id=2&scope=school
+    """
+    if scope == "section":
+        if not class_id:
+            raise HTTPException(status_code=400, detail="scope=section needs class_id")
+        class_name = None
+    elif scope == "class":
+        if not class_name:
+            if not class_id:
+                raise HTTPException(status_code=400, detail="scope=class needs class_name or class_id")
+            class_info = await reference_cache.get_values(db, Class, class_id)
+            if not class_info:
+                raise HTTPException(status_code=404, detail="Class not found")
+            class_name = class_info["class_name"]
+        class_id = None
+    else:
+        class_id = class_name = None
     
-    return {"total": total, "data": marks}
+    if subject_id:
+        rows = (await db.execute(
+            subject_leaderboard_query(exam_id, subject_id, limit, class_id, class_name)
+        )).scalars().all()
+        ranks = dense_ranks([row.total_marks_obtained for row in rows])
+        entries = [
+            {
+                "rank": rank,
+                "student_id": row.student_id,
+                "student_name": row.student_name,
+                "roll_no": row.roll_no,
+                "class_id": row.class_id,
+                "class_name": row.class_name,
+                "section": row.section,
+                "marks_obtained": row.total_marks_obtained,
+                "max_marks": row.max_marks,
+                "percentage": row.percentage,
+                "grade": row.grade
+            }
+            for rank, row in zip(ranks, rows)
+        ]
+    else:
+        rows = (await db.execute(
+            exam_leaderboard_query(exam_id, limit, class_id, class_name)
+        )).scalars().all()
+        ranks = dense_ranks([row.percentage for row in rows])
+        entries = [
+            {
+                "rank": rank,
+                "student_id": row.student_id,
+                "student_name": row.student_name,
+                "roll_no": row.roll_no,
+                "class_id": row.class_id,
+                "class_name": row.class_name,
+                "section": row.section,
+                "total_obtained": row.total_obtained,
+                "total_max_marks": row.total_max_marks,
+                "percentage": row.percentage
+            }
+            for rank, row in zip(ranks, rows)
+        ]
+    return conditional_json(request, {"exam_id": exam_id, "scope": scope, "subject_id": subject_id, "entries": entries})
 
 
 @marks_router.post("/")
-async def create_mark(mark_data: dict, db: Session = Depends(get_db)):
+async def create_mark(mark_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Create mark record"""
     mark = Mark(**mark_data)
     db.add(mark)
-    db.commit()
-    db.refresh(mark)
+    changes = ScoreChanges()
+    changes.add(mark)
+    await changes.apply(db)
+    await db.commit()
+    await db.refresh(mark)
     return mark
 
 
+@marks_router.post("/bulk")
+async def create_marks_bulk(bulk_data: MarkBulkCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Enter marks for a whole exam in one request
+    - marks_list: one entry per (student, subject), or
+    - matrix: one row per student with {subject_id: marks} scores
+    Percentage, grade and pass_status are computed for all cells in one pass.
+    Exam, subject and student details come from one batched query each; existing
+    (student_id, exam_id, subject_id) rows are updated, the rest inserted in one statement.
+    """
+    exam = await db.get(Exam, bulk_data.exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    default_max = bulk_data.max_marks or exam.max_marks
+    
+    # Flatten both input shapes into cells keyed by (student_id, subject_id)
+    cells = {}
+    for entry in bulk_data.marks_list:
+        subject_id = entry.subject_id or bulk_data.subject_id
+        if not subject_id:
+            raise HTTPException(status_code=400, detail=f"subject_id missing for student {entry.student_id}")
+        obtained = entry.marks_obtained
+        if obtained is None and (entry.theory_marks is not None or entry.practical_marks is not None):
+            obtained = (entry.theory_marks or 0) + (entry.practical_marks or 0)
+        if obtained is None and not entry.is_absent:
+            raise HTTPException(
+                status_code=400,
+                detail=f"No marks for student {entry.student_id}, subject {subject_id} (set is_absent for an absent student)"
+            )
+        cells[(entry.student_id, subject_id)] = {
+            "theory_marks": entry.theory_marks,
+            "practical_marks": entry.practical_marks,
+            "total_marks_obtained": None if entry.is_absent else obtained,
+            "max_marks": entry.max_marks or default_max,
+            "remarks": entry.remarks
+        }
+    for row in bulk_data.matrix:
+        for subject_id, obtained in row.scores.items():
+            cells[(row.student_id, subject_id)] = {
+                "theory_marks": None,
+                "practical_marks": None,
+                "total_marks_obtained": obtained,
+                "max_marks": default_max,
+                "remarks": None
+            }
+    if not cells:
+        raise HTTPException(status_code=400, detail="No marks supplied")
+    
+    for (student_id, subject_id), cell in cells.items():
+        obtained = cell["total_marks_obtained"]
+        if not cell["max_marks"] or cell["max_marks"] <= 0:
+            raise HTTPException(status_code=400, detail="max_marks must be positive")
+        if obtained is not None and not 0 <= obtained <= cell["max_marks"]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Marks {obtained} out of range for student {student_id}, subject {subject_id}"
+            )
+    
+    student_ids = {student_id for student_id, _ in cells}
+    subject_ids = {subject_id for _, subject_id in cells}
+    students = {
+        row.id: row for row in (await db.execute(
+            select(
+                Student.id, Student.full_name, Student.admission_no, Student.roll_no,
+                Student.school_id, Student.school_name, Student.class_id, Student.class_name, Student.section
+            ).filter(Student.id.in_(student_ids))
+        )).all()
+    }
+    subjects = {
+        row.id: row for row in (await db.execute(
+            select(Subject.id, Subject.subject_name, Subject.subject_code).filter(Subject.id.in_(subject_ids))
+        )).all()
+    }
+    missing_students = sorted(student_ids - students.keys())
+    if missing_students:
+        raise HTTPException(status_code=404, detail=f"Students not found: {missing_students}")
+    missing_subjects = sorted(subject_ids - subjects.keys())
+    if missing_subjects:
+        raise HTTPException(status_code=404, detail=f"Subjects not found: {missing_subjects}")
+    
+    teacher = await db.get(Teacher, bulk_data.entered_by)
+    
+    stored = select(
+        Mark.id, Mark.exam_id, Mark.student_id, Mark.subject_id,
+        Mark.total_marks_obtained, Mark.max_marks, Mark.is_absent
+    ).filter(Mark.exam_id == exam.id)
+    existing = {
+        (row.student_id, row.subject_id): row for row in (await db.execute(
+            stored.filter(Mark.student_id.in_(student_ids), Mark.subject_id.in_(subject_ids))
+        )).all()
+    }
+    
+    # Column-wise result computation for every cell at once
+    keys = list(cells)
+    results = compute_results(
+        [cells[key]["total_marks_obtained"] for key in keys],
+        [cells[key]["max_marks"] for key in keys],
+        pass_percentage(exam.max_marks, exam.min_pass_marks)
+    )
+    
+    entered_at = datetime.utcnow()
+    new_rows, changed_rows = [], []
+    scores = ScoreChanges()
+    for index, (student_id, subject_id) in enumerate(keys):
+        student = students[student_id]
+        subject = subjects[subject_id]
+        cell = cells[(student_id, subject_id)]
+        row = {
+            **cell,
+            "school_id": student.school_id,
+            "school_name": student.school_name,
+            "student_id": student_id,
+            "student_name": student.full_name,
+            "admission_no": student.admission_no,
+            "roll_no": student.roll_no,
+            "class_id": student.class_id,
+            "class_name": student.class_name,
+            "section": student.section,
+            "exam_id": exam.id,
+            "exam_name": exam.exam_name,
+            "exam_code": exam.exam_code,
+            "exam_type": exam.exam_type,
+            "academic_year": exam.academic_year,
+            "subject_id": subject_id,
+            "subject_name": subject.subject_name,
+            "subject_code": subject.subject_code,
+            "percentage": results["percentage"][index],
+            "grade": results["grade"][index],
+            "pass_status": results["pass_status"][index],
+            "is_absent": cell["total_marks_obtained"] is None,
+            "entered_by_id": bulk_data.entered_by,
+            "entered_by_name": teacher.full_name if teacher else None,
+            "entered_at": entered_at
+        }
+        if (student_id, subject_id) in existing:
+            changed_rows.append({"id": existing[(student_id, subject_id)].id, **row})
+            scores.remove(existing[(student_id, subject_id)])
+        else:
+            new_rows.append(row)
+        scores.add(row)
+    
+    if new_rows:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(Mark).values(new_rows))
+        except IntegrityError:
+            # A concurrent or repeated submission stored some of these cells meanwhile
+            # (uq_marks_student_exam_subject): insert the rest one at a time and update those
+            inserted = []
+            for row in new_rows:
+                try:
+                    async with db.begin_nested():
+                        await db.execute(insert(Mark).values(row))
+                    inserted.append(row)
+                except IntegrityError:
+                    current = (await db.execute(
+                        stored.filter(Mark.student_id == row["student_id"], Mark.subject_id == row["subject_id"])
+                    )).one()
+                    changed_rows.append({"id": current.id, **row})
+                    scores.remove(current)
+            new_rows = inserted
+    if changed_rows:
+        await db.execute(update(Mark), changed_rows)
+    await scores.apply(db)
+    await db.commit()
+    
+    return {
+        "message": "Marks saved successfully",
+        "exam_id": exam.id,
+        "total": len(keys),
+        "inserted": len(new_rows),
+        "updated": len(changed_rows),
+        "passed": results["pass_status"].count("pass"),
+        "failed": results["pass_status"].count("fail"),
+        "absent": results["pass_status"].count("absent")
+    }
+
+
+@marks_router.post("/report-cards")
+async def create_report_cards(
+    exam_id: Optional[int] = None,
+    cce_set: Optional[str] = Query(None, regex="^(term1|term2|annual)$", description="CCE term: term1 (FA1+FA2+SA1), term2 (FA3+FA4+SA2) or annual"),
+    school_id: Optional[int] = None,
+    academic_year: Optional[str] = None,
+    class_id: Optional[int] = None,
+    include_subjects: bool = False,
+    write_back: bool = True,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Compute report cards - totals, percentage, grade, class and section ranks - for one exam
+    or a CCE set, and store percentage/grade/section rank on the students (write_back)
+
+    Examples:
+    - One exam: ?exam_id=7
+    - CCE term 1 of a school: ?cce_set=term1&school_id=1&academic_year=2025-2026
+    CCE exams are matched by exam_code (or exam_name) FA1..SA2.
+    """
+    missing_exams = []
+    if exam_id:
+        exam = await db.get(Exam, exam_id)
+        if not exam:
+            raise HTTPException(status_code=404, detail="Exam not found")
+        exams = [exam]
+    elif cce_set:
+        if not school_id or not academic_year:
+            raise HTTPException(status_code=400, detail="cce_set needs school_id and academic_year")
+        codes = CCE_SETS[cce_set]
+        found = (await db.execute(
+            select(Exam).filter(
+                Exam.school_id == school_id,
+                Exam.academic_year == academic_year,
+                or_(Exam.exam_code.in_(codes), Exam.exam_name.in_(codes))
+            )
+        )).scalars().all()
+        by_code = {}
+        for exam in found:
+            by_code.setdefault(exam.exam_code if exam.exam_code in codes else exam.exam_name, exam)
+        exams = [by_code[code] for code in codes if code in by_code]
+        missing_exams = [code for code in codes if code not in by_code]
+        if not exams:
+            raise HTTPException(status_code=404, detail=f"No {cce_set} exams ({', '.join(codes)}) found")
+    else:
+        raise HTTPException(status_code=400, detail="Provide exam_id or cce_set")
+    
+    report = await generate_report_cards(db, exams, class_id=class_id, include_subjects=include_subjects, write_back=write_back)
+    if write_back:
+        await db.commit()
+    return json_response({**report, "missing_exams": missing_exams})
+
+
 @marks_router.put("/{mark_id}")
-async def update_mark(mark_id: int, update_data: dict, db: Session = Depends(get_db)):
+async def update_mark(mark_id: int, update_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Update mark record"""
-    mark = db.query(Mark).filter(Mark.id == mark_id).first()
+    mark = await db.get(Mark, mark_id)
     if not mark:
         raise HTTPException(status_code=404, detail="Mark not found")
+    changes = ScoreChanges()
+    changes.remove(mark)
     
     for field, value in update_data.items():
         if hasattr(mark, field):
             setattr(mark, field, value)
     
-    db.commit()
-    db.refresh(mark)
+    changes.add(mark)
+    await changes.apply(db)
+    await db.commit()
+    await db.refresh(mark)
     return mark
 
 
 @marks_router.delete("/{mark_id}")
-async def delete_mark(mark_id: int, hard_delete: bool = False, db: Session = Depends(get_db)):
+async def delete_mark(mark_id: int, hard_delete: bool = False, db: AsyncSession = Depends(get_async_db)):
     """Delete mark record - soft delete by default, hard delete if hard_delete=true"""
-    mark = db.query(Mark).filter(Mark.id == mark_id).first()
+    mark = await db.get(Mark, mark_id)
     if not mark:
         raise HTTPException(status_code=404, detail="Mark not found")
+    changes = ScoreChanges()
+    changes.remove(mark)
     
     if hard_delete:
-        db.delete(mark)
-        db.commit()
+        await changes.apply(db)
+        await db.delete(mark)
+        await db.commit()
         return {"message": "Mark permanently deleted"}
     else:
         mark.is_absent = True
-        db.commit()
+        changes.add(mark)
+        await changes.apply(db)
+        await db.commit()
         return {"message": "Mark soft deleted"}
 
 
@@ -318,19 +972,14 @@ async def delete_mark(mark_id: int, hard_delete: bool = False, db: Session = Dep
 fee_structure_router = APIRouter(prefix="/data/fee-structures", tags=["Fee Structures (Denormalized)"])
 
 
-@fee_structure_router.get("/")
-@fee_structure_router.get("")
-async def get_fee_structures(
-    skip: int = 0,
-    limit: int = 100,
+async def fee_structure_filters(
     school_id: Optional[int] = None,
     class_id: Optional[int] = None,
     fee_type: Optional[str] = None,
-    academic_year: Optional[str] = None,
-    db: Session = Depends(get_db)
+    academic_year: Optional[str] = None
 ):
-    """Get fee structures with filters"""
-    query = db.query(FeeStructure)
+    """Filtered select(FeeStructure) - the query parameters shared by the list and export endpoints"""
+    query = select(FeeStructure)
     
     if school_id:
         query = query.filter(FeeStructure.school_id == school_id)
@@ -341,26 +990,62 @@ async def get_fee_structures(
     if academic_year:
         query = query.filter(FeeStructure.academic_year == academic_year)
     
-    total = query.count()
-    structures = query.offset(skip).limit(limit).all()
-    
-    return {"total": total, "data": structures}
+    return query
+
+
+@fee_structure_router.get("/")
+@fee_structure_router.get("")
+async def get_fee_structures(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(fee_structure_filters),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get fee structures with filters"""
+    return json_response(await paginate(db, query, FeeStructure, skip=skip, limit=limit, cursor=cursor, include_total=include_total, fields=fields))
+
+
+@fee_structure_router.get("/export")
+async def export_fee_structures(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(fee_structure_filters),
+    current_user = Depends(get_current_active_user)
+):
+    """Stream every fee structure matching the list filters as NDJSON or CSV (server-side cursor)"""
+    return export_response(query, FeeStructure, format, fields, "fee-structures")
+
+
+@fee_structure_router.get("/{structure_id}")
+async def get_fee_structure(
+    structure_id: int,
+    fields: Optional[List[str]] = Depends(fields_param),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get single fee structure (read-through cache)"""
+    structure = await reference_cache.get_fields(db, FeeStructure, structure_id, fields)
+    if not structure:
+        raise HTTPException(status_code=404, detail="Fee structure not found")
+    return json_response(structure)
 
 
 @fee_structure_router.post("/")
-async def create_fee_structure(structure_data: dict, db: Session = Depends(get_db)):
+async def create_fee_structure(structure_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Create fee structure"""
     structure = FeeStructure(**structure_data)
     db.add(structure)
-    db.commit()
-    db.refresh(structure)
+    await db.commit()
+    await db.refresh(structure)
     return structure
 
 
 @fee_structure_router.put("/{structure_id}")
-async def update_fee_structure(structure_id: int, update_data: dict, db: Session = Depends(get_db)):
+async def update_fee_structure(structure_id: int, update_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Update fee structure"""
-    structure = db.query(FeeStructure).filter(FeeStructure.id == structure_id).first()
+    structure = await db.get(FeeStructure, structure_id)
     if not structure:
         raise HTTPException(status_code=404, detail="Fee structure not found")
     
@@ -368,25 +1053,28 @@ async def update_fee_structure(structure_id: int, update_data: dict, db: Session
         if hasattr(structure, field):
             setattr(structure, field, value)
     
-    db.commit()
-    db.refresh(structure)
+    await db.commit()
+    await db.refresh(structure)
+    await reference_cache.invalidate(FeeStructure, structure_id)
     return structure
 
 
 @fee_structure_router.delete("/{structure_id}")
-async def delete_fee_structure(structure_id: int, hard_delete: bool = False, db: Session = Depends(get_db)):
+async def delete_fee_structure(structure_id: int, hard_delete: bool = False, db: AsyncSession = Depends(get_async_db)):
     """Delete fee structure - soft delete by default, hard delete if hard_delete=true"""
-    structure = db.query(FeeStructure).filter(FeeStructure.id == structure_id).first()
+    structure = await db.get(FeeStructure, structure_id)
     if not structure:
         raise HTTPException(status_code=404, detail="Fee structure not found")
     
     if hard_delete:
-        db.delete(structure)
-        db.commit()
+        await db.delete(structure)
+        await db.commit()
+        await reference_cache.invalidate(FeeStructure, structure_id)
         return {"message": "Fee structure permanently deleted"}
     else:
         structure.is_active = False
-        db.commit()
+        await db.commit()
+        await reference_cache.invalidate(FeeStructure, structure_id)
         return {"message": "Fee structure soft deleted"}
 
 
@@ -395,19 +1083,14 @@ async def delete_fee_structure(structure_id: int, hard_delete: bool = False, db:
 fee_payments_router = APIRouter(prefix="/data/fee-payments", tags=["Fee Payments (Denormalized)"])
 
 
-@fee_payments_router.get("/")
-@fee_payments_router.get("")
-async def get_fee_payments(
-    skip: int = 0,
-    limit: int = 100,
+async def fee_payment_filters(
     school_id: Optional[int] = None,
     student_id: Optional[int] = None,
     payment_status: Optional[str] = None,
-    academic_year: Optional[str] = None,
-    db: Session = Depends(get_db)
+    academic_year: Optional[str] = None
 ):
-    """Get fee payments with filters"""
-    query = db.query(FeePayment)
+    """Filtered select(FeePayment) - the query parameters shared by the list and export endpoints"""
+    query = select(FeePayment)
     
     if school_id:
         query = query.filter(FeePayment.school_id == school_id)
@@ -418,52 +1101,86 @@ async def get_fee_payments(
     if academic_year:
         query = query.filter(FeePayment.academic_year == academic_year)
     
-    total = query.count()
-    payments = query.offset(skip).limit(limit).all()
-    
-    return {"total": total, "data": payments}
+    return query
+
+
+@fee_payments_router.get("/")
+@fee_payments_router.get("")
+async def get_fee_payments(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(fee_payment_filters),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get fee payments with filters"""
+    return json_response(await paginate(db, query, FeePayment, skip=skip, limit=limit, cursor=cursor, include_total=include_total, fields=fields))
+
+
+@fee_payments_router.get("/export")
+async def export_fee_payments(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(fee_payment_filters),
+    current_user = Depends(get_current_active_user)
+):
+    """Stream every fee payment matching the list filters as NDJSON or CSV (server-side cursor)"""
+    return export_response(query, FeePayment, format, fields, "fee-payments")
 
 
 @fee_payments_router.post("/")
-async def create_fee_payment(payment_data: dict, db: Session = Depends(get_db)):
-    """Create fee payment record"""
+async def create_fee_payment(payment_data: dict, db: AsyncSession = Depends(get_async_db)):
+    """Create fee payment record - the student's balance fields are updated in the same transaction"""
     payment = FeePayment(**payment_data)
     db.add(payment)
-    db.commit()
-    db.refresh(payment)
+    ledger = LedgerChanges()
+    ledger.add(payment)
+    await ledger.apply(db)
+    await db.commit()
+    await db.refresh(payment)
     return payment
 
 
 @fee_payments_router.put("/{payment_id}")
-async def update_fee_payment(payment_id: int, update_data: dict, db: Session = Depends(get_db)):
-    """Update fee payment"""
-    payment = db.query(FeePayment).filter(FeePayment.id == payment_id).first()
+async def update_fee_payment(payment_id: int, update_data: dict, db: AsyncSession = Depends(get_async_db)):
+    """Update fee payment - the student's balance fields are updated in the same transaction"""
+    payment = await db.get(FeePayment, payment_id)
     if not payment:
         raise HTTPException(status_code=404, detail="Fee payment not found")
+    ledger = LedgerChanges()
+    ledger.remove(payment)
     
     for field, value in update_data.items():
         if hasattr(payment, field):
             setattr(payment, field, value)
     
-    db.commit()
-    db.refresh(payment)
+    ledger.add(payment)
+    await ledger.apply(db)
+    await db.commit()
+    await db.refresh(payment)
     return payment
 
 
 @fee_payments_router.delete("/{payment_id}")
-async def delete_fee_payment(payment_id: int, hard_delete: bool = False, db: Session = Depends(get_db)):
+async def delete_fee_payment(payment_id: int, hard_delete: bool = False, db: AsyncSession = Depends(get_async_db)):
     """Delete fee payment - soft delete by default, hard delete if hard_delete=true"""
-    payment = db.query(FeePayment).filter(FeePayment.id == payment_id).first()
+    payment = await db.get(FeePayment, payment_id)
     if not payment:
         raise HTTPException(status_code=404, detail="Fee payment not found")
+    ledger = LedgerChanges()
+    ledger.remove(payment)
     
     if hard_delete:
-        db.delete(payment)
-        db.commit()
+        await db.delete(payment)
+        await ledger.apply(db)
+        await db.commit()
         return {"message": "Fee payment permanently deleted"}
     else:
         payment.payment_status = "cancelled"
-        db.commit()
+        await ledger.apply(db)
+        await db.commit()
         return {"message": "Fee payment soft deleted"}
 
 
@@ -472,20 +1189,15 @@ async def delete_fee_payment(payment_id: int, hard_delete: bool = False, db: Ses
 timetable_router = APIRouter(prefix="/data/timetables", tags=["Timetables (Denormalized)"])
 
 
-@timetable_router.get("/")
-@timetable_router.get("")
-async def get_timetables(
-    skip: int = 0,
-    limit: int = 100,
+async def timetable_filters(
     school_id: Optional[int] = None,
     class_id: Optional[int] = None,
     teacher_id: Optional[int] = None,
     day_of_week: Optional[str] = None,
-    academic_year: Optional[str] = None,
-    db: Session = Depends(get_db)
+    academic_year: Optional[str] = None
 ):
-    """Get timetables with filters"""
-    query = db.query(Timetable)
+    """Filtered select(Timetable) - the query parameters shared by the list and export endpoints"""
+    query = select(Timetable)
     
     if school_id:
         query = query.filter(Timetable.school_id == school_id)
@@ -498,52 +1210,81 @@ async def get_timetables(
     if academic_year:
         query = query.filter(Timetable.academic_year == academic_year)
     
-    total = query.count()
-    timetables = query.offset(skip).limit(limit).all()
-    
-    return {"total": total, "data": timetables}
+    return query
+
+
+@timetable_router.get("/")
+@timetable_router.get("")
+async def get_timetables(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(timetable_filters),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get timetables with filters (ETag from the body hash - If-None-Match gets 304)"""
+    return conditional_json(request, await paginate(db, query, Timetable, skip=skip, limit=limit, cursor=cursor, include_total=include_total, fields=fields))
+
+
+@timetable_router.get("/export")
+async def export_timetables(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(timetable_filters),
+    current_user = Depends(get_current_active_user)
+):
+    """Stream every timetable entry matching the list filters as NDJSON or CSV (server-side cursor)"""
+    return export_response(query, Timetable, format, fields, "timetables")
 
 
 @timetable_router.post("/")
-async def create_timetable(timetable_data: dict, db: Session = Depends(get_db)):
+async def create_timetable(timetable_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Create timetable entry with auto-populated school and class info"""
+    lookup = await (
+        Lookup(db)
+        .want(School, timetable_data.get("school_id"))
+        .want(Class, timetable_data.get("class_id"))
+        .want(Subject, timetable_data.get("subject_id"))
+        .want(Teacher, timetable_data.get("teacher_id"))
+        .load()
+    )
+    
     # Auto-populate school name from schools table
-    if "school_id" in timetable_data and timetable_data["school_id"]:
-        school = db.query(School).filter(School.id == timetable_data["school_id"]).first()
-        if school:
-            timetable_data["school_name"] = school.school_name
+    school = lookup.get(School, timetable_data.get("school_id"))
+    if school:
+        timetable_data["school_name"] = school.school_name
     
     # Auto-populate class info from classes table
-    if "class_id" in timetable_data and timetable_data["class_id"]:
-        class_info = db.query(Class).filter(Class.id == timetable_data["class_id"]).first()
-        if class_info:
-            timetable_data["class_name"] = class_info.class_name
-            timetable_data["section"] = class_info.section
-            timetable_data["academic_year"] = class_info.academic_year
+    class_info = lookup.get(Class, timetable_data.get("class_id"))
+    if class_info:
+        timetable_data["class_name"] = class_info.class_name
+        timetable_data["section"] = class_info.section
+        timetable_data["academic_year"] = class_info.academic_year
     
     # Auto-populate subject name from subjects table
-    if "subject_id" in timetable_data and timetable_data["subject_id"]:
-        subject = db.query(Subject).filter(Subject.id == timetable_data["subject_id"]).first()
-        if subject:
-            timetable_data["subject_name"] = subject.subject_name
+    subject = lookup.get(Subject, timetable_data.get("subject_id"))
+    if subject:
+        timetable_data["subject_name"] = subject.subject_name
     
     # Auto-populate teacher name from teachers table
-    if "teacher_id" in timetable_data and timetable_data["teacher_id"]:
-        teacher = db.query(Teacher).filter(Teacher.id == timetable_data["teacher_id"]).first()
-        if teacher:
-            timetable_data["teacher_name"] = teacher.full_name
+    teacher = lookup.get(Teacher, timetable_data.get("teacher_id"))
+    if teacher:
+        timetable_data["teacher_name"] = teacher.full_name
     
     timetable = Timetable(**timetable_data)
     db.add(timetable)
-    db.commit()
-    db.refresh(timetable)
+    await db.commit()
+    await db.refresh(timetable)
     return timetable
 
 
 @timetable_router.put("/{timetable_id}")
-async def update_timetable(timetable_id: int, update_data: dict, db: Session = Depends(get_db)):
+async def update_timetable(timetable_id: int, update_data: dict, db: AsyncSession = Depends(get_async_db)):
     """Update timetable entry"""
-    timetable = db.query(Timetable).filter(Timetable.id == timetable_id).first()
+    timetable = await db.get(Timetable, timetable_id)
     if not timetable:
         raise HTTPException(status_code=404, detail="Timetable not found")
     
@@ -551,23 +1292,23 @@ async def update_timetable(timetable_id: int, update_data: dict, db: Session = D
         if hasattr(timetable, field):
             setattr(timetable, field, value)
     
-    db.commit()
-    db.refresh(timetable)
+    await db.commit()
+    await db.refresh(timetable)
     return timetable
 
 
 @timetable_router.delete("/{timetable_id}")
-async def delete_timetable(timetable_id: int, hard_delete: bool = False, db: Session = Depends(get_db)):
+async def delete_timetable(timetable_id: int, hard_delete: bool = False, db: AsyncSession = Depends(get_async_db)):
     """Delete timetable entry - soft delete by default, hard delete if hard_delete=true"""
-    timetable = db.query(Timetable).filter(Timetable.id == timetable_id).first()
+    timetable = await db.get(Timetable, timetable_id)
     if not timetable:
         raise HTTPException(status_code=404, detail="Timetable not found")
     
     if hard_delete:
-        db.delete(timetable)
-        db.commit()
+        await db.delete(timetable)
+        await db.commit()
         return {"message": "Timetable permanently deleted"}
     else:
         timetable.is_active = False
-        db.commit()
+        await db.commit()
         return {"message": "Timetable soft deleted"}
\ No newline at end of file
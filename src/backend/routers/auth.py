@@ -3,17 +3,21 @@ Authentication API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-from database import get_db
+from database import get_async_db
 from models_denormalized import User
 from schemas import Token, UserLogin, PasswordChange, MessageResponse
 from auth import (
-    verify_password, 
-    get_password_hash, 
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
-    get_current_active_user
+    get_current_active_user,
+    get_current_db_user,
+    user_token_claims
 )
+from utils import user_cache
 from config import settings
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -22,16 +26,16 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     User login endpoint (Form Data)
     Returns JWT access token
     """
     # Find user by username or email
-    user = db.query(User).filter(
+    user = await db.scalar(select(User).filter(
         (User.username == form_data.username) | (User.email == form_data.username)
-    ).first()
+    ))
     
     if not user:
         raise HTTPException(
@@ -41,7 +45,7 @@ async def login(
         )
     
     # Verify password
-    if not verify_password(form_data.password, user.hashed_password):
+    if not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -57,17 +61,14 @@ async def login(
     
     # Update last login
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(username=user.username)
     
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     role_value = user.role.value if hasattr(user.role, "value") else user.role
     access_token = create_access_token(
-        data={
-            "sub": user.username,
-            "role": role_value,
-            "school_id": user.school_id
-        },
+        data=user_token_claims(user),
         expires_delta=access_token_expires
     )
     
@@ -83,7 +84,7 @@ async def login(
 @router.post("/login-json", response_model=Token)
 async def login_json(
     user_login: UserLogin,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     User login endpoint (JSON)
@@ -91,9 +92,9 @@ async def login_json(
     Accepts JSON body with username and password
     """
     # Find user by username or email
-    user = db.query(User).filter(
+    user = await db.scalar(select(User).filter(
         (User.username == user_login.username) | (User.email == user_login.username)
-    ).first()
+    ))
     
     if not user:
         raise HTTPException(
@@ -103,7 +104,7 @@ async def login_json(
         )
     
     # Verify password
-    if not verify_password(user_login.password, user.hashed_password):
+    if not await verify_password_async(user_login.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -119,17 +120,14 @@ async def login_json(
     
     # Update last login
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(username=user.username)
     
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     role_value = user.role.value if hasattr(user.role, "value") else user.role
     access_token = create_access_token(
-        data={
-            "sub": user.username,
-            "role": role_value,
-            "school_id": user.school_id
-        },
+        data=user_token_claims(user),
         expires_delta=access_token_expires
     )
     
@@ -144,14 +142,14 @@ async def login_json(
 @router.post("/change-password", response_model=MessageResponse)
 async def change_password(
     password_data: PasswordChange,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_db_user)
 ):
     """
     Change user password
     """
     # Verify old password
-    if not verify_password(password_data.old_password, current_user.hashed_password):
+    if not await verify_password_async(password_data.old_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect current password"
@@ -164,11 +162,15 @@ async def change_password(
             detail="New password must be at least 8 characters long"
         )
     
-    # Update password
-    current_user.hashed_password = get_password_hash(password_data.new_password)
-    current_user.is_first_login = False
-    current_user.updated_at = datetime.utcnow()
-    db.commit()
+    # Update password - on the session's own row, current_user may be a cached copy
+    user = await db.get(User, current_user.id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    user.hashed_password = await get_password_hash_async(password_data.new_password)
+    user.is_first_login = False
+    user.updated_at = datetime.utcnow()
+    await db.commit()
+    user_cache.invalidate(username=user.username, user_id=user.id)
     
     return MessageResponse(
         message="Password changed successfully",
@@ -179,12 +181,12 @@ async def change_password(
 @router.post("/reset-password-request")
 async def reset_password_request(
     email: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Request password reset (send email with reset link)
     """
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).filter(User.email == email))
     
     if not user:
         # Don't reveal if email exists or not for security
@@ -204,7 +206,7 @@ async def reset_password_request(
 
 @router.get("/me")
 async def get_current_user_info(
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_db_user)
 ):
     """
     Get current logged-in user information
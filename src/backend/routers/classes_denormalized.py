@@ -2,24 +2,27 @@
 Denormalized Class Router with Advanced Filtering
 All data in single table - use filters instead of JOINs
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_
+from typing import Optional, List
 from datetime import datetime
-from database import get_db
+from database import get_async_db
 from models_denormalized import Class, Teacher
+from utils.pagination import paginate
+from utils.projection import fields_param
+from utils.encoders import json_response
+from utils.export import export_response
+from utils.etag import conditional_json, row_version, version_etag, etag_matches, etag_headers, not_modified
+from utils import propagation
+from utils.enrichment import Lookup
+from utils.reference_cache import reference_cache
 from auth import get_current_active_user
 
 router = APIRouter(prefix="/data/classes", tags=["Classes (Denormalized)"])
 
 
-@router.get("/")
-@router.get("")
-async def get_classes(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=1000),
-    
+async def class_filters(
     # Basic Filters
     school_id: Optional[int] = None,
     school_name: Optional[str] = None,
@@ -43,24 +46,9 @@ async def get_classes(
     
     # Room Filters
     room_number: Optional[str] = None,
-    
-    # Sorting
-    sort_by: Optional[str] = Query("id"),
-    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
-    
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_active_user)
 ):
-    """
-    Get classes with advanced filtering
-    
-    Examples:
-    - All classes in school: ?school_id=1
-    - Classes by academic year: ?academic_year=2024-25
-    - Classes by teacher: ?class_teacher_name=Smith
-    - Search: ?search=Grade 5
-    """
-    query = db.query(Class)
+    """Filtered select(Class) - the query parameters shared by the list and export endpoints"""
+    query = select(Class)
     
     if school_id:
         query = query.filter(Class.school_id == school_id)
@@ -101,48 +89,95 @@ async def get_classes(
     if room_number:
         query = query.filter(Class.room_number == room_number)
     
-    total_count = query.count()
+    return query
+
+
+@router.get("/")
+@router.get("")
+async def get_classes(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page (keyset pagination)"),
+    include_total: bool = Query(True, description="Set false to skip the total count query"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    
+    # Filters
+    query = Depends(class_filters),
     
-    if hasattr(Class, sort_by):
-        if sort_order == "desc":
-            query = query.order_by(getattr(Class, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Class, sort_by).asc())
+    # Sorting
+    sort_by: Optional[str] = Query("id"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
     
-    classes = query.offset(skip).limit(limit).all()
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Get classes with advanced filtering
     
-    return {
-        "total": total_count,
-        "page": skip // limit + 1,
-        "page_size": limit,
-        "total_pages": (total_count + limit - 1) // limit,
-        "data": classes
-    }
+    Examples:
+    - All classes in school: ?school_id=1
+    - Classes by academic year: ?academic_year=2024-25
+    - Classes by teacher: ?class_teacher_name=Smith
+    - Search: ?search=Grade 5
+    """
+    return json_response(await paginate(
+        db, query, Class,
+        skip=skip, limit=limit,
+        sort_by=sort_by, sort_order=sort_order,
+        cursor=cursor, include_total=include_total,
+        fields=fields
+    ))
+
+
+@router.get("/export")
+async def export_classes(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(class_filters),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Stream every class matching the list filters as NDJSON or CSV
+    Takes the same filters as the list endpoint; rows are read with a server-side cursor
+    """
+    return export_response(query, Class, format, fields, "classes")
 
 
 @router.get("/{class_id}")
 async def get_class(
     class_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    fields: Optional[List[str]] = Depends(fields_param),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
-    """Get single class"""
-    class_obj = db.query(Class).filter(Class.id == class_id).first()
+    """Get single class (read-through cache; If-None-Match answered from SELECT updated_at)"""
+    version = await row_version(db, Class, class_id)
+    etag = version_etag(Class, class_id, version, fields)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    class_obj = await reference_cache.get_fields(db, Class, class_id, fields, version)
     if not class_obj:
         raise HTTPException(status_code=404, detail="Class not found")
-    return class_obj
+    return json_response(class_obj, headers=etag_headers(etag))
 
 
 @router.post("/")
 async def create_class(
     class_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Create class with all data"""
+    # Class teacher and every subject teacher come from one teachers query
+    subject_teachers = class_data.get('subject_teachers') or []
+    lookup = await Lookup(db).want(
+        Teacher, class_data.get('class_teacher_id'), *[entry.get('teacher_id') for entry in subject_teachers]
+    ).load()
+    
     # Get class teacher details from teachers table using class_teacher_id
     if class_data.get('class_teacher_id'):
-        teacher = db.query(Teacher).filter(Teacher.id == class_data['class_teacher_id']).first()
+        teacher = lookup.get(Teacher, class_data['class_teacher_id'])
         if teacher:
             class_data['class_teacher_name'] = teacher.full_name
             class_data['class_teacher_email'] = teacher.email
@@ -150,10 +185,10 @@ async def create_class(
     
     # Get subject teacher names from teachers table using teacher_id
     subject_teacher_map = {}
-    if class_data.get('subject_teachers'):
-        for subject_teacher in class_data['subject_teachers']:
+    if subject_teachers:
+        for subject_teacher in subject_teachers:
             if subject_teacher.get('teacher_id'):
-                teacher = db.query(Teacher).filter(Teacher.id == subject_teacher['teacher_id']).first()
+                teacher = lookup.get(Teacher, subject_teacher['teacher_id'])
                 if teacher:
                     subject_teacher['teacher_name'] = teacher.full_name
                     subject_teacher_map[subject_teacher['subject']] = teacher.full_name
@@ -170,8 +205,8 @@ async def create_class(
     
     class_obj = Class(**class_data)
     db.add(class_obj)
-    db.commit()
-    db.refresh(class_obj)
+    await db.commit()
+    await db.refresh(class_obj)
     return class_obj
 
 
@@ -179,17 +214,18 @@ async def create_class(
 async def update_class(
     class_id: int,
     update_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Update class - any field"""
-    class_obj = db.query(Class).filter(Class.id == class_id).first()
+    class_obj = await db.get(Class, class_id)
     if not class_obj:
         raise HTTPException(status_code=404, detail="Class not found")
+    before = propagation.snapshot(class_obj)
     
     # If class_teacher_id is updated, fetch teacher details
     if 'class_teacher_id' in update_data:
-        teacher = db.query(Teacher).filter(Teacher.id == update_data['class_teacher_id']).first()
+        teacher = await Lookup(db).fetch(Teacher, update_data['class_teacher_id'])
         if teacher:
             update_data['class_teacher_name'] = teacher.full_name
             update_data['class_teacher_email'] = teacher.email
@@ -204,8 +240,10 @@ async def update_class(
             class_obj.class_section = f"{class_obj.class_name}-{class_obj.section}"
     
     class_obj.updated_at = datetime.now()
-    db.commit()
-    db.refresh(class_obj)
+    await db.commit()
+    await db.refresh(class_obj)
+    await reference_cache.invalidate(Class, class_id)
+    await propagation.propagate_changes(class_obj, before)
     return class_obj
 
 
@@ -213,21 +251,22 @@ async def update_class(
 async def delete_class(
     class_id: int,
     hard_delete: bool = Query(False),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Delete class"""
-    class_obj = db.query(Class).filter(Class.id == class_id).first()
+    class_obj = await db.get(Class, class_id)
     if not class_obj:
         raise HTTPException(status_code=404, detail="Class not found")
     
     if hard_delete:
-        db.delete(class_obj)
+        await db.delete(class_obj)
     else:
         class_obj.is_active = False
         class_obj.status = "inactive"
     
-    db.commit()
+    await db.commit()
+    await reference_cache.invalidate(Class, class_id)
     return {"message": "Class deleted successfully"}
 
 
@@ -235,44 +274,46 @@ async def delete_class(
 async def get_classes_by_academic_year(
     academic_year: str,
     school_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get classes by academic year"""
-    query = db.query(Class).filter(Class.academic_year == academic_year)
+    query = select(Class).filter(Class.academic_year == academic_year)
     if school_id:
         query = query.filter(Class.school_id == school_id)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/filters/by-teacher")
 async def get_classes_by_teacher(
     class_teacher_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get classes taught by specific teacher"""
-    return db.query(Class).filter(Class.class_teacher_id == class_teacher_id).all()
+    query = select(Class).filter(Class.class_teacher_id == class_teacher_id)
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/stats/summary")
 async def get_class_stats(
+    request: Request,
     school_id: Optional[int] = None,
     academic_year: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get class statistics"""
-    query = db.query(Class)
+    query = select(Class)
     if school_id:
         query = query.filter(Class.school_id == school_id)
     if academic_year:
         query = query.filter(Class.academic_year == academic_year)
     
-    all_classes = query.all()
+    all_classes = (await db.execute(query)).scalars().all()
     
-    return {
+    return conditional_json(request, {
         "total_classes": len(all_classes),
         "active_classes": sum(1 for c in all_classes if c.is_active),
         "total_capacity": sum(c.capacity or 0 for c in all_classes),
         "total_students": sum(c.current_strength or 0 for c in all_classes),
         "average_class_size": sum(c.current_strength or 0 for c in all_classes) / len(all_classes) if all_classes else 0,
         "occupancy_rate": (sum(c.current_strength or 0 for c in all_classes) / sum(c.capacity or 1 for c in all_classes)) * 100 if all_classes else 0
-    }
+    })
@@ -2,24 +2,26 @@
 Denormalized Exam Router with Advanced Filtering
 All data in single table - use filters instead of JOINs
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_
+from typing import Optional, List
 from datetime import date, datetime
-from database import get_db
+from database import get_async_db
 from models_denormalized import Exam, School, Class
+from utils.pagination import paginate
+from utils.projection import fields_param, get_with_fields
+from utils.encoders import json_response
+from utils.export import export_response
+from utils.etag import conditional_json
+from utils import propagation
+from utils.enrichment import Lookup
 from auth import get_current_active_user
 
 router = APIRouter(prefix="/data/exams", tags=["Exams (Denormalized)"])
 
 
-@router.get("/")
-@router.get("")
-async def get_exams(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=1000),
-    
+async def exam_filters(
     # Basic Filters
     school_id: Optional[int] = None,
     school_name: Optional[str] = None,
@@ -41,24 +43,9 @@ async def get_exams(
     # Marks Filters
     max_marks: Optional[int] = None,
     min_pass_marks: Optional[int] = None,
-    
-    # Sorting
-    sort_by: Optional[str] = Query("id"),
-    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
-    
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_active_user)
 ):
-    """
-    Get exams with advanced filtering
-    
-    Examples:
-    - All exams in school: ?school_id=1
-    - Exams by type: ?exam_type=Final
-    - Exams by date range: ?start_date_from=2024-01-01&start_date_to=2024-12-31
-    - Search: ?search=Mid-term
-    """
-    query = db.query(Exam)
+    """Filtered select(Exam) - the query parameters shared by the list and export endpoints"""
+    query = select(Exam)
     
     if school_id:
         query = query.filter(Exam.school_id == school_id)
@@ -97,63 +84,100 @@ async def get_exams(
     if min_pass_marks:
         query = query.filter(Exam.min_pass_marks == min_pass_marks)
     
-    total_count = query.count()
+    return query
+
+
+@router.get("/")
+@router.get("")
+async def get_exams(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page (keyset pagination)"),
+    include_total: bool = Query(True, description="Set false to skip the total count query"),
+    fields: Optional[List[str]] = Depends(fields_param),
     
-    if hasattr(Exam, sort_by):
-        if sort_order == "desc":
-            query = query.order_by(getattr(Exam, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Exam, sort_by).asc())
+    # Filters
+    query = Depends(exam_filters),
+    
+    # Sorting
+    sort_by: Optional[str] = Query("id"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
     
-    exams = query.offset(skip).limit(limit).all()
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Get exams with advanced filtering
     
-    return {
-        "total": total_count,
-        "page": skip // limit + 1,
-        "page_size": limit,
-        "total_pages": (total_count + limit - 1) // limit,
-        "data": exams
-    }
+    Examples:
+    - All exams in school: ?school_id=1
+    - Exams by type: ?exam_type=Final
+    - Exams by date range: ?start_date_from=2024-01-01&start_date_to=2024-12-31
+    - Search: ?search=Mid-term
+    """
+    return json_response(await paginate(
+        db, query, Exam,
+        skip=skip, limit=limit,
+        sort_by=sort_by, sort_order=sort_order,
+        cursor=cursor, include_total=include_total,
+        fields=fields
+    ))
+
+
+@router.get("/export")
+async def export_exams(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(exam_filters),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Stream every exam matching the list filters as NDJSON or CSV
+    Takes the same filters as the list endpoint; rows are read with a server-side cursor
+    """
+    return export_response(query, Exam, format, fields, "exams")
 
 
 @router.get("/{exam_id}")
 async def get_exam(
     exam_id: int,
-    db: Session = Depends(get_db),
+    fields: Optional[List[str]] = Depends(fields_param),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Get single exam"""
-    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    exam = await get_with_fields(db, Exam, exam_id, fields)
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
-    return exam
+    return json_response(exam)
 
 
 @router.post("/")
 async def create_exam(
     exam_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Create exam with all data"""
     # Get school name from schools table using school_id
     if exam_data.get('school_id'):
-        school = db.query(School).filter(School.id == exam_data['school_id']).first()
+        school = await Lookup(db).fetch(School, exam_data['school_id'])
         if school:
             exam_data['school_name'] = school.school_name
     
     # Get class names from classes table using class_ids
     if exam_data.get('class_ids'):
         class_ids = [int(id.strip()) for id in exam_data['class_ids'].split(',')]
-        classes = db.query(Class).filter(Class.id.in_(class_ids)).all()
+        lookup = await Lookup(db).want(Class, *class_ids).load()
+        classes = [lookup.get(Class, class_id) for class_id in class_ids if lookup.get(Class, class_id)]
         if classes:
             class_names = [cls.class_name for cls in classes if cls.class_name]
             exam_data['class_names'] = ', '.join(class_names)
     
     exam = Exam(**exam_data)
     db.add(exam)
-    db.commit()
-    db.refresh(exam)
+    await db.commit()
+    await db.refresh(exam)
     return exam
 
 
@@ -161,17 +185,18 @@ async def create_exam(
 async def update_exam(
     exam_id: int,
     update_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Update exam - any field"""
-    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    exam = await db.get(Exam, exam_id)
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
+    before = propagation.snapshot(exam)
     
     # If school_id is updated, fetch school name
     if 'school_id' in update_data:
-        school = db.query(School).filter(School.id == update_data['school_id']).first()
+        school = await Lookup(db).fetch(School, update_data['school_id'])
         if school:
             update_data['school_name'] = school.school_name
     
@@ -180,8 +205,9 @@ async def update_exam(
             setattr(exam, field, value)
     
     exam.updated_at = datetime.now()
-    db.commit()
-    db.refresh(exam)
+    await db.commit()
+    await db.refresh(exam)
+    await propagation.propagate_changes(exam, before)
     return exam
 
 
@@ -189,21 +215,21 @@ async def update_exam(
 async def delete_exam(
     exam_id: int,
     hard_delete: bool = Query(False),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Delete exam"""
-    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+    exam = await db.get(Exam, exam_id)
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
     
     if hard_delete:
-        db.delete(exam)
+        await db.delete(exam)
     else:
         exam.is_active = False
         exam.status = "cancelled"
     
-    db.commit()
+    await db.commit()
     return {"message": "Exam deleted successfully"}
 
 
@@ -212,29 +238,29 @@ async def get_exams_by_type(
     exam_type: str,
     school_id: Optional[int] = None,
     academic_year: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get exams by type"""
-    query = db.query(Exam).filter(Exam.exam_type == exam_type)
+    query = select(Exam).filter(Exam.exam_type == exam_type)
     if school_id:
         query = query.filter(Exam.school_id == school_id)
     if academic_year:
         query = query.filter(Exam.academic_year == academic_year)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/filters/upcoming")
 async def get_upcoming_exams(
     school_id: Optional[int] = None,
     days: int = Query(30, description="Number of days to look ahead"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get upcoming exams"""
     from datetime import timedelta
     today = date.today()
     future_date = today + timedelta(days=days)
     
-    query = db.query(Exam).filter(
+    query = select(Exam).filter(
         Exam.start_date >= today,
         Exam.start_date <= future_date,
         Exam.status != "cancelled"
@@ -242,47 +268,48 @@ async def get_upcoming_exams(
     if school_id:
         query = query.filter(Exam.school_id == school_id)
     
-    return query.order_by(Exam.start_date.asc()).all()
+    return (await db.execute(query.order_by(Exam.start_date.asc()))).scalars().all()
 
 
 @router.get("/filters/ongoing")
 async def get_ongoing_exams(
     school_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get ongoing exams"""
     today = date.today()
-    query = db.query(Exam).filter(
+    query = select(Exam).filter(
         Exam.start_date <= today,
         Exam.end_date >= today,
         Exam.status == "ongoing"
     )
     if school_id:
         query = query.filter(Exam.school_id == school_id)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/stats/summary")
 async def get_exam_stats(
+    request: Request,
     school_id: Optional[int] = None,
     academic_year: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get exam statistics"""
-    query = db.query(Exam)
+    query = select(Exam)
     if school_id:
         query = query.filter(Exam.school_id == school_id)
     if academic_year:
         query = query.filter(Exam.academic_year == academic_year)
     
-    all_exams = query.all()
+    all_exams = (await db.execute(query)).scalars().all()
     today = date.today()
     
-    return {
+    return conditional_json(request, {
         "total_exams": len(all_exams),
         "scheduled_exams": sum(1 for e in all_exams if e.status == "scheduled"),
         "ongoing_exams": sum(1 for e in all_exams if e.status == "ongoing"),
         "completed_exams": sum(1 for e in all_exams if e.status == "completed"),
         "cancelled_exams": sum(1 for e in all_exams if e.status == "cancelled"),
         "upcoming_exams": sum(1 for e in all_exams if e.start_date and e.start_date > today)
-    }
+    })
@@ -0,0 +1,58 @@
+"""
+Operational metrics endpoints
+"""
+from fastapi import APIRouter
+from database import engine, async_engine
+from utils.db_metrics import pool_metrics
+from utils.hashing import hash_pool_stats
+from utils import user_cache, propagation
+from utils.reference_cache import reference_cache
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/db-pool")
+async def get_db_pool_metrics():
+    """
+    Connection pool metrics for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW
+    - checked_out / checked_in / overflow: current gauges
+    - waited_checkouts / total_wait_ms / timeouts: requests that queued for a connection
+    - checkout_latency_ms: histogram of time to obtain a connection (wait + connect + pre-ping)
+    - connection_hold_time_ms: histogram of how long handlers keep a connection
+    """
+    return {
+        "async_engine": pool_metrics(async_engine.sync_engine.pool),
+        "sync_engine": pool_metrics(engine.pool)
+    }
+
+
+@router.get("/password-hashing")
+async def get_password_hashing_metrics():
+    """
+    Bounded bcrypt pool metrics for sizing PASSWORD_HASH_WORKERS
+    - queued / max_queued: calls waiting for a worker (now / peak)
+    - wait_time_ms: time spent queued, run_time_ms: bcrypt time itself
+    - rejected: calls answered with 503 because PASSWORD_HASH_MAX_QUEUE was reached
+    """
+    return hash_pool_stats.snapshot()
+
+
+@router.get("/user-cache")
+async def get_user_cache_metrics():
+    """Authenticated user cache hits/misses/invalidations and current size"""
+    return user_cache.stats()
+
+
+@router.get("/reference-cache")
+async def get_reference_cache_metrics():
+    """Read-through cache of schools/classes/subjects/fee structures: hits/misses/invalidations per table"""
+    return reference_cache.stats()
+
+
+@router.get("/propagation")
+async def get_propagation_metrics():
+    """
+    Denormalized-copy propagation: jobs run/queued/failed, rows and UPDATE statements issued,
+    and the background queue depth when PROPAGATION_ASYNC is on
+    """
+    return propagation.stats()
@@ -2,13 +2,15 @@
 Schools API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime, date
-from database import get_db
+from database import get_async_db
 from models_denormalized import School
 from auth import get_current_active_user
-from sqlalchemy import or_
+from utils import propagation
+from utils.reference_cache import reference_cache
+from sqlalchemy import or_, select
 
 router = APIRouter(prefix="/data/schools", tags=["Schools"])
 
@@ -69,11 +71,11 @@ async def get_schools(
     state: Optional[str] = None,
     school_type: Optional[str] = None,
     is_active: Optional[bool] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Get all schools with filtering"""
-    query = db.query(School)
+    query = select(School)
     
     # Apply filters
     if search:
@@ -93,17 +95,17 @@ async def get_schools(
     if is_active is not None:
         query = query.filter(School.is_active == is_active)
     
-    schools = query.offset(skip).limit(limit).all()
+    schools = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
     return schools
 
 @router.get("/{school_id}", response_model=SchoolResponse)
 async def get_school(
     school_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
-    """Get school by ID"""
-    school = db.query(School).filter(School.id == school_id).first()
+    """Get school by ID (read-through cache)"""
+    school = await reference_cache.get_values(db, School, school_id)
     if not school:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -114,15 +116,15 @@ async def get_school(
 @router.post("/", response_model=SchoolResponse)
 async def create_school(
     school: SchoolCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Create new school"""
     # Check if school with same name or code exists
-    existing = db.query(School).filter(
+    existing = await db.scalar(select(School).filter(
         (School.school_name == school.school_name) |
         (School.school_code == school.school_code)
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(
@@ -138,24 +140,25 @@ async def create_school(
     )
     
     db.add(db_school)
-    db.commit()
-    db.refresh(db_school)
+    await db.commit()
+    await db.refresh(db_school)
     return db_school
 
 @router.put("/{school_id}", response_model=SchoolResponse)
 async def update_school(
     school_id: int,
     school_update: SchoolUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Update school"""
-    school = db.query(School).filter(School.id == school_id).first()
+    school = await db.get(School, school_id)
     if not school:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="School not found"
         )
+    before = propagation.snapshot(school)
     
     # Update fields
     update_data = school_update.dict(exclude_unset=True)
@@ -163,18 +166,20 @@ async def update_school(
         setattr(school, field, value)
     
     school.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(school)
+    await db.commit()
+    await db.refresh(school)
+    await reference_cache.invalidate(School, school_id)
+    await propagation.propagate_changes(school, before)
     return school
 
 @router.delete("/{school_id}")
 async def delete_school(
     school_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Delete school (soft delete)"""
-    school = db.query(School).filter(School.id == school_id).first()
+    school = await db.get(School, school_id)
     if not school:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -183,6 +188,7 @@ async def delete_school(
     
     school.is_active = False
     school.updated_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    await reference_cache.invalidate(School, school_id)
     
     return {"message": "School deleted successfully"}
\ No newline at end of file
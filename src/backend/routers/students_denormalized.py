@@ -2,100 +2,91 @@
 Denormalized Student Router with Advanced Filtering
 All data in single table - use filters instead of JOINs
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, text
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, or_, and_, text, func, case
+from sqlalchemy.exc import IntegrityError
 from typing import Optional, List
 from datetime import date, datetime
-from database import get_db
+from database import get_async_db
 from models_denormalized import Student
 from models_denormalized import User, UserRole, Class, School  # Import User, Class and School models
 from schemas import StudentCreate, StudentUpdate, StudentResponse, PaginatedResponse, MessageResponse
-from auth import get_current_active_user, get_password_hash # Import password hashing
+from utils.pagination import paginate
+from utils.projection import fields_param, get_with_fields, fetch_columns
+from utils.encoders import json_response
+from utils.export import export_response
+from utils.etag import conditional_json, row_etag, etag_matches, etag_headers, not_modified
+from utils.sequences import next_value, next_values, max_numeric_suffix
+from utils.student_import import iter_csv_chunks, map_headers, validate_row, class_key, REQUIRED_COLUMNS
+from utils.hashing import hash_passwords
+from utils import user_cache, propagation
+from utils.search import build_search_text, student_search_filter
+from utils.suggest_index import student_suggestions
+from utils.enrichment import Lookup
+from auth import get_current_active_user, get_password_hash_async # Import password hashing
+import asyncio
 import json
-import re
+import time
 
 router = APIRouter(prefix="/data/students", tags=["Students (Denormalized)"])
 
 
 # ==================== HELPER FUNCTIONS ====================
 
-def generate_username(first_name: str, last_name: str, db: Session) -> str:
+async def generate_username(first_name: str, last_name: str, db: AsyncSession) -> str:
     """
     Generate unique username from first and last name
     Format: firstname.lastname or firstname.lastname2 if exists
+    Existing usernames with the same base are fetched in one query.
     """
     base_username = f"{first_name.lower()}.{last_name.lower()}" if last_name else first_name.lower()
+    taken = set((await db.execute(
+        select(User.username).filter(User.username.startswith(base_username, autoescape=True))
+    )).scalars().all())
+    
     username = base_username
     counter = 1
-    
-    # Check if username exists, if yes, append number
-    while db.query(User).filter(User.username == username).first():
+    while username in taken:
         counter += 1
         username = f"{base_username}{counter}"
     
     return username
 
 
-def generate_roll_no(db: Session, school_id: Optional[int] = None, school_name: Optional[str] = None) -> str:
+def _school_filter(school_id: Optional[int]) -> tuple:
+    return (Student.school_id == school_id,) if school_id else ()
+
+
+def roll_no_prefix(school_name: Optional[str]) -> str:
+    """First two letters of the school name, e.g. ST for St Marys"""
+    letters_only = "".join(filter(str.isalpha, school_name or ""))
+    return letters_only[:2].upper() if letters_only else "SC"
+
+
+async def generate_roll_no(db: AsyncSession, school_id: Optional[int] = None, school_name: Optional[str] = None) -> str:
     """
     Generate a per-school incremental roll_no.
-    Format: <FIRST2LETTERS><NNN> e.g. ST001. Uses existing Student.roll_no values to find max suffix.
+    Format: <FIRST2LETTERS><NNN> e.g. ST001. Taken from the roll_no:<prefix> sequence.
     """
-    # Determine prefix from school_name (letters only)
-    prefix = "SC"  # Default prefix
-    if school_name:
-        letters_only = "".join(filter(str.isalpha, school_name))
-        if letters_only:
-            prefix = letters_only[:2].upper()
-
-    query = db.query(Student).filter(Student.roll_no != None)
-    if school_id:
-        query = query.filter(Student.school_id == school_id)
-    query = query.filter(Student.roll_no.startswith(prefix))
-
-    existing = [r[0] for r in query.with_entities(Student.roll_no).all()]
-    max_num = 0
-    for r in existing:
-        m = re.search(r"(\d+)$", r)
-        if m:
-            try:
-                n = int(m.group(1))
-                if n > max_num:
-                    max_num = n
-            except ValueError:
-                continue
-
-    next_num = max_num + 1
+    prefix = roll_no_prefix(school_name)
+    next_num = await next_value(
+        db, f"roll_no:{prefix}", school_id,
+        seed=lambda: max_numeric_suffix(db, Student.roll_no, prefix, *_school_filter(school_id))
+    )
     return f"{prefix}{next_num:03d}"
 
 
-def generate_admission_no(db: Session, school_id: Optional[int] = None) -> str:
+async def generate_admission_no(db: AsyncSession, school_id: Optional[int] = None) -> str:
     """
     Generate admission number per school for the current year.
-    Format: ADMIN<YYYY><NNNN> e.g. ADMIN20250001 (zero-padded 4 digits)
+    Format: <YYYY><NNNN> e.g. 20250001 (zero-padded 4 digits). Taken from the admission_no:<YYYY> sequence.
     """
-    year = datetime.now().year
-    prefix = f"{year}"
-
-    query = db.query(Student).filter(Student.admission_no != None)
-    if school_id:
-        query = query.filter(Student.school_id == school_id)
-    query = query.filter(Student.admission_no.startswith(prefix))
-
-    existing = [r[0] for r in query.with_entities(Student.admission_no).all()]
-    max_num = 0
-    for r in existing:
-        m = re.search(r"(\d+)$", r)
-        if m:
-            try:
-                n = int(m.group(1))
-                if n > max_num:
-                    max_num = n
-            except ValueError:
-                continue
-
-    next_num = max_num + 1
+    prefix = f"{datetime.now().year}"
+    next_num = await next_value(
+        db, f"admission_no:{prefix}", school_id,
+        seed=lambda: max_numeric_suffix(db, Student.admission_no, prefix, *_school_filter(school_id))
+    )
     return f"{prefix}{next_num:04d}"
 
 
@@ -121,18 +112,18 @@ def calculate_age(date_of_birth):
     return age
 
 
-def create_user_for_student(student_data: dict, db: Session) -> User:
+async def create_user_for_student(student_data: dict, db: AsyncSession, hashed_password: Optional[str] = None) -> User:
     """
     Automatically create user account for student
     Username: firstname.lastname
-    Password: firstname@123
+    Password: firstname@123 (pass hashed_password if it was already computed)
     Role: student
     """
     first_name = student_data.get('first_name', '')
     last_name = student_data.get('last_name', '')
     
     # Generate username
-    username = generate_username(first_name, last_name, db)
+    username = await generate_username(first_name, last_name, db)
     
     # Generate email if not provided
     email = student_data.get('email')
@@ -140,12 +131,12 @@ def create_user_for_student(student_data: dict, db: Session) -> User:
         email = f"{username}@student.school.com"
     
     # Default password: firstname@123
-    default_password = f"{first_name.lower()}@123"
-    hashed_password = get_password_hash(default_password)
+    if hashed_password is None:
+        hashed_password = await get_password_hash_async(f"{first_name.lower()}@123")
     
     # Create user
     # Generate roll_no for the student and attach to both user and student_data
-    roll_no = generate_roll_no(db, school_id=student_data.get('school_id'), school_name=student_data.get('school_name'))
+    roll_no = await generate_roll_no(db, school_id=student_data.get('school_id'), school_name=student_data.get('school_name'))
     student_data['roll_no'] = roll_no
     
 
@@ -161,13 +152,19 @@ def create_user_for_student(student_data: dict, db: Session) -> User:
     )
     
     db.add(user)
-    db.flush()  # Flush to get user.id without committing
+    await db.flush()  # Flush to get user.id without committing
     
     return user
 
 
 
 
+async def load_school_and_class(db: AsyncSession, school_id: Optional[int], class_id: Optional[int]):
+    """Fetch the school and class rows for a new record (read through the reference cache)"""
+    lookup = await Lookup(db).want(School, school_id).want(Class, class_id).load()
+    return lookup.get(School, school_id), lookup.get(Class, class_id)
+
+
 # ==================== ADVANCED FILTER HELPERS ====================
 
 def apply_filters(query, filters: dict):
@@ -233,13 +230,7 @@ def apply_filters(query, filters: dict):
 
 # ==================== GET STUDENTS WITH FILTERS ====================
 
-@router.get("/")
-@router.get("")
-async def get_students(
-    # Pagination
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=1000),
-    
+async def student_filters(
     # Basic Filters
     school_id: Optional[int] = None,
     school_name: Optional[str] = None,
@@ -288,27 +279,13 @@ async def get_students(
     blood_group: Optional[str] = None,
     special_needs: Optional[bool] = None,
     
-    # Sorting
-    sort_by: Optional[str] = Query("id", description="Field to sort by"),
-    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
-    
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get students with advanced filtering
-    
-    Examples:
-    - All students in a school: ?school_id=1
-    - Students in a specific class: ?class_id=5&section=A
-    - Students with pending fees: ?fee_status=Pending
-    - Students using transport: ?transport_required=true
-    - Search by name: ?search=john
-    - Students by location: ?city=Mumbai&state=Maharashtra
-    - Fee range: ?fee_pending_min=1000&fee_pending_max=5000
-    - Attendance range: ?attendance_min=75&attendance_max=100
+    Filtered select(Student) - the query parameters shared by the list and export endpoints
+    Returns (query, relevance); relevance is the search ranking expression, or None
     """
-    query = db.query(Student)
+    query = select(Student)
     
     # Apply filters
     if school_id:
@@ -328,18 +305,12 @@ async def get_students(
     if gender:
         query = query.filter(Student.gender == gender)
     
-    # Search across multiple fields
+    # Search across name, admission_no, roll_no, email, phone - FULLTEXT on search_text
+    relevance = None
     if search:
-        search_filter = or_(
-            Student.first_name.contains(search),
-            Student.last_name.contains(search),
-            Student.full_name.contains(search),
-            Student.admission_no.contains(search),
-            Student.email.contains(search),
-            Student.phone.contains(search),
-            Student.roll_no.contains(search)
-        )
-        query = query.filter(search_filter)
+        search_filter, relevance = student_search_filter(search, db.bind.dialect.name)
+        if search_filter is not None:
+            query = query.filter(search_filter)
     
     # Specific field filters
     if first_name:
@@ -401,41 +372,119 @@ async def get_students(
     if special_needs is not None:
         query = query.filter(Student.special_needs == special_needs)
     
-    # Count total before pagination
-    total_count = query.count()
+    return query, relevance
+
+
+@router.get("/")
+@router.get("")
+async def get_students(
+    # Pagination
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page (keyset pagination)"),
+    include_total: bool = Query(True, description="Set false to skip the total count query"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    
+    # Filters
+    filtered = Depends(student_filters),
     
     # Sorting
-    if hasattr(Student, sort_by):
-        if sort_order == "desc":
-            query = query.order_by(getattr(Student, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Student, sort_by).asc())
+    sort_by: Optional[str] = Query(None, description="Field to sort by (default: relevance when searching, else id)"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
     
-    # Pagination
-    students = query.offset(skip).limit(limit).all()
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Get students with advanced filtering
     
+    Examples:
+    - All students in a school: ?school_id=1
+    - Students in a specific class: ?class_id=5&section=A
+    - Students with pending fees: ?fee_status=Pending
+    - Students using transport: ?transport_required=true
+    - Search by name: ?search=john (word prefixes, best matches first)
+    - Students by location: ?city=Mumbai&state=Maharashtra
+    - Fee range: ?fee_pending_min=1000&fee_pending_max=5000
+    - Attendance range: ?attendance_min=75&attendance_max=100
+    """
+    query, relevance = filtered
+    
+    # Best matches first unless an explicit sort was requested
+    order_by = None
+    if relevance is not None and sort_by in (None, "relevance"):
+        order_by = [relevance.desc()]
+    
+    return json_response(await paginate(
+        db, query, Student,
+        skip=skip, limit=limit,
+        sort_by=sort_by, sort_order=sort_order,
+        cursor=cursor, include_total=include_total,
+        order_by=order_by,
+        fields=fields
+    ))
+
+
+# ==================== TYPE-AHEAD SUGGESTIONS ====================
+
+@router.get("/suggest")
+async def suggest_students(
+    q: str = Query(..., min_length=1, max_length=100, description="Name, admission no, roll no, phone or email fragment"),
+    limit: int = Query(10, ge=1, le=50),
+    school_id: Optional[int] = Query(None, description="Defaults to the current user's school"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_active_user)
+):
+    """Top matches for a search box, served from the in-memory index"""
+    index = await student_suggestions.get(db, school_id or getattr(current_user, 'school_id', None))
+    start = time.perf_counter()
+    results = index.search(q, limit)
     return {
-        "total": total_count,
-        "page": skip // limit + 1,
-        "page_size": limit,
-        "total_pages": (total_count + limit - 1) // limit,
-        "data": students
+        "query": q,
+        "results": results,
+        "took_ms": round((time.perf_counter() - start) * 1000, 3)
     }
 
 
+# ==================== EXPORT ====================
+
+@router.get("/export")
+async def export_students(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    filtered = Depends(student_filters),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Stream every student matching the list filters as NDJSON or CSV
+    Takes the same filters as the list endpoint; rows are read with a server-side cursor
+    in id order, so memory stays flat for any number of students
+    """
+    query, _ = filtered
+    return export_response(query, Student, format, fields, "students")
+
+
 # ==================== GET SINGLE STUDENT ====================
 
 @router.get("/{student_id}")
 async def get_student(
     student_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    fields: Optional[List[str]] = Depends(fields_param),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ):
-    """Get single student by ID - returns ALL data from single table"""
-    student = db.query(Student).filter(Student.id == student_id).first()
+    """
+    Get single student by ID - returns ALL data from single table (or just ?fields=)
+    Answers If-None-Match with 304 after a primary-key SELECT of updated_at only.
+    """
+    etag = await row_etag(db, Student, student_id, fields)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    student = await get_with_fields(db, Student, student_id, fields)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-    return student
+    return json_response(student, headers=etag_headers(etag))
 
 
 # ==================== PROFILE ENDPOINTS - SPECIFIC CATEGORIES ====================
@@ -443,11 +492,15 @@ async def get_student(
 @router.get("/{student_id}/profile/personal")
 async def get_student_personal_info(
     student_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ):
     """Get student personal information"""
-    student = db.query(Student).filter(Student.id == student_id).first()
+    student = await fetch_columns(
+        db, Student, student_id,
+        "first_name", "last_name", "gender", "date_of_birth", "blood_group", "religion", "caste",
+        "category", "aadhar_number", "nationality"
+    )
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
@@ -468,11 +521,14 @@ async def get_student_personal_info(
 @router.get("/{student_id}/profile/contact")
 async def get_student_contact_info(
     student_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ):
     """Get student contact information"""
-    student = db.query(Student).filter(Student.id == student_id).first()
+    student = await fetch_columns(
+        db, Student, student_id,
+        "email", "phone", "address", "city", "state", "pincode"
+    )
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
@@ -489,11 +545,15 @@ async def get_student_contact_info(
 @router.get("/{student_id}/profile/parents")
 async def get_student_parents_info(
     student_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ):
     """Get student parents/guardian information"""
-    student = db.query(Student).filter(Student.id == student_id).first()
+    student = await fetch_columns(
+        db, Student, student_id,
+        "father_name", "father_phone", "father_occupation", "mother_name", "mother_phone",
+        "mother_occupation"
+    )
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
@@ -514,11 +574,15 @@ async def get_student_parents_info(
 @router.get("/{student_id}/profile/academic")
 async def get_student_academic_info(
     student_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ):
     """Get student academic information"""
-    student = db.query(Student).filter(Student.id == student_id).first()
+    student = await fetch_columns(
+        db, Student, student_id,
+        "admission_no", "class_name", "section", "roll_no", "academic_year", "admission_date",
+        "previous_school_name", "previous_class", "house"
+    )
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
@@ -538,11 +602,14 @@ async def get_student_academic_info(
 @router.get("/{student_id}/profile/transport")
 async def get_student_transport_info(
     student_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ):
     """Get student transport information"""
-    student = db.query(Student).filter(Student.id == student_id).first()
+    student = await fetch_columns(
+        db, Student, student_id,
+        "transport_required", "route_number", "pickup_point", "drop_point", "transport_fee"
+    )
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
@@ -558,16 +625,22 @@ async def get_student_transport_info(
 @router.get("/{student_id}/account")
 async def get_student_account_info(
     student_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ):
     """Get student account and login information"""
-    student = db.query(Student).filter(Student.id == student_id).first()
+    student = await fetch_columns(
+        db, Student, student_id,
+        "user_id", "first_name", "father_phone", "mother_phone", "guardian_phone"
+    )
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
     # Get user account details
-    user = db.query(User).filter(User.id == student.user_id).first()
+    user = await fetch_columns(
+        db, User, student.user_id,
+        "username", "last_login", "is_active", "is_first_login", "role"
+    ) if student.user_id else None
     
     return {
         "portal_login": {
@@ -593,11 +666,17 @@ async def get_student_account_info(
 @router.get("/{student_id}/audit-log")
 async def get_student_audit_log(
     student_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ):
     """Get student audit log and recent activity"""
-    student = db.query(Student).filter(Student.id == student_id).first()
+    student = await fetch_columns(
+        db, Student, student_id,
+        "created_at", "updated_at", "created_by", "updated_by", "last_payment_date",
+        "last_payment_amount", "class_name", "section", "academic_year", "birth_certificate_url",
+        "transfer_certificate_url", "marksheet_url", "aadhar_url", "current_percentage",
+        "current_grade", "current_rank", "is_active", "status", "remarks", "notes"
+    )
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
@@ -641,7 +720,7 @@ async def get_student_audit_log(
 @router.post("/")
 async def create_student(
     student_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_active_user)
 ):
     """
@@ -651,57 +730,55 @@ async def create_student(
     STEP 1: Create user account first
     STEP 2: Get user_id from created user
     STEP 3: Create student with user_id
+    
+    School and class are resolved in one query, admission_no/roll_no come from
+    the sequences table and the password hash is computed in a worker thread
+    while the school and class are loaded, so it is done before any sequence row
+    is locked.
     """
     # Ensure the student (and created user) belong to the current user's school
     if current_user:
-        # Force student to belong to current user's school
         student_data['school_id'] = getattr(current_user, 'school_id', None)
         student_data['school_name'] = getattr(current_user, 'school_name', None)
-        
-        # Get school_code from schools table using school_id
-        if student_data['school_id']:
-            school = db.query(School).filter(School.id == student_data['school_id']).first()
-            if school:
-                student_data['school_code'] = school.school_code
-                student_data['school_name'] = school.name
-                student_data['school_address'] = school.address
-                student_data['school_city'] = school.city
-                student_data['school_state'] = school.state
-                student_data['school_email'] = school.email
-                student_data['school_phone'] = school.phone
-
-        print(f"Setting student school info: school_id={student_data.get('school_id')}, school_name={student_data.get('school_name')}, school_code={student_data.get('school_code')}")
-
-
-    # Generate admission_no for the student if not provided
-    if not student_data.get('admission_no'):
-        student_data['admission_no'] = generate_admission_no(db, school_id=student_data.get('school_id'))
-
-    # Force admission_date to today's date
-    student_data['admission_date'] = date.today()
-    # Set created_at to current datetime and created_by to current user username
-    student_data['created_at'] = datetime.now()
-    if current_user:
-        student_data['created_by'] = getattr(current_user, 'username', None)
-    
-    # Calculate age if date_of_birth is provided
-    if student_data.get('date_of_birth'):
-        student_data['age'] = calculate_age(student_data.get('date_of_birth'))
-
-    # STEP 1: Create user account FIRST
-    user = create_user_for_student(student_data, db)
-    
-    # STEP 2: Add user_id to student_data
-    student_data['user_id'] = user.id
-    # STEP 3: Create student with user_id
     
-    # Auto-compute fields
-    if 'first_name' in student_data and 'last_name' in student_data:
-        student_data['full_name'] = f"{student_data['first_name']} {student_data['last_name']}"
-    
-    # Get class details from classes table using class_id
-    if student_data.get('class_id'):
-        cls = db.query(Class).filter(Class.id == student_data['class_id']).first()
+    # Start hashing the default password (firstname@123) right away - it is the slowest step
+    default_password = f"{student_data.get('first_name', '').lower()}@123"
+    hash_task = asyncio.ensure_future(get_password_hash_async(default_password))
+    try:
+        school, cls = await load_school_and_class(db, student_data.get('school_id'), student_data.get('class_id'))
+        
+        if school:
+            student_data['school_code'] = school.school_code
+            student_data['school_name'] = school.school_name
+            student_data['school_address'] = school.address
+            student_data['school_city'] = school.city
+            student_data['school_state'] = school.state
+            student_data['school_email'] = school.email
+            student_data['school_phone'] = school.phone
+        
+        # The sequence rows stay locked until commit - finish the hash before reserving numbers
+        hashed_password = await hash_task
+        
+        # Generate admission_no for the student if not provided
+        if not student_data.get('admission_no'):
+            student_data['admission_no'] = await generate_admission_no(db, school_id=student_data.get('school_id'))
+        
+        # Force admission_date to today's date
+        student_data['admission_date'] = date.today()
+        # Set created_at to current datetime and created_by to current user username
+        student_data['created_at'] = datetime.now()
+        if current_user:
+            student_data['created_by'] = getattr(current_user, 'username', None)
+        
+        # Calculate age if date_of_birth is provided
+        if student_data.get('date_of_birth'):
+            student_data['age'] = calculate_age(student_data.get('date_of_birth'))
+        
+        # Auto-compute fields
+        if 'first_name' in student_data and 'last_name' in student_data:
+            student_data['full_name'] = f"{student_data['first_name']} {student_data['last_name']}"
+        
+        # Class details from the classes table
         if cls:
             student_data['class_name'] = cls.class_name
             student_data['academic_year'] = cls.academic_year
@@ -714,45 +791,324 @@ async def create_student(
             # Create class_section if section is provided
             if student_data.get('section'):
                 student_data['class_section'] = f"{cls.class_name}-{student_data['section']}"
+        
+        # STEP 1: Create user account FIRST
+        user = await create_user_for_student(student_data, db, hashed_password=hashed_password)
+    except BaseException:
+        hash_task.cancel()
+        raise
+    
+    # STEP 2: Add user_id to student_data
+    student_data['user_id'] = user.id
+    
+    student_data['search_text'] = build_search_text(student_data)
     
     # STEP 3: Create student with user_id
     student = Student(**student_data)
-
     db.add(student)
-
-    print(f"Created user and student for {student_data['first_name']} in school {student_data.get('school_name')} (ID: {student_data.get('school_id')})")
-    db.commit()
-    db.refresh(student)
+    await db.commit()
+    student_suggestions.upsert(student)
     
-    # Return student with user info
+    # Return student with user info - columns that were not set are NULL, so no refresh query is needed
     return {
-        **student.__dict__,
+        **{column.key: student.__dict__.get(column.key) for column in Student.__table__.columns},
         "user_created": {
             "user_id": user.id,
             "username": user.username,
-            "password": f"{student_data['first_name'].lower()}@123",  # Show default password
+            "password": default_password,  # Show default password
             "role": user.role
         }
     }
 
     
 
+# ==================== BULK CSV IMPORT ====================
+
+async def _load_class_lookup(db: AsyncSession, school_id: Optional[int]) -> dict:
+    """All classes of a school keyed by (class_name, section), plus by id"""
+    query = select(Class)
+    if school_id:
+        query = query.filter(Class.school_id == school_id)
+    lookup = {}
+    for cls in (await db.execute(query)).scalars().all():
+        lookup[cls.id] = cls
+        lookup[class_key(cls.class_name, cls.section)] = cls
+        lookup.setdefault(class_key(cls.class_name, None), cls)
+    return lookup
+
+
+def _resolve_class(lookup: dict, data: dict):
+    """Find the class for an import row by class_id, or by class name + section ("9" also matches "Grade 9")"""
+    if data.get("class_id"):
+        return lookup.get(data["class_id"])
+    if not data.get("class_name"):
+        return None
+    for name in (data["class_name"], f"Grade {data['class_name']}"):
+        cls = lookup.get(class_key(name, data.get("section")))
+        if cls:
+            return cls
+    return None
+
+
+def _apply_school_and_class(data: dict, school, cls) -> None:
+    """Denormalized school/class fields, as in create_student"""
+    if school:
+        data['school_code'] = school.school_code
+        data['school_name'] = school.school_name
+        data['school_address'] = school.address
+        data['school_city'] = school.city
+        data['school_state'] = school.state
+        data['school_email'] = school.email
+        data['school_phone'] = school.phone
+    if cls:
+        data['class_id'] = cls.id
+        data['class_name'] = cls.class_name
+        data['academic_year'] = cls.academic_year
+        data['room_number'] = cls.room_number
+        data['class_teacher_id'] = cls.class_teacher_id
+        data['class_teacher_name'] = cls.class_teacher_name
+        data['class_teacher_phone'] = cls.class_teacher_phone
+        data['class_teacher_email'] = cls.class_teacher_email
+        if data.get('section'):
+            data['class_section'] = f"{cls.class_name}-{data['section']}"
+
+
+async def _write_import_chunk(db: AsyncSession, rows: List[dict], school_id, school_name, create_users: bool) -> List[dict]:
+    """
+    Insert one validated chunk: passwords hashed in the process pool, numbers from
+    the sequences (one update each), one INSERT for users and one for students
+    The sequence rows stay locked until the chunk commits, so they are reserved
+    only after the hashing, right before the INSERTs.
+    """
+    hashes = []
+    if create_users:
+        hashes = await hash_passwords([f"{data['first_name'].lower()}@123" for data in rows])
+    
+    missing_admission = [data for data in rows if not data.get('admission_no')]
+    if missing_admission:
+        prefix = f"{datetime.now().year}"
+        numbers = await next_values(
+            db, f"admission_no:{prefix}", len(missing_admission), school_id,
+            seed=lambda: max_numeric_suffix(db, Student.admission_no, prefix, *_school_filter(school_id))
+        )
+        for data, number in zip(missing_admission, numbers):
+            data['admission_no'] = f"{prefix}{number:04d}"
+    
+    missing_roll = [data for data in rows if not data.get('roll_no')]
+    if missing_roll:
+        prefix = roll_no_prefix(school_name)
+        numbers = await next_values(
+            db, f"roll_no:{prefix}", len(missing_roll), school_id,
+            seed=lambda: max_numeric_suffix(db, Student.roll_no, prefix, *_school_filter(school_id))
+        )
+        for data, number in zip(missing_roll, numbers):
+            data['roll_no'] = f"{prefix}{number:03d}"
+    
+    if create_users:
+        await db.execute(insert(User), [
+            {
+                "username": data['_username'],
+                "email": data.get('email') or f"{data['_username']}@student.school.com",
+                "hashed_password": hashed,
+                "role": "student",
+                "school_id": school_id,
+                "school_name": school_name,
+                "is_first_login": True,
+                "is_active": True
+            }
+            for data, hashed in zip(rows, hashes)
+        ])
+        user_ids = dict((await db.execute(
+            select(User.username, User.id).filter(User.username.in_([data['_username'] for data in rows]))
+        )).all())
+        for data in rows:
+            data['user_id'] = user_ids.get(data['_username'])
+    
+    for data in rows:
+        data['search_text'] = build_search_text(data)
+    
+    # Keys starting with "_" are import bookkeeping, not columns
+    await db.execute(insert(Student), [
+        {key: value for key, value in data.items() if not key.startswith('_')} for data in rows
+    ])
+    return [
+        {"row": data['_row'], "admission_no": data['admission_no'], "roll_no": data['roll_no'], "username": data.get('_username')}
+        for data in rows
+    ]
+
+
+@router.post("/import")
+async def import_students(
+    file: UploadFile = File(..., description="CSV file - header row with the template columns (firstName, lastName, admissionNo, class, section, ...)"),
+    dry_run: bool = Query(False, description="Validate and report only - nothing is written"),
+    create_users: bool = Query(True, description="Create a student login (firstname@123) for every row"),
+    chunk_size: int = Query(500, ge=1, le=5000, description="Rows validated and inserted per batch"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Bulk import students from CSV
+    - The file is parsed as a stream and processed chunk by chunk
+    - Each chunk is checked against the database with a few IN (...) queries,
+      passwords are hashed in a process pool, and users and students are
+      written with one INSERT each, committed per chunk
+    - Invalid rows are skipped and listed in the report with their line number
+    - dry_run=true runs the validation only
+    """
+    school_id = getattr(current_user, 'school_id', None)
+    school_name = getattr(current_user, 'school_name', None)
+    school = await Lookup(db).fetch(School, school_id)
+    if school:
+        school_name = school.school_name
+    classes = await _load_class_lookup(db, school_id)
+    
+    report = {
+        "dry_run": dry_run,
+        "total_rows": 0,
+        "imported": 0,
+        "failed": 0,
+        "ignored_columns": [],
+        "errors": [],
+        "students": []
+    }
+    seen_admission_nos, seen_emails, taken_usernames = set(), set(), set()
+    mapping = None
+    today, now = date.today(), datetime.now()
+    
+    for headers, chunk in iter_csv_chunks(file.file, chunk_size):
+        if mapping is None:
+            mapping, report["ignored_columns"] = map_headers(headers)
+            missing = [column for column in REQUIRED_COLUMNS if column not in mapping.values()]
+            if missing:
+                raise HTTPException(status_code=400, detail=f"Missing required columns: {', '.join(missing)}")
+        report["total_rows"] += len(chunk)
+        
+        # Row-level validation
+        candidates = []
+        for line_number, raw in chunk:
+            data, errors = validate_row(raw, mapping)
+            cls = _resolve_class(classes, data)
+            if (data.get('class_id') or data.get('class_name')) and not cls:
+                errors.append(f"class '{data.get('class_name') or data.get('class_id')}' section '{data.get('section', '')}' not found")
+            admission_no = data.get('admission_no')
+            if admission_no:
+                if admission_no in seen_admission_nos:
+                    errors.append(f"admission_no {admission_no} appears more than once in the file")
+                seen_admission_nos.add(admission_no)
+            email = (data.get('email') or '').lower()
+            if email:
+                if email in seen_emails:
+                    errors.append(f"email {data['email']} appears more than once in the file")
+                seen_emails.add(email)
+            if errors:
+                report["errors"].append({"row": line_number, "errors": errors})
+                continue
+            data['_row'] = line_number
+            _apply_school_and_class(data, school, cls)
+            candidates.append(data)
+        
+        # Chunk-level checks against the database - one query each
+        admission_nos = [data['admission_no'] for data in candidates if data.get('admission_no')]
+        existing_admission = set((await db.execute(
+            select(Student.admission_no).filter(Student.admission_no.in_(admission_nos))
+        )).scalars().all()) if admission_nos else set()
+        emails = [data['email'] for data in candidates if data.get('email')]
+        existing_emails = set(email.lower() for email in (await db.execute(
+            select(User.email).filter(User.email.in_(emails))
+        )).scalars().all()) if create_users and emails else set()
+        
+        valid = []
+        for data in candidates:
+            errors = []
+            if data.get('admission_no') in existing_admission:
+                errors.append(f"admission_no {data['admission_no']} already exists")
+            if data.get('email') and data['email'].lower() in existing_emails:
+                errors.append(f"email {data['email']} is already used by another account")
+            if errors:
+                report["errors"].append({"row": data['_row'], "errors": errors})
+            else:
+                valid.append(data)
+        
+        # Usernames: one prefix query for every base name in the chunk
+        if create_users and valid:
+            bases = {}
+            for data in valid:
+                last_name = data.get('last_name', '')
+                base = f"{data['first_name'].lower()}.{last_name.lower()}" if last_name else data['first_name'].lower()
+                bases[id(data)] = base
+            taken_usernames.update((await db.execute(
+                select(User.username).filter(or_(*[
+                    User.username.startswith(base, autoescape=True) for base in set(bases.values())
+                ]))
+            )).scalars().all())
+            for data in valid:
+                username, counter = bases[id(data)], 1
+                while username in taken_usernames:
+                    counter += 1
+                    username = f"{bases[id(data)]}{counter}"
+                taken_usernames.add(username)
+                data['_username'] = username
+        
+        for data in valid:
+            if data.get('last_name'):
+                data['full_name'] = f"{data['first_name']} {data['last_name']}"
+            else:
+                data['full_name'] = data['first_name']
+            if data.get('date_of_birth'):
+                data['age'] = calculate_age(data['date_of_birth'])
+            data['school_id'] = school_id
+            data['school_name'] = school_name
+            data['admission_date'] = today
+            data['created_at'] = now
+            data['created_by'] = getattr(current_user, 'username', None)
+        
+        if dry_run:
+            report["imported"] += len(valid)
+            report["students"].extend(
+                {"row": data['_row'], "admission_no": data.get('admission_no'), "username": data.get('_username')}
+                for data in valid
+            )
+            continue
+        
+        if not valid:
+            continue
+        try:
+            created = await _write_import_chunk(db, valid, school_id, school_name, create_users)
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            for data in valid:
+                report["errors"].append({"row": data.get('_row'), "errors": [f"chunk rejected by the database: {e.orig}"]})
+            continue
+        report["imported"] += len(created)
+        report["students"].extend(created)
+        student_suggestions.invalidate(school_id)
+    
+    if mapping is None:
+        raise HTTPException(status_code=400, detail="CSV file is empty")
+    
+    report["failed"] = len(report["errors"])
+    report["errors"].sort(key=lambda error: error["row"] or 0)
+    return report
+
+
 # ==================== UPDATE STUDENT ====================
 
 @router.put("/{student_id}")
 async def update_student(
     student_id: int,
     update_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """
     Update student - accepts ANY field
     All data in single table, no foreign key constraints
     """
-    student = db.query(Student).filter(Student.id == student_id).first()
+    student = await db.get(Student, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
+    before = propagation.snapshot(student)
     
     # Update all provided fields
     for field, value in update_data.items():
@@ -767,9 +1123,12 @@ async def update_student(
         if student.class_name and student.section:
             student.class_section = f"{student.class_name}-{student.section}"
     
+    student.search_text = build_search_text(student)
     student.updated_at = datetime.now()
-    db.commit()
-    db.refresh(student)
+    await db.commit()
+    await db.refresh(student)
+    student_suggestions.upsert(student)
+    await propagation.propagate_changes(student, before)
     return student
 
 
@@ -779,16 +1138,16 @@ async def update_student(
 async def delete_student(
     student_id: int,
     hard_delete: bool = Query(False, description="True for permanent delete, False for soft delete"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Delete student (soft delete by default)"""
-    student = db.query(Student).filter(Student.id == student_id).first()
+    student = await db.get(Student, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     
     if hard_delete:
-        db.delete(student)
+        await db.delete(student)
     else:
         student.is_active = False
         student.status = "inactive"
@@ -796,12 +1155,15 @@ async def delete_student(
         
         # Also update the users table
         if student.user_id:
-            user = db.query(User).filter(User.id == student.user_id).first()
+            user = await db.get(User, student.user_id)
             if user:
                 user.is_active = False
                 user.updated_at = datetime.now()
     
-    db.commit()
+    await db.commit()
+    student_suggestions.remove(student_id, student.school_id)
+    if not hard_delete and student.user_id:
+        user_cache.invalidate(user_id=student.user_id)
     return {"message": "Student deleted successfully", "hard_delete": hard_delete}
 
 
@@ -811,39 +1173,39 @@ async def delete_student(
 async def get_students_by_class(
     class_id: int,
     section: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all students in a specific class"""
-    query = db.query(Student).filter(Student.class_id == class_id)
+    query = select(Student).filter(Student.class_id == class_id)
     if section:
         query = query.filter(Student.section == section)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/filters/by-transport")
 async def get_students_by_transport(
     route_id: Optional[int] = None,
     transport_required: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all students using transport"""
-    query = db.query(Student).filter(Student.transport_required == transport_required)
+    query = select(Student).filter(Student.transport_required == transport_required)
     if route_id:
         query = query.filter(Student.route_id == route_id)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/filters/by-fee-status")
 async def get_students_by_fee_status(
     fee_status: str = Query(..., description="Paid, Pending, Overdue, Partial"),
     school_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get students by fee status"""
-    query = db.query(Student).filter(Student.fee_status == fee_status)
+    query = select(Student).filter(Student.fee_status == fee_status)
     if school_id:
         query = query.filter(Student.school_id == school_id)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/filters/with-pending-fees")
@@ -851,30 +1213,30 @@ async def get_students_with_pending_fees(
     min_amount: float = Query(0, ge=0),
     school_id: Optional[int] = None,
     class_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get students with pending fees above threshold"""
-    query = db.query(Student).filter(Student.fee_pending > min_amount)
+    query = select(Student).filter(Student.fee_pending > min_amount)
     if school_id:
         query = query.filter(Student.school_id == school_id)
     if class_id:
         query = query.filter(Student.class_id == class_id)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/filters/with-scholarship")
 async def get_scholarship_students(
     school_id: Optional[int] = None,
     min_percentage: Optional[float] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get students with scholarships"""
-    query = db.query(Student).filter(Student.has_scholarship == True)
+    query = select(Student).filter(Student.has_scholarship == True)
     if school_id:
         query = query.filter(Student.school_id == school_id)
     if min_percentage:
         query = query.filter(Student.scholarship_percentage >= min_percentage)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/filters/by-attendance")
@@ -882,10 +1244,10 @@ async def get_students_by_attendance(
     min_percentage: float = Query(75, ge=0, le=100),
     max_percentage: float = Query(100, ge=0, le=100),
     class_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get students by attendance percentage range"""
-    query = db.query(Student).filter(
+    query = select(Student).filter(
         and_(
             Student.total_attendance_percentage >= min_percentage,
             Student.total_attendance_percentage <= max_percentage
@@ -893,7 +1255,7 @@ async def get_students_by_attendance(
     )
     if class_id:
         query = query.filter(Student.class_id == class_id)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/filters/by-location")
@@ -901,60 +1263,115 @@ async def get_students_by_location(
     city: Optional[str] = None,
     state: Optional[str] = None,
     pincode: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get students by location"""
-    query = db.query(Student)
+    query = select(Student)
     if city:
         query = query.filter(Student.city == city)
     if state:
         query = query.filter(Student.state == state)
     if pincode:
         query = query.filter(Student.pincode == pincode)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/filters/special-needs")
 async def get_special_needs_students(
     school_id: Optional[int] = None,
     class_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get students with special needs"""
-    query = db.query(Student).filter(Student.special_needs == True)
+    query = select(Student).filter(Student.special_needs == True)
     if school_id:
         query = query.filter(Student.school_id == school_id)
     if class_id:
         query = query.filter(Student.class_id == class_id)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 # ==================== AGGREGATION ENDPOINTS ====================
 
+STATS_GROUP_BY_FIELDS = ("class_id", "section", "academic_year")
+
+
+def _count_if(condition):
+    """SUM(CASE WHEN condition THEN 1 ELSE 0 END)"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _student_stats_row(row) -> dict:
+    """Convert one aggregate result row into the stats response shape"""
+    return {
+        "total_students": int(row.total_students or 0),
+        "active_students": int(row.active_students or 0),
+        "male_students": int(row.male_students or 0),
+        "female_students": int(row.female_students or 0),
+        "transport_users": int(row.transport_users or 0),
+        "scholarship_students": int(row.scholarship_students or 0),
+        "special_needs_students": int(row.special_needs_students or 0),
+        "total_pending_fees": float(row.total_pending_fees or 0),
+        "average_attendance": float(row.average_attendance or 0)
+    }
+
+
 @router.get("/stats/summary")
 async def get_student_stats(
+    request: Request,
     school_id: Optional[int] = None,
     class_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    group_by: Optional[str] = Query(None, description="Comma-separated: class_id, section, academic_year"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get student statistics"""
-    query = db.query(Student)
-    
+    """
+    Get student statistics - computed in a single aggregate query
+
+    Examples:
+    - Whole school: ?school_id=1
+    - Per-class breakdown: ?school_id=1&group_by=class_id
+    - Per class and section: ?school_id=1&group_by=class_id,section
+    """
+    group_fields = []
+    if group_by:
+        group_fields = [f.strip() for f in group_by.split(',') if f.strip()]
+        invalid = [f for f in group_fields if f not in STATS_GROUP_BY_FIELDS]
+        if invalid:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid group_by field(s): {', '.join(invalid)}. Allowed: {', '.join(STATS_GROUP_BY_FIELDS)}"
+            )
+    group_columns = [getattr(Student, f) for f in group_fields]
+
+    query = select(
+        *group_columns,
+        func.count(Student.id).label("total_students"),
+        _count_if(Student.is_active == True).label("active_students"),
+        _count_if(Student.gender == "Male").label("male_students"),
+        _count_if(Student.gender == "Female").label("female_students"),
+        _count_if(Student.transport_required == True).label("transport_users"),
+        _count_if(Student.has_scholarship == True).label("scholarship_students"),
+        _count_if(Student.special_needs == True).label("special_needs_students"),
+        func.coalesce(func.sum(Student.fee_pending), 0).label("total_pending_fees"),
+        func.coalesce(func.avg(func.coalesce(Student.total_attendance_percentage, 0)), 0).label("average_attendance")
+    )
+
     if school_id:
         query = query.filter(Student.school_id == school_id)
     if class_id:
         query = query.filter(Student.class_id == class_id)
-    
-    all_students = query.all()
-    
-    return {
-        "total_students": len(all_students),
-        "active_students": sum(1 for s in all_students if s.is_active),
-        "male_students": sum(1 for s in all_students if s.gender == "Male"),
-        "female_students": sum(1 for s in all_students if s.gender == "Female"),
-        "transport_users": sum(1 for s in all_students if s.transport_required),
-        "scholarship_students": sum(1 for s in all_students if s.has_scholarship),
-        "special_needs_students": sum(1 for s in all_students if s.special_needs),
-        "total_pending_fees": sum(s.fee_pending or 0 for s in all_students),
-        "average_attendance": sum(s.total_attendance_percentage or 0 for s in all_students) / len(all_students) if all_students else 0
-    }
\ No newline at end of file
+
+    if not group_columns:
+        return conditional_json(request, _student_stats_row((await db.execute(query)).one()))
+
+    rows = (await db.execute(query.group_by(*group_columns).order_by(*group_columns))).all()
+    return conditional_json(request, {
+        "group_by": group_fields,
+        "groups": [
+            {
+                **{field: getattr(row, field) for field in group_fields},
+                **_student_stats_row(row)
+            }
+            for row in rows
+        ]
+    })
\ No newline at end of file
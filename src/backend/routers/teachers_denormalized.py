@@ -2,21 +2,31 @@
 Denormalized Teacher Router with Advanced Filtering
 All data in single table - use filters instead of JOINs
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_, and_
 from typing import Optional, List
 from datetime import date, datetime
-from database import get_db
+import time
+from database import get_async_db
 from models_denormalized import Teacher, User, School
-from auth import get_current_active_user, get_password_hash
+from utils.pagination import paginate
+from utils.projection import fields_param, get_with_fields
+from utils.encoders import json_response
+from utils.export import export_response
+from utils.etag import conditional_json
+from utils.sequences import next_value, max_numeric_suffix
+from utils import user_cache, propagation
+from utils.suggest_index import teacher_suggestions
+from utils.enrichment import Lookup
+from auth import get_current_active_user, get_password_hash_async
 
 router = APIRouter(prefix="/data/teachers", tags=["Teachers (Denormalized)"])
 
 
 # ==================== HELPER FUNCTIONS ====================
 
-def generate_username_teacher(first_name: str, last_name: str, db: Session) -> str:
+async def generate_username_teacher(first_name: str, last_name: str, db: AsyncSession) -> str:
     """
     Generate unique username from first and last name
     Format: firstname.lastname or firstname.lastname2 if exists
@@ -26,24 +36,24 @@ def generate_username_teacher(first_name: str, last_name: str, db: Session) -> s
     counter = 1
     
     # Check if username exists, if yes, append number
-    while db.query(User).filter(User.username == username).first():
+    while await db.scalar(select(User.id).filter(User.username == username)):
         counter += 1
         username = f"{base_username}{counter}"
     
     return username
 
 
-def generate_employee_id(db: Session, school_id: int = None) -> str:
+async def generate_employee_id(db: AsyncSession, school_id: int = None) -> str:
     """
-    Generate employee_id in format: TEACH + count of teachers + 1
-    Example: TEACH1, TEACH, TEACH, etc.
+    Generate employee_id in format: TEACH + next number of the school's employee_id sequence
+    Example: TEACH1, TEACH2, TEACH3, etc.
     """
-    query = db.query(Teacher)
-    if school_id:
-        query = query.filter(Teacher.school_id == school_id)
-    
-    teacher_count = query.count()
-    return f"TEACH{00+teacher_count + 1}"
+    filters = (Teacher.school_id == school_id,) if school_id else ()
+    next_num = await next_value(
+        db, "employee_id", school_id,
+        seed=lambda: max_numeric_suffix(db, Teacher.employee_id, "TEACH", *filters)
+    )
+    return f"TEACH{next_num}"
 
 
 def calculate_age(date_of_birth):
@@ -69,7 +79,7 @@ def calculate_age(date_of_birth):
 
 
 
-def create_user_for_teacher(teacher_data: dict, db: Session) -> User:
+async def create_user_for_teacher(teacher_data: dict, db: AsyncSession) -> User:
     """
     Automatically create user account for teacher
     Username: firstname.lastname
@@ -80,7 +90,7 @@ def create_user_for_teacher(teacher_data: dict, db: Session) -> User:
     last_name = teacher_data.get('last_name', '')
     
     # Generate username
-    username = generate_username_teacher(first_name, last_name, db)
+    username = await generate_username_teacher(first_name, last_name, db)
     
     # Generate email if not provided
     email = teacher_data.get('email')
@@ -89,7 +99,7 @@ def create_user_for_teacher(teacher_data: dict, db: Session) -> User:
     
     # Default password: firstname@123
     default_password = f"{first_name.lower()}@123"
-    hashed_password = get_password_hash(default_password)
+    hashed_password = await get_password_hash_async(default_password)
     
     # Create user
     user = User(
@@ -104,18 +114,12 @@ def create_user_for_teacher(teacher_data: dict, db: Session) -> User:
     )
     
     db.add(user)
-    db.flush()  # Flush to get user.id without committing
+    await db.flush()  # Flush to get user.id without committing
     
     return user
 
 
-@router.get("/")
-@router.get("")
-async def get_teachers(
-    # Pagination
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=1000),
-    
+async def teacher_filters(
     # Basic Filters
     school_id: Optional[int] = None,
     school_name: Optional[str] = None,
@@ -152,26 +156,9 @@ async def get_teachers(
     
     # Attendance Filters
     attendance_min: Optional[float] = None,
-    
-    # Sorting
-    sort_by: Optional[str] = Query("id", description="Field to sort by"),
-    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
-    
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_active_user)
 ):
-    """
-    Get teachers with advanced filtering
-    
-    Examples:
-    - All teachers in school: ?school_id=1
-    - Teachers by designation: ?designation=Principal
-    - Teachers by department: ?department=Science
-    - Search: ?search=john
-    - Salary range: ?salary_min=30000&salary_max=80000
-    - Class teachers only: ?is_class_teacher=true
-    """
-    query = db.query(Teacher)
+    """Filtered select(Teacher) - the query parameters shared by the list and export endpoints"""
+    query = select(Teacher)
     
     # Apply filters
     if school_id:
@@ -243,43 +230,100 @@ async def get_teachers(
     if attendance_min is not None:
         query = query.filter(Teacher.attendance_percentage >= attendance_min)
     
-    total_count = query.count()
+    return query
+
+
+@router.get("/")
+@router.get("")
+async def get_teachers(
+    # Pagination
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page (keyset pagination)"),
+    include_total: bool = Query(True, description="Set false to skip the total count query"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    
+    # Filters
+    query = Depends(teacher_filters),
     
     # Sorting
-    if hasattr(Teacher, sort_by):
-        if sort_order == "desc":
-            query = query.order_by(getattr(Teacher, sort_by).desc())
-        else:
-            query = query.order_by(getattr(Teacher, sort_by).asc())
+    sort_by: Optional[str] = Query("id", description="Field to sort by"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
     
-    teachers = query.offset(skip).limit(limit).all()
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Get teachers with advanced filtering
     
+    Examples:
+    - All teachers in school: ?school_id=1
+    - Teachers by designation: ?designation=Principal
+    - Teachers by department: ?department=Science
+    - Search: ?search=john
+    - Salary range: ?salary_min=30000&salary_max=80000
+    - Class teachers only: ?is_class_teacher=true
+    """
+    return json_response(await paginate(
+        db, query, Teacher,
+        skip=skip, limit=limit,
+        sort_by=sort_by, sort_order=sort_order,
+        cursor=cursor, include_total=include_total,
+        fields=fields
+    ))
+
+
+@router.get("/suggest")
+async def suggest_teachers(
+    q: str = Query(..., min_length=1, max_length=100, description="Name, employee id, phone or email fragment"),
+    limit: int = Query(10, ge=1, le=50),
+    school_id: Optional[int] = Query(None, description="Defaults to the current user's school"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Top matches for a search box, served from the in-memory index"""
+    index = await teacher_suggestions.get(db, school_id or getattr(current_user, 'school_id', None))
+    start = time.perf_counter()
+    results = index.search(q, limit)
     return {
-        "total": total_count,
-        "page": skip // limit + 1,
-        "page_size": limit,
-        "total_pages": (total_count + limit - 1) // limit,
-        "data": teachers
+        "query": q,
+        "results": results,
+        "took_ms": round((time.perf_counter() - start) * 1000, 3)
     }
 
 
+@router.get("/export")
+async def export_teachers(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(teacher_filters),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Stream every teacher matching the list filters as NDJSON or CSV
+    Takes the same filters as the list endpoint; rows are read with a server-side cursor
+    """
+    return export_response(query, Teacher, format, fields, "teachers")
+
+
 @router.get("/{teacher_id}")
 async def get_teacher(
     teacher_id: int,
-    db: Session = Depends(get_db),
+    fields: Optional[List[str]] = Depends(fields_param),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Get single teacher"""
-    teacher = db.query(Teacher).filter(Teacher.id == teacher_id).first()
+    teacher = await get_with_fields(db, Teacher, teacher_id, fields)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
-    return teacher
+    return json_response(teacher)
 
 
 @router.post("/")
 async def create_teacher(
     teacher_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """
@@ -296,7 +340,7 @@ async def create_teacher(
         
         # Get additional school details from schools table
         if teacher_data['school_id']:
-            school = db.query(School).filter(School.id == teacher_data['school_id']).first()
+            school = await Lookup(db).fetch(School, teacher_data['school_id'])
             if school:
                 teacher_data['school_code'] = school.school_code
                 teacher_data['school_name'] = school.school_name
@@ -306,7 +350,7 @@ async def create_teacher(
     
     # Generate employee_id if not provided
     if not teacher_data.get('employee_id'):
-        teacher_data['employee_id'] = generate_employee_id(db, school_id=teacher_data.get('school_id'))
+        teacher_data['employee_id'] = await generate_employee_id(db, school_id=teacher_data.get('school_id'))
 
     teacher_data['joining_date'] = date.today()
     
@@ -314,7 +358,7 @@ async def create_teacher(
         teacher_data['age'] = calculate_age(teacher_data.get('date_of_birth'))
     
     # STEP 1: Create user account FIRST
-    user = create_user_for_teacher(teacher_data, db)
+    user = await create_user_for_teacher(teacher_data, db)
     
     # Auto-compute fields
     if 'first_name' in teacher_data and 'last_name' in teacher_data:
@@ -324,8 +368,9 @@ async def create_teacher(
     teacher = Teacher(**teacher_data)
     db.add(teacher)
     
-    db.commit()
-    db.refresh(teacher)
+    await db.commit()
+    await db.refresh(teacher)
+    teacher_suggestions.upsert(teacher)
     
     # Return teacher with user info
     return {
@@ -343,13 +388,14 @@ async def create_teacher(
 async def update_teacher(
     teacher_id: int,
     update_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Update teacher - any field"""
-    teacher = db.query(Teacher).filter(Teacher.id == teacher_id).first()
+    teacher = await db.get(Teacher, teacher_id)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
+    before = propagation.snapshot(teacher)
     
     for field, value in update_data.items():
         if hasattr(teacher, field):
@@ -359,8 +405,10 @@ async def update_teacher(
         teacher.full_name = f"{teacher.first_name} {teacher.last_name}"
     
     teacher.updated_at = datetime.now()
-    db.commit()
-    db.refresh(teacher)
+    await db.commit()
+    await db.refresh(teacher)
+    teacher_suggestions.upsert(teacher)
+    await propagation.propagate_changes(teacher, before)
     return teacher
 
 
@@ -368,16 +416,17 @@ async def update_teacher(
 async def delete_teacher(
     teacher_id: int,
     hard_delete: bool = Query(False),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Delete teacher"""
-    teacher = db.query(Teacher).filter(Teacher.id == teacher_id).first()
+    teacher = await db.get(Teacher, teacher_id)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
     
+    deactivated_user = None
     if hard_delete:
-        db.delete(teacher)
+        await db.delete(teacher)
     else:
         teacher.is_active = False
         teacher.status = "inactive"
@@ -385,12 +434,16 @@ async def delete_teacher(
         
         # Also update the users table - find user by email
         if teacher.email:
-            user = db.query(User).filter(User.email == teacher.email).first()
+            user = await db.scalar(select(User).filter(User.email == teacher.email))
             if user:
                 user.is_active = False
                 user.updated_at = datetime.now()
+                deactivated_user = user
     
-    db.commit()
+    await db.commit()
+    teacher_suggestions.remove(teacher_id, teacher.school_id)
+    if deactivated_user:
+        user_cache.invalidate(username=deactivated_user.username, user_id=deactivated_user.id)
     return {"message": "Teacher deleted successfully"}
 
 
@@ -399,40 +452,41 @@ async def delete_teacher(
 async def get_teachers_by_department(
     department: str,
     school_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get teachers by department"""
-    query = db.query(Teacher).filter(Teacher.department == department)
+    query = select(Teacher).filter(Teacher.department == department)
     if school_id:
         query = query.filter(Teacher.school_id == school_id)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/filters/class-teachers")
 async def get_class_teachers(
     school_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all class teachers"""
-    query = db.query(Teacher).filter(Teacher.is_class_teacher == True)
+    query = select(Teacher).filter(Teacher.is_class_teacher == True)
     if school_id:
         query = query.filter(Teacher.school_id == school_id)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/stats/summary")
 async def get_teacher_stats(
+    request: Request,
     school_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get teacher statistics"""
-    query = db.query(Teacher)
+    query = select(Teacher)
     if school_id:
         query = query.filter(Teacher.school_id == school_id)
     
-    all_teachers = query.all()
+    all_teachers = (await db.execute(query)).scalars().all()
     
-    return {
+    return conditional_json(request, {
         "total_teachers": len(all_teachers),
         "active_teachers": sum(1 for t in all_teachers if t.is_active),
         "class_teachers": sum(1 for t in all_teachers if t.is_class_teacher),
@@ -440,4 +494,4 @@ async def get_teacher_stats(
         "contract_teachers": sum(1 for t in all_teachers if t.employment_type == "Contract"),
         "average_experience": sum(t.experience_years or 0 for t in all_teachers) / len(all_teachers) if all_teachers else 0,
         "average_salary": sum(t.net_salary or 0 for t in all_teachers) / len(all_teachers) if all_teachers else 0
-    }
\ No newline at end of file
+    })
\ No newline at end of file
@@ -2,24 +2,26 @@
 Denormalized Transport Router with Advanced Filtering
 All data in single table - use filters instead of JOINs
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_
+from typing import Optional, List
 from datetime import datetime
-from database import get_db
+from database import get_async_db
 from models_denormalized import TransportRoute, School, Student
+from utils.pagination import paginate
+from utils.projection import fields_param, get_with_fields
+from utils.encoders import json_response
+from utils.export import export_response
+from utils.etag import conditional_json
+from utils import propagation
+from utils.enrichment import Lookup
 from auth import get_current_active_user
 
 router = APIRouter(prefix="/data/transport/routes", tags=["Transport (Denormalized)"])
 
 
-@router.get("/")
-@router.get("")
-async def get_transport_routes(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=1000),
-    
+async def route_filters(
     # Basic Filters
     school_id: Optional[int] = None,
     school_name: Optional[str] = None,
@@ -47,24 +49,9 @@ async def get_transport_routes(
     # Student Filters
     total_students_min: Optional[int] = None,
     total_students_max: Optional[int] = None,
-    
-    # Sorting
-    sort_by: Optional[str] = Query("id"),
-    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
-    
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_active_user)
 ):
-    """
-    Get transport routes with advanced filtering
-    
-    Examples:
-    - All routes in school: ?school_id=1
-    - Routes by vehicle type: ?vehicle_type=Bus
-    - Routes with capacity: ?capacity_min=40&capacity_max=60
-    - Search: ?search=Route A
-    """
-    query = db.query(TransportRoute)
+    """Filtered select(TransportRoute) - the query parameters shared by the list and export endpoints"""
+    query = select(TransportRoute)
     
     if school_id:
         query = query.filter(TransportRoute.school_id == school_id)
@@ -111,48 +98,92 @@ async def get_transport_routes(
     if total_students_max:
         query = query.filter(TransportRoute.total_students <= total_students_max)
     
-    total_count = query.count()
+    return query
+
+
+@router.get("/")
+@router.get("")
+async def get_transport_routes(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page (keyset pagination)"),
+    include_total: bool = Query(True, description="Set false to skip the total count query"),
+    fields: Optional[List[str]] = Depends(fields_param),
     
-    if hasattr(TransportRoute, sort_by):
-        if sort_order == "desc":
-            query = query.order_by(getattr(TransportRoute, sort_by).desc())
-        else:
-            query = query.order_by(getattr(TransportRoute, sort_by).asc())
+    # Filters
+    query = Depends(route_filters),
     
-    routes = query.offset(skip).limit(limit).all()
+    # Sorting
+    sort_by: Optional[str] = Query("id"),
+    sort_order: Optional[str] = Query("asc", regex="^(asc|desc)$"),
     
-    return {
-        "total": total_count,
-        "page": skip // limit + 1,
-        "page_size": limit,
-        "total_pages": (total_count + limit - 1) // limit,
-        "data": routes
-    }
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Get transport routes with advanced filtering
+    
+    Examples:
+    - All routes in school: ?school_id=1
+    - Routes by vehicle type: ?vehicle_type=Bus
+    - Routes with capacity: ?capacity_min=40&capacity_max=60
+    - Search: ?search=Route A
+    """
+    return json_response(await paginate(
+        db, query, TransportRoute,
+        skip=skip, limit=limit,
+        sort_by=sort_by, sort_order=sort_order,
+        cursor=cursor, include_total=include_total,
+        fields=fields
+    ))
+
+
+@router.get("/export")
+async def export_transport_routes(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[List[str]] = Depends(fields_param),
+    query = Depends(route_filters),
+    current_user: dict = Depends(get_current_active_user)
+):
+    """
+    Stream every transport route matching the list filters as NDJSON or CSV
+    Takes the same filters as the list endpoint; rows are read with a server-side cursor
+    """
+    return export_response(query, TransportRoute, format, fields, "transport-routes")
 
 
 @router.get("/{route_id}")
 async def get_transport_route(
     route_id: int,
-    db: Session = Depends(get_db),
+    fields: Optional[List[str]] = Depends(fields_param),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Get single transport route"""
-    route = db.query(TransportRoute).filter(TransportRoute.id == route_id).first()
+    route = await get_with_fields(db, TransportRoute, route_id, fields)
     if not route:
         raise HTTPException(status_code=404, detail="Transport route not found")
-    return route
+    return json_response(route)
 
 
 @router.post("/")
 async def create_transport_route(
     route_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Create transport route with all data"""
+    # School and every student in student_list come from one query each
+    lookup = await (
+        Lookup(db)
+        .want(School, route_data.get('school_id'))
+        .want(Student, *[entry.get('student_id') for entry in route_data.get('student_list') or []])
+        .load()
+    )
+    
     # Get school name from schools table using school_id
     if route_data.get('school_id'):
-        school = db.query(School).filter(School.id == route_data['school_id']).first()
+        school = lookup.get(School, route_data['school_id'])
         if school:
             route_data['school_name'] = school.school_name
     
@@ -160,7 +191,7 @@ async def create_transport_route(
     if route_data.get('student_list'):
         for student_info in route_data['student_list']:
             if student_info.get('student_id'):
-                student = db.query(Student).filter(Student.id == student_info['student_id']).first()
+                student = lookup.get(Student, student_info['student_id'])
                 if student:
                     student_info['student_name'] = student.full_name
                     student_info['class'] = student.class_section or f"{student.class_name}-{student.section}"
@@ -168,8 +199,8 @@ async def create_transport_route(
     
     route = TransportRoute(**route_data)
     db.add(route)
-    db.commit()
-    db.refresh(route)
+    await db.commit()
+    await db.refresh(route)
     return route
 
 
@@ -177,17 +208,26 @@ async def create_transport_route(
 async def update_transport_route(
     route_id: int,
     update_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Update transport route - any field"""
-    route = db.query(TransportRoute).filter(TransportRoute.id == route_id).first()
+    route = await db.get(TransportRoute, route_id)
     if not route:
         raise HTTPException(status_code=404, detail="Transport route not found")
+    before = propagation.snapshot(route)
+    
+    # School and every student in student_list come from one query each
+    lookup = await (
+        Lookup(db)
+        .want(School, update_data.get('school_id'))
+        .want(Student, *[entry.get('student_id') for entry in update_data.get('student_list') or []])
+        .load()
+    )
     
     # If school_id is updated, fetch school name
     if 'school_id' in update_data:
-        school = db.query(School).filter(School.id == update_data['school_id']).first()
+        school = lookup.get(School, update_data['school_id'])
         if school:
             update_data['school_name'] = school.school_name
     
@@ -195,7 +235,7 @@ async def update_transport_route(
     if 'student_list' in update_data:
         for student_info in update_data['student_list']:
             if student_info.get('student_id'):
-                student = db.query(Student).filter(Student.id == student_info['student_id']).first()
+                student = lookup.get(Student, student_info['student_id'])
                 if student:
                     student_info['student_name'] = student.full_name
                     student_info['class'] = student.class_section or f"{student.class_name}-{student.section}"
@@ -206,8 +246,9 @@ async def update_transport_route(
             setattr(route, field, value)
     
     route.updated_at = datetime.now()
-    db.commit()
-    db.refresh(route)
+    await db.commit()
+    await db.refresh(route)
+    await propagation.propagate_changes(route, before)
     return route
 
 
@@ -215,21 +256,21 @@ async def update_transport_route(
 async def delete_transport_route(
     route_id: int,
     hard_delete: bool = Query(False),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Delete transport route"""
-    route = db.query(TransportRoute).filter(TransportRoute.id == route_id).first()
+    route = await db.get(TransportRoute, route_id)
     if not route:
         raise HTTPException(status_code=404, detail="Transport route not found")
     
     if hard_delete:
-        db.delete(route)
+        await db.delete(route)
     else:
         route.is_active = False
         route.status = "inactive"
     
-    db.commit()
+    await db.commit()
     return {"message": "Transport route deleted successfully"}
 
 
@@ -237,27 +278,27 @@ async def delete_transport_route(
 async def get_routes_by_vehicle_type(
     vehicle_type: str,
     school_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get routes by vehicle type"""
-    query = db.query(TransportRoute).filter(TransportRoute.vehicle_type == vehicle_type)
+    query = select(TransportRoute).filter(TransportRoute.vehicle_type == vehicle_type)
     if school_id:
         query = query.filter(TransportRoute.school_id == school_id)
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/filters/underutilized")
 async def get_underutilized_routes(
     threshold_percent: int = Query(50, description="Utilization threshold percentage"),
     school_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get routes with low utilization"""
-    query = db.query(TransportRoute)
+    query = select(TransportRoute)
     if school_id:
         query = query.filter(TransportRoute.school_id == school_id)
     
-    all_routes = query.all()
+    all_routes = (await db.execute(query)).scalars().all()
     underutilized = [
         r for r in all_routes 
         if r.vehicle_capacity and r.total_students 
@@ -269,20 +310,21 @@ async def get_underutilized_routes(
 
 @router.get("/stats/summary")
 async def get_transport_stats(
+    request: Request,
     school_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get transport statistics"""
-    query = db.query(TransportRoute)
+    query = select(TransportRoute)
     if school_id:
         query = query.filter(TransportRoute.school_id == school_id)
     
-    all_routes = query.all()
+    all_routes = (await db.execute(query)).scalars().all()
     
     total_capacity = sum(r.vehicle_capacity or 0 for r in all_routes)
     total_students = sum(r.total_students or 0 for r in all_routes)
     
-    return {
+    return conditional_json(request, {
         "total_routes": len(all_routes),
         "active_routes": sum(1 for r in all_routes if r.is_active),
         "total_vehicles": len(all_routes),
@@ -292,4 +334,4 @@ async def get_transport_stats(
         "total_students_using_transport": total_students,
         "average_utilization": (total_students / total_capacity * 100) if total_capacity > 0 else 0,
         "total_monthly_revenue": sum(r.monthly_fee * r.total_students if r.monthly_fee and r.total_students else 0 for r in all_routes)
-    }
+    })
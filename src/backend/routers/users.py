@@ -2,13 +2,14 @@
 Users API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
-from database import get_db
+from database import get_async_db
 from models_denormalized import User, UserRole
-from auth import get_current_active_user, get_password_hash, verify_password
-from sqlalchemy import or_
+from auth import get_current_active_user, get_password_hash_async
+from utils import user_cache
+from sqlalchemy import or_, select
 
 router = APIRouter(prefix="/data/users", tags=["Users"])
 
@@ -55,11 +56,11 @@ async def get_users(
     role: Optional[UserRole] = None,
     school_id: Optional[int] = None,
     is_active: Optional[bool] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Get all users with filtering"""
-    query = db.query(User)
+    query = select(User)
     
     # Apply filters
     if search:
@@ -76,17 +77,17 @@ async def get_users(
     if is_active is not None:
         query = query.filter(User.is_active == is_active)
     
-    users = query.offset(skip).limit(limit).all()
+    users = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
     return users
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Get user by ID"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -97,14 +98,14 @@ async def get_user(
 @router.post("/", response_model=UserResponse)
 async def create_user(
     user: UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Create new user"""
     # Check if user exists
-    existing = db.query(User).filter(
+    existing = await db.scalar(select(User).filter(
         (User.username == user.username) | (User.email == user.email)
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(
@@ -113,7 +114,7 @@ async def create_user(
         )
     
     # Hash password
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     
     db_user = User(
         username=user.username,
@@ -128,19 +129,19 @@ async def create_user(
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
     user_id: int,
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Update user"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -149,10 +150,10 @@ async def update_user(
     
     # Check for duplicate username/email
     if user_update.username or user_update.email:
-        existing = db.query(User).filter(
+        existing = await db.scalar(select(User).filter(
             User.id != user_id,
             (User.username == user_update.username) | (User.email == user_update.email)
-        ).first()
+        ))
         
         if existing:
             raise HTTPException(
@@ -166,19 +167,20 @@ async def update_user(
         setattr(user, field, value)
     
     user.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    user_cache.invalidate(user_id=user.id)
+    await db.refresh(user)
     return user
 
 @router.put("/{user_id}/password")
 async def reset_user_password(
     user_id: int,
     password_reset: PasswordReset,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Reset user password (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -186,21 +188,22 @@ async def reset_user_password(
         )
     
     # Hash new password
-    user.hashed_password = get_password_hash(password_reset.new_password)
+    user.hashed_password = await get_password_hash_async(password_reset.new_password)
     user.is_first_login = True
     user.updated_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(username=user.username, user_id=user.id)
     
     return {"message": "Password reset successfully"}
 
 @router.delete("/{user_id}")
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_active_user)
 ):
     """Delete user (soft delete)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -209,6 +212,7 @@ async def delete_user(
     
     user.is_active = False
     user.updated_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(username=user.username, user_id=user.id)
     
     return {"message": "User deleted successfully"}
\ No newline at end of file
@@ -2,7 +2,7 @@
 Pydantic schemas for request/response validation
 """
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import date, datetime
 from models_denormalized import UserRole
 
@@ -312,11 +312,20 @@ class AttendanceCreate(AttendanceBase):
     marked_by: int
 
 
+class AttendanceBulkEntry(BaseModel):
+    student_id: int
+    status: str  # present, absent, late, half_day, on_leave
+    remarks: Optional[str] = None
+    reason: Optional[str] = None
+    late_by_minutes: Optional[int] = None
+
+
 class AttendanceBulkCreate(BaseModel):
     class_id: int
     date: date
-    attendance_list: List[dict]  # [{"student_id": 1, "status": "present"}, ...]
+    attendance_list: List[AttendanceBulkEntry]  # [{"student_id": 1, "status": "present"}, ...]
     marked_by: int
+    subject_id: Optional[int] = None  # None = daily attendance
 
 
 class AttendanceResponse(AttendanceBase):
@@ -416,10 +425,28 @@ class MarkCreate(MarkBase):
     entered_by: int
 
 
+class MarkBulkEntry(BaseModel):
+    student_id: int
+    subject_id: Optional[int] = None  # defaults to MarkBulkCreate.subject_id
+    marks_obtained: Optional[float] = None  # defaults to theory + practical
+    theory_marks: Optional[float] = None
+    practical_marks: Optional[float] = None
+    max_marks: Optional[float] = None  # defaults to MarkBulkCreate.max_marks / exam max_marks
+    is_absent: bool = False
+    remarks: Optional[str] = None
+
+
+class MarkMatrixRow(BaseModel):
+    student_id: int
+    scores: Dict[int, Optional[float]]  # {subject_id: marks_obtained}, null = absent
+
+
 class MarkBulkCreate(BaseModel):
     exam_id: int
-    subject_id: int
-    marks_list: List[dict]  # [{"student_id": 1, "marks_obtained": 85}, ...]
+    subject_id: Optional[int] = None
+    marks_list: List[MarkBulkEntry] = []  # [{"student_id": 1, "marks_obtained": 85}, ...]
+    matrix: List[MarkMatrixRow] = []  # [{"student_id": 1, "scores": {"3": 85, "4": 72}}, ...]
+    max_marks: Optional[float] = None
     entered_by: int
 
 
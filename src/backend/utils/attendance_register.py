@@ -0,0 +1,71 @@
+"""
+Attendance register - a class's attendance for a date range as a student x day grid
+Built from one range scan on (class_id, date) and pivoted here, so the client
+gets a few short columns instead of a row object per student per day:
+
+    {"students": [12, 15], "dates": ["2026-09-01", "2026-09-02", ...],
+     "statuses": ["", "present", "absent", ...],        # code -> status
+     "matrix": [[1, 1, 2, 0, ...], [1, 3, 1, 0, ...]]}  # one row per student
+
+With encoding=rle each row is a run-length string instead ("5x1,2,0,3x1"), which
+is much shorter for the usual long runs of present days and unmarked weekends.
+Code 0 means no record for that day.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Sequence
+from utils.attendance_rollups import ROLLUP_STATUSES
+
+
+def run_length(codes: Sequence[int]) -> str:
+    """[1, 1, 1, 2, 0, 0] -> "3x1,2,2x0" """
+    runs: List[str] = []
+    i = 0
+    while i < len(codes):
+        j = i
+        while j < len(codes) and codes[j] == codes[i]:
+            j += 1
+        runs.append(f"{j - i}x{codes[i]}" if j - i > 1 else str(codes[i]))
+        i = j
+    return ",".join(runs)
+
+
+def build_register(rows: Iterable[Any], date_from: date, date_to: date, encoding: str = "ints") -> Dict[str, Any]:
+    """
+    Pivot (student_id, student_name, roll_no, date, status) rows into the columnar register
+    Every day in [date_from, date_to] gets a column; students appear in row order.
+    A status outside ROLLUP_STATUSES gets the next free code.
+    """
+    days = (date_to - date_from).days + 1
+    statuses = ["", *ROLLUP_STATUSES]
+    codes = {status: code for code, status in enumerate(statuses)}
+    students: List[int] = []
+    names: List[str] = []
+    roll_nos: List[str] = []
+    matrix: List[List[int]] = []
+    index: Dict[int, int] = {}
+
+    for row in rows:
+        position = index.get(row.student_id)
+        if position is None:
+            position = index[row.student_id] = len(students)
+            students.append(row.student_id)
+            names.append(row.student_name)
+            roll_nos.append(row.roll_no)
+            matrix.append([0] * days)
+        code = codes.get(row.status)
+        if code is None:
+            code = codes[row.status] = len(statuses)
+            statuses.append(row.status)
+        matrix[position][(row.date - date_from).days] = code
+
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "dates": [(date_from + timedelta(days=offset)).isoformat() for offset in range(days)],
+        "statuses": statuses,
+        "students": students,
+        "student_names": names,
+        "roll_nos": roll_nos,
+        "encoding": encoding,
+        "matrix": [run_length(codes_row) for codes_row in matrix] if encoding == "rle" else matrix,
+    }
@@ -0,0 +1,199 @@
+"""
+Attendance rollups: per-student monthly counts in attendance_rollups
+Monthly reports and Student.total_attendance_percentage used to need every raw
+attendance row. Instead each attendance write records its +1/-1 per status in a
+RollupChanges and applies it in the same transaction:
+
+    changes = RollupChanges()
+    changes.remove(attendance)           # before an update/delete
+    ... change the record ...
+    changes.add(attendance)              # after a create/update
+    await changes.apply(db)              # then commit
+
+apply() issues one UPDATE per distinct delta (a bulk "all present" is a single
+statement), one multi-row INSERT for new (student, year, month) keys, and one
+set-based UPDATE of the affected students' total_attendance_percentage.
+
+Counts are per attendance record (a day, or a period when marked per subject).
+percentage = (present + late + half_day / 2) / (present + absent + late + half_day),
+over the student's latest academic year; on_leave days are not counted.
+rebuild_attendance_rollups.py recomputes everything from the raw rows.
+"""
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import case, delete, extract, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from models_denormalized import Attendance, AttendanceRollup, Student
+
+ROLLUP_STATUSES = ("present", "absent", "late", "half_day", "on_leave")
+
+RollupKey = Tuple[int, str, int]  # (student_id, academic_year, month)
+
+
+def _value(record: Any, name: str) -> Any:
+    return record.get(name) if isinstance(record, dict) else getattr(record, name, None)
+
+
+def rollup_key(record: Any) -> Optional[RollupKey]:
+    """Key of an Attendance (or dict of its columns); None when it cannot be placed"""
+    student_id = _value(record, "student_id")
+    month = _value(record, "month")
+    if not month:
+        day = _value(record, "date")
+        if isinstance(day, str):
+            day = date.fromisoformat(day[:10])
+        month = day.month if day else None
+    if not student_id or not month:
+        return None
+    return int(student_id), _value(record, "academic_year") or "", int(month)
+
+
+class RollupChanges:
+    """Status deltas per rollup key, collected while attendance records change"""
+
+    def __init__(self):
+        self.deltas: Dict[RollupKey, Counter] = defaultdict(Counter)
+        self.details: Dict[RollupKey, dict] = {}
+
+    def add(self, record: Any, sign: int = 1) -> None:
+        status = _value(record, "status")
+        key = rollup_key(record)
+        if key is None or status not in ROLLUP_STATUSES:
+            return
+        self.deltas[key][status] += sign
+        if sign > 0:
+            self.details[key] = {
+                "school_id": _value(record, "school_id"),
+                "class_id": _value(record, "class_id"),
+                "student_name": _value(record, "student_name"),
+            }
+
+    def remove(self, record: Any) -> None:
+        self.add(record, -1)
+
+    async def apply(self, db: AsyncSession) -> None:
+        """Write the deltas into attendance_rollups and refresh the students' percentages"""
+        by_period: Dict[Tuple[str, int], Dict[int, Tuple[int, ...]]] = defaultdict(dict)
+        for (student_id, academic_year, month), counts in self.deltas.items():
+            vector = tuple(counts.get(status, 0) for status in ROLLUP_STATUSES)
+            if any(vector):
+                by_period[(academic_year, month)][student_id] = vector
+        for (academic_year, month), vectors in by_period.items():
+            await _apply_period(db, academic_year, month, vectors, self.details)
+        student_ids = {student_id for vectors in by_period.values() for student_id in vectors}
+        if student_ids:
+            await refresh_percentages(db, student_ids)
+        self.deltas.clear()
+
+
+async def _apply_period(db: AsyncSession, academic_year: str, month: int,
+                        vectors: Dict[int, Tuple[int, ...]], details: Dict[RollupKey, dict]) -> None:
+    period = (AttendanceRollup.academic_year == academic_year, AttendanceRollup.month == month)
+    existing = set((await db.execute(
+        select(AttendanceRollup.student_id).filter(*period, AttendanceRollup.student_id.in_(list(vectors)))
+    )).scalars().all())
+
+    new_rows = [
+        {
+            **details.get((student_id, academic_year, month), {}),
+            "student_id": student_id, "academic_year": academic_year, "month": month,
+            **{status: max(count, 0) for status, count in zip(ROLLUP_STATUSES, vector)},
+        }
+        for student_id, vector in vectors.items() if student_id not in existing
+    ]
+    if new_rows:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(AttendanceRollup).values(new_rows))
+        except IntegrityError:
+            # Another request created some of these keys meanwhile: insert the rest one
+            # at a time and add to the ones that now exist
+            for row in new_rows:
+                try:
+                    async with db.begin_nested():
+                        await db.execute(insert(AttendanceRollup).values(row))
+                except IntegrityError:
+                    existing.add(row["student_id"])
+
+    by_vector: Dict[Tuple[int, ...], List[int]] = defaultdict(list)
+    for student_id in existing:
+        by_vector[vectors[student_id]].append(student_id)
+    for vector, student_ids in by_vector.items():
+        await db.execute(
+            update(AttendanceRollup)
+            .filter(*period, AttendanceRollup.student_id.in_(student_ids))
+            .values({
+                status: getattr(AttendanceRollup, status) + count
+                for status, count in zip(ROLLUP_STATUSES, vector) if count
+            })
+            .execution_options(synchronize_session=False)
+        )
+
+
+def attended_column(model=AttendanceRollup):
+    return model.present + model.late + 0.5 * model.half_day
+
+
+def counted_column(model=AttendanceRollup):
+    return model.present + model.absent + model.late + model.half_day
+
+
+def percentage_column(model=AttendanceRollup):
+    """Aggregate attendance percentage over the selected rollup rows (NULL when nothing counted)"""
+    return func.round(100.0 * func.sum(attended_column(model)) / func.nullif(func.sum(counted_column(model)), 0), 2)
+
+
+def percentage_update(*filters):
+    """UPDATE students SET total_attendance_percentage from their rollups for the latest academic year"""
+    rollup, latest = aliased(AttendanceRollup), aliased(AttendanceRollup)
+    latest_year = select(func.max(latest.academic_year)).filter(latest.student_id == Student.id).scalar_subquery()
+    percentage = (
+        select(percentage_column(rollup))
+        .filter(rollup.student_id == Student.id, rollup.academic_year == latest_year)
+        .scalar_subquery()
+    )
+    return (
+        update(Student)
+        .filter(*filters)
+        .values(total_attendance_percentage=percentage)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def refresh_percentages(db: AsyncSession, student_ids) -> None:
+    await db.execute(percentage_update(Student.id.in_(list(student_ids))))
+
+
+# ---- full rebuild (rebuild_attendance_rollups.py) ----
+
+def rebuild_statements(school_id: Optional[int] = None) -> list:
+    """DELETE + INSERT ... SELECT GROUP BY + student percentage UPDATE, for one school or all"""
+    month = func.coalesce(Attendance.month, extract("month", Attendance.date))
+    academic_year = func.coalesce(Attendance.academic_year, "")
+    counts = [
+        func.sum(case((Attendance.status == status, 1), else_=0)).label(status)
+        for status in ROLLUP_STATUSES
+    ]
+    source = (
+        select(
+            Attendance.student_id, academic_year.label("academic_year"), month.label("month"),
+            func.max(Attendance.school_id), func.max(Attendance.class_id), func.max(Attendance.student_name),
+            *counts
+        )
+        .filter(Attendance.status.in_(ROLLUP_STATUSES))
+        .group_by(Attendance.student_id, academic_year, month)
+    )
+    clear = delete(AttendanceRollup)
+    students = select(AttendanceRollup.student_id)
+    if school_id is not None:
+        source = source.filter(Attendance.school_id == school_id)
+        clear = clear.filter(AttendanceRollup.school_id == school_id)
+        students = students.filter(AttendanceRollup.school_id == school_id)
+    fill = insert(AttendanceRollup).from_select(
+        ["student_id", "academic_year", "month", "school_id", "class_id", "student_name", *ROLLUP_STATUSES],
+        source
+    )
+    return [clear, fill, percentage_update(Student.id.in_(students.distinct()))]
@@ -0,0 +1,149 @@
+"""
+Connection pool instrumentation
+Pool classes that record checkout latency and connection hold time, used by database.py
+"""
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy import exc
+from typing import Dict, Optional, Tuple
+import threading
+import time
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style) of millisecond values"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float) -> None:
+        with self._lock:
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value_ms <= bound:
+                    index = i
+                    break
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value_ms
+            if value_ms > self.max:
+                self.max = value_ms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, n in zip(list(self.buckets) + ["+Inf"], self.counts):
+                cumulative += n
+                buckets[f"le_{bound}"] = cumulative
+            return {
+                "count": self.count,
+                "sum_ms": round(self.total, 3),
+                "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+                "max_ms": round(self.max, 3),
+                "buckets": buckets
+            }
+
+
+class PoolStats:
+    """Counters and histograms for one connection pool"""
+
+    def __init__(self):
+        self.checkout_latency = Histogram()
+        self.hold_time = Histogram()
+        self.checkouts = 0
+        self.waited_checkouts = 0
+        self.total_wait_ms = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_checkout(self, elapsed_ms: float, had_to_wait: bool) -> None:
+        self.checkout_latency.observe(elapsed_ms)
+        with self._lock:
+            self.checkouts += 1
+            if had_to_wait:
+                self.waited_checkouts += 1
+                self.total_wait_ms += elapsed_ms
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = {
+                "checkouts": self.checkouts,
+                "waited_checkouts": self.waited_checkouts,
+                "total_wait_ms": round(self.total_wait_ms, 3),
+                "timeouts": self.timeouts
+            }
+        return {
+            **counters,
+            "checkout_latency_ms": self.checkout_latency.snapshot(),
+            "connection_hold_time_ms": self.hold_time.snapshot()
+        }
+
+
+class InstrumentedPoolMixin:
+    """
+    Times every pool checkout (queue wait + connect + pre-ping) and how long
+    each connection is held before being returned.
+    A checkout "waited" when no idle connection was available and the overflow
+    limit was already reached, i.e. the caller queued for a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        had_to_wait = self.checkedin() == 0 and self._max_overflow > -1 and self._overflow >= self._max_overflow
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        self.stats.record_checkout((time.perf_counter() - start) * 1000, had_to_wait)
+        connection.info["_checked_out_at"] = time.perf_counter()
+        return connection
+
+    def _do_return_conn(self, record) -> None:
+        checked_out_at: Optional[float] = record.info.pop("_checked_out_at", None)
+        if checked_out_at is not None:
+            self.stats.hold_time.observe((time.perf_counter() - checked_out_at) * 1000)
+        super()._do_return_conn(record)
+
+    def metrics(self) -> dict:
+        """Current gauges plus accumulated counters/histograms"""
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout_seconds": self._timeout,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            **self.stats.snapshot()
+        }
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    """QueuePool with checkout metrics - used by the sync engine"""
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool with checkout metrics - used by the async engine"""
+
+
+def pool_metrics(pool) -> Dict[str, object]:
+    """Metrics for any pool - falls back to status() for non-instrumented pools"""
+    if isinstance(pool, InstrumentedPoolMixin):
+        return pool.metrics()
+    return {"status": pool.status()}
@@ -0,0 +1,57 @@
+"""
+Fast JSON responses
+FastAPI runs every returned value through jsonable_encoder, which walks ORM
+objects attribute by attribute. For wide denormalized rows that costs more than
+the query itself. Instead:
+- each column list gets a row encoder, built once and cached, that turns a
+  result tuple into a dict with dict(zip(keys, row))
+- list endpoints select plain columns (no ORM instances) and encode the tuples
+- JSON is rendered by orjson, and json_response() skips jsonable_encoder entirely
+"""
+from functools import lru_cache
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+import orjson
+from fastapi.responses import JSONResponse
+
+
+@lru_cache(maxsize=None)
+def model_columns(model) -> Tuple[str, ...]:
+    """Attribute names of the model's mapped columns, in table order"""
+    return tuple(attr.key for attr in model.__mapper__.column_attrs)
+
+
+@lru_cache(maxsize=256)
+def row_encoder(keys: Tuple[str, ...]) -> Callable[[Sequence[Any]], dict]:
+    """Function turning a result tuple into {key: value}, built once per column list"""
+    return lambda row: dict(zip(keys, row))
+
+
+def encode_rows(keys: Tuple[str, ...], rows: Iterable[Sequence[Any]]) -> List[dict]:
+    encode = row_encoder(keys)
+    return [encode(row) for row in rows]
+
+
+def encode_instance(instance) -> dict:
+    """Loaded column values of an ORM instance (unloaded ones, e.g. after load_only, are skipped)"""
+    state = instance.__dict__
+    return {key: state[key] for key in model_columns(type(instance)) if key in state}
+
+
+def _default(value: Any) -> Any:
+    if hasattr(value, "__mapper__"):
+        return encode_instance(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; also accepts ORM instances"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[dict] = None) -> FastJSONResponse:
+    """Return this from a handler to serialize with orjson directly, bypassing jsonable_encoder"""
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,68 @@
+"""
+Batched lookups for denormalization enrichment
+Create/update handlers copy columns from the rows a payload references (school
+name, class section, a teacher name per subject_teachers entry, a student per
+student_list entry, ...). Lookup collects the referenced ids first, fetches each
+model with one IN (...) query, and serves repeats from its identity map for the
+rest of the request:
+
+    lookup = Lookup(db).want(School, data.get("school_id")).want(Teacher, *teacher_ids)
+    await lookup.load()
+    teacher = lookup.get(Teacher, teacher_id)
+
+Schools, classes, subjects and fee structures are read through the shared
+reference cache (utils/reference_cache.py) instead, so they rarely cost a query.
+"""
+from typing import Any, Dict, Optional, Set
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.reference_cache import CACHED_MODELS, reference_cache
+
+
+def _row_id(value: Any) -> Optional[int]:
+    """Payload ids arrive as ints or numeric strings; anything else references nothing"""
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+class Lookup:
+    """Per-request identity map of referenced rows, filled with one IN query per model"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._rows: Dict[Any, Dict[int, Any]] = {}
+        self._wanted: Dict[Any, Set[int]] = {}
+
+    def want(self, model, *ids: Any) -> "Lookup":
+        """Register ids to fetch on the next load(); None and blanks are ignored"""
+        wanted = self._wanted.setdefault(model, set())
+        wanted.update(row_id for row_id in map(_row_id, ids) if row_id is not None)
+        return self
+
+    async def load(self) -> "Lookup":
+        """Fetch every wanted id not already in the identity map"""
+        for model, ids in self._wanted.items():
+            rows = self._rows.setdefault(model, {})
+            missing = [row_id for row_id in ids if row_id not in rows]
+            if not missing:
+                continue
+            rows.update(dict.fromkeys(missing))  # remember ids that do not exist too
+            if model in CACHED_MODELS:
+                rows.update(await reference_cache.get_many(self.db, model, missing))
+                continue
+            result = await self.db.execute(select(model).filter(model.id.in_(missing)))
+            for row in result.scalars():
+                rows[row.id] = row
+        self._wanted = {}
+        return self
+
+    def get(self, model, row_id: Any):
+        """A loaded row, or None when it does not exist (or was never wanted)"""
+        return self._rows.get(model, {}).get(_row_id(row_id))
+
+    async def fetch(self, model, row_id: Any):
+        """Single lookup through the identity map (and the reference cache)"""
+        await self.want(model, row_id).load()
+        return self.get(model, row_id)
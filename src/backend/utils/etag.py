@@ -0,0 +1,86 @@
+"""
+Conditional GETs (weak ETags + If-None-Match -> 304)
+Dashboards poll detail, stats and timetable endpoints every few seconds and
+mostly get the same payload back.
+- single rows: the ETag comes from a primary-key SELECT of updated_at/created_at,
+  so an unchanged row is answered with 304 before it is loaded or serialized
+- lists and stats: the ETag is a hash of the serialized body; that saves the
+  transfer and the client's parse, not the query
+
+DATETIME columns have one-second resolution, so a row changed within the last
+ETAG_RACY_SECONDS could change again under the same timestamp. Such rows get no
+ETag until their timestamp is old enough to be trusted.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from typing import Any, List, Optional
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils.encoders import json_response
+
+ETAG_RACY_SECONDS = 2
+
+
+def _weak(digest: str) -> str:
+    return f'W/"{digest}"'
+
+
+def _racy(stamp: datetime) -> bool:
+    # Handlers write both datetime.now() and datetime.utcnow(); either clock may be the row's
+    window = timedelta(seconds=ETAG_RACY_SECONDS)
+    return any(abs(now - stamp) < window for now in (datetime.now(), datetime.utcnow()))
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Weak comparison of etag against the request's If-None-Match list"""
+    header = request.headers.get("if-none-match")
+    if not header or not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def etag_headers(etag: Optional[str]) -> Optional[dict]:
+    return {"ETag": etag} if etag else None
+
+
+async def row_version(db: AsyncSession, model, row_id: int) -> Optional[datetime]:
+    """updated_at (or created_at) of one row by primary key - None when missing"""
+    row = (await db.execute(
+        select(model.updated_at, model.created_at).filter(model.id == row_id)
+    )).first()
+    return (row.updated_at or row.created_at) if row else None
+
+
+def version_etag(model, row_id: int, version: Optional[datetime], fields: Optional[List[str]] = None) -> Optional[str]:
+    """None when there is no version or it is too recent to trust"""
+    if version is None or _racy(version):
+        return None
+    key = f"{model.__tablename__}:{row_id}:{version.isoformat()}:{','.join(fields or ())}"
+    return _weak(hashlib.blake2b(key.encode(), digest_size=8).hexdigest())
+
+
+async def row_etag(db: AsyncSession, model, row_id: int, fields: Optional[List[str]] = None) -> Optional[str]:
+    """ETag of one row from SELECT updated_at, created_at"""
+    return version_etag(model, row_id, await row_version(db, model, row_id), fields)
+
+
+def body_etag(body: bytes) -> str:
+    return _weak(hashlib.blake2b(body, digest_size=16).hexdigest())
+
+
+def conditional_json(request: Request, content: Any) -> Response:
+    """json_response() with an ETag from the body hash, or 304 when the client already has it"""
+    response = json_response(content)
+    etag = body_etag(response.body)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return response
@@ -0,0 +1,84 @@
+"""
+Streaming NDJSON/CSV exports
+Rows are read through a server-side cursor (stream_results + yield_per) and
+written out one batch at a time, so memory stays flat however many rows match.
+The API endpoints (/data/{entity}/export) and fetch_data.py share the encoders.
+"""
+import csv
+import io
+from datetime import date, datetime, time
+from typing import Any, AsyncIterator, Iterable, List, Optional, Sequence, Tuple
+import orjson
+from fastapi.responses import StreamingResponse
+from database import AsyncSessionLocal
+from utils.encoders import model_columns, row_encoder
+from utils.projection import column_names
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+EXPORT_BATCH_SIZE = 1000
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value).decode()
+    if hasattr(value, "value"):  # Enum
+        return value.value
+    return value
+
+
+def csv_header(keys: Sequence[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(keys)
+    return buffer.getvalue().encode()
+
+
+def encode_batch(keys: Tuple[str, ...], rows: Iterable[Sequence[Any]], format: str) -> bytes:
+    """One batch of result tuples as NDJSON lines or CSV records"""
+    if format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([_csv_value(value) for value in row] for row in rows)
+        return buffer.getvalue().encode()
+    encode = row_encoder(keys)
+    return b"".join(orjson.dumps(encode(row), option=orjson.OPT_NON_STR_KEYS) + b"\n" for row in rows)
+
+
+def export_columns(model, fields: Optional[List[str]] = None) -> Tuple[str, ...]:
+    return tuple(column_names(model, fields)) if fields else model_columns(model)
+
+
+async def stream_export(query, model, keys: Tuple[str, ...], format: str,
+                        batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """
+    Yield the encoded rows of a filtered select(model) batch by batch
+    Uses its own session: the request's session may be closed before the
+    response body has finished streaming.
+    """
+    statement = (
+        query.with_only_columns(*[getattr(model, key) for key in keys])
+        .order_by(model.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if format == "csv":
+        yield csv_header(keys)
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(statement)
+        async for rows in result.partitions():
+            yield encode_batch(keys, rows, format)
+
+
+def export_response(query, model, format: str, fields: Optional[List[str]], name: str) -> StreamingResponse:
+    """StreamingResponse for /export - query is the list endpoint's filtered select(model)"""
+    keys = export_columns(model, fields)
+    filename = f"{name}-{date.today():%Y%m%d}.{format}"
+    return StreamingResponse(
+        stream_export(query, model, keys, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,261 @@
+"""
+Fee ledger: the students' denormalized balance fields, kept in step with fee_payments
+Student.fee_paid, fee_pending, fee_status, last_payment_date/amount (and
+total_annual_fee when unset) are maintained by the fee payment handlers in the
+same transaction as the payment:
+
+    ledger = LedgerChanges()
+    ledger.remove(payment)       # before an update/delete
+    ... change the payment ...
+    ledger.add(payment)          # after a create/update
+    await ledger.apply(db)       # then commit
+
+Each affected student gets one UPDATE with fee_paid = fee_paid + :delta, so
+concurrent payments for the same student compose instead of overwriting.
+
+    total_annual_fee = the student's own value, else SUM(fee_structures.amount) for
+                       their class and academic year
+    fee_pending      = max(total_annual_fee - fee_concession_amount - fee_paid, 0)
+    fee_status       = Paid | Overdue (next_due_date passed) | Partial | Pending
+
+While no total is known (unset and no fee structures) fee_pending and fee_status
+are left as they are; only fee_paid and the last payment are maintained.
+
+Cancelled, failed and refunded payments (a soft delete cancels) do not count.
+reconcile_fee_ledger.py recomputes all of it for a school with one grouped query.
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from models_denormalized import FeePayment, FeeStructure, Student
+
+VOID_PAYMENT_STATUSES = ("cancelled", "failed", "refunded")
+
+FEE_PAID = "Paid"
+FEE_PARTIAL = "Partial"
+FEE_PENDING = "Pending"
+FEE_OVERDUE = "Overdue"
+
+
+def _value(record: Any, name: str) -> Any:
+    return record.get(name) if isinstance(record, dict) else getattr(record, name, None)
+
+
+def _as_date(value: Any) -> Optional[date]:
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def counted_amount(payment: Any) -> float:
+    """amount_paid of a payment that counts towards the balance, else 0"""
+    status = (_value(payment, "payment_status") or "").lower()
+    if status in VOID_PAYMENT_STATUSES:
+        return 0.0
+    return float(_value(payment, "amount_paid") or 0)
+
+
+def counted_payment():
+    """SQL filter for payments that count"""
+    return or_(FeePayment.payment_status.is_(None), func.lower(FeePayment.payment_status).notin_(VOID_PAYMENT_STATUSES))
+
+
+def fee_status_for(pending: float, paid: float, next_due_date: Optional[date], today: Optional[date] = None) -> str:
+    if pending <= 0:
+        return FEE_PAID
+    if next_due_date and next_due_date < (today or date.today()):
+        return FEE_OVERDUE
+    return FEE_PARTIAL if paid > 0 else FEE_PENDING
+
+
+def structures_total(class_id, academic_year):
+    """SUM of the active fee structures of a class and academic year (SQL expression, NULL when none)"""
+    return (
+        select(func.sum(FeeStructure.amount))
+        .filter(
+            FeeStructure.class_id == class_id,
+            FeeStructure.academic_year == academic_year,
+            FeeStructure.is_active.isnot(False)
+        )
+        .scalar_subquery()
+    )
+
+
+def _latest_payment(column):
+    """column of the student's latest counted payment (correlated subquery)"""
+    return (
+        select(column)
+        .filter(FeePayment.student_id == Student.id, counted_payment())
+        .order_by(FeePayment.payment_date.desc(), FeePayment.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+class LedgerChanges:
+    """Paid-amount deltas per student, collected while fee payments change"""
+
+    def __init__(self):
+        self.paid: Dict[int, float] = defaultdict(float)
+        self.latest: Dict[int, Tuple[date, float]] = {}
+        self.recheck: Set[int] = set()
+
+    def add(self, payment: Any, sign: int = 1) -> None:
+        student_id = _value(payment, "student_id")
+        if not student_id:
+            return
+        student_id = int(student_id)
+        amount = counted_amount(payment)
+        self.paid[student_id] += sign * amount
+        payment_date = _as_date(_value(payment, "payment_date"))
+        if sign > 0 and amount and payment_date:
+            self.latest[student_id] = (payment_date, amount)
+        elif sign < 0 and amount:
+            # The removed payment may have been the student's last one
+            self.recheck.add(student_id)
+
+    def remove(self, payment: Any) -> None:
+        self.add(payment, -1)
+
+    async def apply(self, db: AsyncSession) -> None:
+        """One UPDATE per affected student"""
+        # The last-payment recheck reads fee_payments - the changed payment must be written first
+        await db.flush()
+        for student_id in set(self.paid) | self.recheck:
+            delta = self.paid.get(student_id, 0.0)
+            if not delta and student_id not in self.recheck:
+                continue
+            await db.execute(ledger_update(student_id, delta, self.latest.get(student_id), student_id in self.recheck))
+        self.paid.clear()
+        self.latest.clear()
+        self.recheck.clear()
+
+
+def ledger_update(student_id: int, delta: float, latest: Optional[Tuple[date, float]] = None, recheck: bool = False):
+    """
+    UPDATE students SET fee_paid = fee_paid + :delta, and the balance fields derived from it
+    Every SET expression is written against the old column values (MySQL applies
+    assignments left to right), and fee_paid is assigned last.
+    """
+    total = func.coalesce(Student.total_annual_fee, structures_total(Student.class_id, Student.academic_year))
+    paid = func.coalesce(Student.fee_paid, 0) + delta
+    due = total - func.coalesce(Student.fee_concession_amount, 0) - paid
+    pending = case((total.is_(None), Student.fee_pending), (due > 0, due), else_=0)
+    status = case(
+        (total.is_(None), Student.fee_status),
+        (due <= 0, FEE_PAID),
+        (Student.next_due_date < date.today(), FEE_OVERDUE),
+        (paid > 0, FEE_PARTIAL),
+        else_=FEE_PENDING
+    )
+    values: List[Tuple[Any, Any]] = [(Student.fee_pending, pending), (Student.fee_status, status)]
+    if recheck:
+        values += [
+            (Student.last_payment_date, _latest_payment(FeePayment.payment_date)),
+            (Student.last_payment_amount, _latest_payment(FeePayment.amount_paid)),
+        ]
+    elif latest:
+        payment_date, amount = latest
+        is_latest = or_(Student.last_payment_date.is_(None), Student.last_payment_date <= payment_date)
+        values += [
+            (Student.last_payment_amount, case((is_latest, amount), else_=Student.last_payment_amount)),
+            (Student.last_payment_date, case((is_latest, payment_date), else_=Student.last_payment_date)),
+        ]
+    values += [(Student.total_annual_fee, total), (Student.fee_paid, paid)]
+    return (
+        update(Student)
+        .filter(Student.id == student_id)
+        .ordered_values(*values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# ---- reconciliation (reconcile_fee_ledger.py) ----
+
+def reconcile_query(school_id: int, recompute_totals: bool = False):
+    """
+    Students of a school with their fee total, counted payments and latest payment
+    One GROUP BY student_id over fee_payments, one GROUP BY class over fee_structures;
+    payments and structures belong to the school through the student, not their own
+    school_id. The student's own total_annual_fee wins over the structures, as in
+    ledger_update(), unless recompute_totals.
+    """
+    payer = aliased(Student)
+    payments = (
+        select(
+            FeePayment.student_id,
+            func.sum(FeePayment.amount_paid).label("paid"),
+            func.max(FeePayment.payment_date).label("last_date"),
+        )
+        .join(payer, payer.id == FeePayment.student_id)
+        .filter(payer.school_id == school_id, counted_payment())
+        .group_by(FeePayment.student_id)
+        .subquery()
+    )
+    school_classes = select(payer.class_id).filter(payer.school_id == school_id)
+    structures = (
+        select(
+            FeeStructure.class_id, FeeStructure.academic_year,
+            func.sum(FeeStructure.amount).label("total"),
+        )
+        .filter(FeeStructure.class_id.in_(school_classes), FeeStructure.is_active.isnot(False))
+        .group_by(FeeStructure.class_id, FeeStructure.academic_year)
+        .subquery()
+    )
+    # Amount of the latest payment: the highest id on the student's last payment date
+    last_amount = (
+        select(FeePayment.amount_paid)
+        .filter(
+            FeePayment.student_id == payments.c.student_id,
+            FeePayment.payment_date == payments.c.last_date,
+            counted_payment()
+        )
+        .order_by(FeePayment.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    total = structures.c.total if recompute_totals else func.coalesce(Student.total_annual_fee, structures.c.total)
+    return (
+        select(
+            Student.id, Student.fee_concession_amount, Student.next_due_date,
+            total.label("total"),
+            func.coalesce(payments.c.paid, 0).label("paid"),
+            payments.c.last_date,
+            last_amount.label("last_amount"),
+        )
+        .outerjoin(payments, payments.c.student_id == Student.id)
+        .outerjoin(structures, and_(
+            structures.c.class_id == Student.class_id,
+            structures.c.academic_year == Student.academic_year
+        ))
+        .filter(Student.school_id == school_id)
+    )
+
+
+def reconcile_values(rows, today: Optional[date] = None) -> List[dict]:
+    """
+    Rows of reconcile_query() -> executemany parameters for update(Student)
+    Without a known total, fee_pending and fee_status are not written (as in ledger_update()).
+    """
+    values = []
+    for row in rows:
+        paid = float(row.paid or 0)
+        value = {
+            "id": row.id,
+            "fee_paid": paid,
+            "last_payment_date": row.last_date,
+            "last_payment_amount": row.last_amount,
+        }
+        if row.total is not None:
+            total = float(row.total)
+            pending = max(total - float(row.fee_concession_amount or 0) - paid, 0.0)
+            value.update({
+                "total_annual_fee": total,
+                "fee_pending": pending,
+                "fee_status": fee_status_for(pending, paid, row.next_due_date, today),
+            })
+        values.append(value)
+    return values
@@ -0,0 +1,57 @@
+"""
+Grading helpers - percentage, grade and pass status for marks
+Works column-wise on whole lists of scores so bulk entry and report cards
+compute results in one pass instead of per row.
+"""
+from bisect import bisect_right
+from typing import List, Optional, Sequence
+
+# CBSE scale (CCE_MARKS_SYSTEM.md "Grade Calculation"): lower bound (percentage)
+# of each grade band, ascending - E below 33, D 33-40, C2 41-50, ... A1 91-100
+GRADE_BOUNDARIES = (33, 41, 51, 61, 71, 81, 91)
+GRADE_LABELS = ("E", "D", "C2", "C1", "B2", "B1", "A2", "A1")
+
+PASS = "pass"
+FAIL = "fail"
+ABSENT = "absent"
+
+
+def grade_for(percentage: Optional[float]) -> Optional[str]:
+    """Grade label for a single percentage"""
+    if percentage is None:
+        return None
+    return GRADE_LABELS[bisect_right(GRADE_BOUNDARIES, percentage)]
+
+
+def pass_percentage(exam_max_marks: Optional[float], exam_min_pass_marks: Optional[float]) -> float:
+    """Pass threshold of an exam as a percentage (min_pass_marks is out of max_marks)"""
+    if not exam_max_marks or exam_min_pass_marks is None:
+        return float(GRADE_BOUNDARIES[0])
+    return exam_min_pass_marks * 100.0 / exam_max_marks
+
+
+def compute_results(
+    obtained: Sequence[Optional[float]],
+    max_marks: Sequence[float],
+    pass_mark_percentage: float
+) -> dict:
+    """
+    Compute result columns for parallel lists of scores
+    A score of None means the student was absent.
+
+    Returns {"percentage": [...], "grade": [...], "pass_status": [...]}
+    """
+    percentages: List[Optional[float]] = [
+        None if score is None or not maximum else round(score * 100.0 / maximum, 2)
+        for score, maximum in zip(obtained, max_marks)
+    ]
+    statuses = [
+        ABSENT if p is None else PASS if p >= pass_mark_percentage else FAIL
+        for p in percentages
+    ]
+    # A failing score always gets the lowest grade, whatever the exam's pass mark
+    grades = [
+        GRADE_LABELS[0] if status == FAIL else grade_for(p)
+        for p, status in zip(percentages, statuses)
+    ]
+    return {"percentage": percentages, "grade": grades, "pass_status": statuses}
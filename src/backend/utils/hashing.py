@@ -0,0 +1,160 @@
+"""
+Password hashing off the event loop
+bcrypt costs ~250 ms of CPU per hash or verify. Running it inside an async
+handler stalls every other request of the worker, so:
+
+- single hash/verify calls (login, change password, user creation) run in a
+  bounded thread pool - bcrypt releases the GIL, so threads hash in parallel
+- bulk operations (CSV import) hash many passwords in a process pool
+
+Queue depth and wait/run times of the bounded pool are exposed for /metrics/password-hashing.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException
+from typing import Callable, List, Optional, TypeVar
+from passlib.context import CryptContext
+from config import settings
+from utils.db_metrics import Histogram
+
+T = TypeVar("T")
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_thread_pool: Optional[ThreadPoolExecutor] = None
+
+# Separate context so worker processes don't import the app (auth -> database)
+_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class HashPoolStats:
+    """Queue depth and timing of the bounded hashing pool"""
+
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_time = Histogram()
+        self.run_time = Histogram()
+        self._lock = threading.Lock()
+
+    def enqueue(self) -> None:
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+    def start(self, waited_ms: float) -> None:
+        self.wait_time.observe(waited_ms)
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+
+    def finish(self, ran_ms: float) -> None:
+        self.run_time.observe(ran_ms)
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.queued -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = {
+                "workers": settings.PASSWORD_HASH_WORKERS,
+                "max_queue": settings.PASSWORD_HASH_MAX_QUEUE,
+                "queued": self.queued,
+                "running": self.running,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "rejected": self.rejected
+            }
+        return {
+            **counters,
+            "wait_time_ms": self.wait_time.snapshot(),
+            "run_time_ms": self.run_time.snapshot()
+        }
+
+
+hash_pool_stats = HashPoolStats()
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="password-hash"
+        )
+    return _thread_pool
+
+
+async def run_in_hash_pool(fn: Callable[..., T], *args) -> T:
+    """
+    Run a CPU-bound password function in the bounded pool
+    Raises 503 when PASSWORD_HASH_MAX_QUEUE calls are already waiting, so a
+    login storm sheds load instead of queueing without limit.
+    """
+    stats = hash_pool_stats
+    if settings.PASSWORD_HASH_MAX_QUEUE and stats.queued >= settings.PASSWORD_HASH_MAX_QUEUE:
+        with stats._lock:
+            stats.rejected += 1
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
+    queued_at = time.perf_counter()
+
+    def job():
+        started_at = time.perf_counter()
+        stats.start((started_at - queued_at) * 1000)
+        try:
+            return fn(*args)
+        finally:
+            stats.finish((time.perf_counter() - started_at) * 1000)
+
+    stats.enqueue()
+    future = _get_thread_pool().submit(job)
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # Client went away: drop the job if it has not started yet
+        if future.cancel():
+            stats.cancel()
+        raise
+
+
+def _hash_batch(passwords: List[str]) -> List[str]:
+    """Runs inside a worker process"""
+    return [_pwd_context.hash(password) for password in passwords]
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor()
+    return _process_pool
+
+
+async def hash_passwords(passwords: List[str], batch_size: int = 16) -> List[str]:
+    """Hash many passwords in parallel worker processes, preserving order"""
+    if not passwords:
+        return []
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    batches = [passwords[i:i + batch_size] for i in range(0, len(passwords), batch_size)]
+    results = await asyncio.gather(*(loop.run_in_executor(pool, _hash_batch, batch) for batch in batches))
+    return [hashed for batch in results for hashed in batch]
+
+
+def shutdown_pools() -> None:
+    """Stop worker threads and processes on application shutdown"""
+    global _process_pool, _thread_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+    if _thread_pool is not None:
+        _thread_pool.shutdown(cancel_futures=True)
+        _thread_pool = None
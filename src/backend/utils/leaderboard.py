@@ -0,0 +1,197 @@
+"""
+Exam leaderboards: per-student exam totals in exam_scores
+"Top 10 in class/section/school" used to need every Mark row of the exam. Each
+marks write now records its delta in a ScoreChanges and applies it in the same
+transaction, like attendance rollups:
+
+    changes = ScoreChanges()
+    changes.remove(mark)         # before an update/delete
+    ... change the mark ...
+    changes.add(mark)            # after a create/update
+    await changes.apply(db)      # then commit
+
+A leaderboard read is then ORDER BY percentage DESC LIMIT k on one of the
+exam_scores (exam_id, ..., percentage) indexes - k rows read whatever the size of
+the exam. Subject toppers come from marks via (exam_id, subject_id, total_marks_obtained).
+
+An absent paper counts as 0 out of its max marks; a student absent from every
+paper has no percentage and is left off. Ranks are dense (1, 1, 2).
+rebuild_leaderboards.py recomputes exam_scores from the marks.
+"""
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import bindparam, case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models_denormalized import ExamScore, Mark
+
+ScoreKey = Tuple[int, int]  # (exam_id, student_id)
+_DELTA_COLUMNS = ("total_obtained", "total_max_marks", "papers", "papers_sat")
+_DETAIL_COLUMNS = ("school_id", "student_name", "roll_no", "class_id", "class_name", "section")
+
+
+def _value(record: Any, name: str) -> Any:
+    return record.get(name) if isinstance(record, dict) else getattr(record, name, None)
+
+
+def _score(record: Any) -> Optional[float]:
+    """Marks obtained, None for an absent paper"""
+    if _value(record, "is_absent"):
+        return None
+    return _value(record, "total_marks_obtained")
+
+
+class ScoreChanges:
+    """(obtained, max, papers, papers_sat) deltas per exam score, collected while marks change"""
+
+    def __init__(self):
+        self.deltas: Dict[ScoreKey, List[float]] = defaultdict(lambda: [0.0, 0.0, 0, 0])
+        self.details: Dict[ScoreKey, dict] = {}
+
+    def add(self, record: Any, sign: int = 1) -> None:
+        exam_id, student_id = _value(record, "exam_id"), _value(record, "student_id")
+        if not exam_id or not student_id:
+            return
+        key = (int(exam_id), int(student_id))
+        score = _score(record)
+        delta = self.deltas[key]
+        delta[0] += sign * (score or 0)
+        delta[1] += sign * (_value(record, "max_marks") or 0)
+        delta[2] += sign
+        delta[3] += sign if score is not None else 0
+        if sign > 0:
+            self.details[key] = {name: _value(record, name) for name in _DETAIL_COLUMNS}
+
+    def remove(self, record: Any) -> None:
+        self.add(record, -1)
+
+    async def apply(self, db: AsyncSession) -> None:
+        """Write the deltas into exam_scores and refresh the affected percentages"""
+        by_exam: Dict[int, Dict[int, List[float]]] = defaultdict(dict)
+        for (exam_id, student_id), delta in self.deltas.items():
+            if any(delta):
+                by_exam[exam_id][student_id] = delta
+        for exam_id, deltas in by_exam.items():
+            await _apply_exam(db, exam_id, deltas, self.details)
+        self.deltas.clear()
+
+
+async def _apply_exam(db: AsyncSession, exam_id: int, deltas: Dict[int, List[float]],
+                      details: Dict[ScoreKey, dict]) -> None:
+    student_ids = list(deltas)
+    existing = set((await db.execute(
+        select(ExamScore.student_id).filter(ExamScore.exam_id == exam_id, ExamScore.student_id.in_(student_ids))
+    )).scalars().all())
+
+    new_rows = [
+        {
+            **details.get((exam_id, student_id), {}),
+            "exam_id": exam_id, "student_id": student_id,
+            **{column: max(value, 0) for column, value in zip(_DELTA_COLUMNS, delta)},
+        }
+        for student_id, delta in deltas.items() if student_id not in existing
+    ]
+    if new_rows:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(ExamScore).values(new_rows))
+        except IntegrityError:
+            # Another request created some of these rows meanwhile: insert the rest one
+            # at a time and add to the ones that now exist
+            for row in new_rows:
+                try:
+                    async with db.begin_nested():
+                        await db.execute(insert(ExamScore).values(row))
+                except IntegrityError:
+                    existing.add(row["student_id"])
+
+    if existing:
+        # Scores rarely repeat, so one executemany UPDATE ... SET x = x + :dx per exam
+        table = ExamScore.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.exam_id == exam_id, table.c.student_id == bindparam("b_student_id"))
+            .values({column: table.c[column] + bindparam(f"b_{column}") for column in _DELTA_COLUMNS}),
+            [
+                {"b_student_id": student_id, **{f"b_{column}": value for column, value in zip(_DELTA_COLUMNS, deltas[student_id])}}
+                for student_id in existing
+            ]
+        )
+    await db.execute(percentage_update(ExamScore.exam_id == exam_id, ExamScore.student_id.in_(student_ids)))
+
+
+def percentage_update(*filters):
+    """UPDATE exam_scores SET percentage from the totals (NULL when no paper was sat)"""
+    percentage = case(
+        (ExamScore.papers_sat > 0,
+         func.round(100.0 * ExamScore.total_obtained / func.nullif(ExamScore.total_max_marks, 0), 2)),
+        else_=None
+    )
+    return (
+        update(ExamScore)
+        .filter(*filters)
+        .values(percentage=percentage)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def dense_ranks(scores: Sequence[float]) -> List[int]:
+    """Dense ranks of scores already sorted highest first"""
+    ranks, rank, previous = [], 0, None
+    for score in scores:
+        if score != previous:
+            rank, previous = rank + 1, score
+        ranks.append(rank)
+    return ranks
+
+
+def exam_leaderboard_query(exam_id: int, limit: int, class_id: Optional[int] = None, class_name: Optional[str] = None):
+    """Top exam totals; class_id narrows to a section, class_name to a class across sections"""
+    query = select(ExamScore).filter(ExamScore.exam_id == exam_id, ExamScore.percentage.isnot(None))
+    if class_id:
+        query = query.filter(ExamScore.class_id == class_id)
+    if class_name:
+        query = query.filter(ExamScore.class_name == class_name)
+    return query.order_by(ExamScore.percentage.desc(), ExamScore.student_id).limit(limit)
+
+
+def subject_leaderboard_query(exam_id: int, subject_id: int, limit: int,
+                              class_id: Optional[int] = None, class_name: Optional[str] = None):
+    """Top marks in one subject of an exam"""
+    query = select(Mark).filter(
+        Mark.exam_id == exam_id,
+        Mark.subject_id == subject_id,
+        Mark.total_marks_obtained.isnot(None),
+        Mark.is_absent.isnot(True)
+    )
+    if class_id:
+        query = query.filter(Mark.class_id == class_id)
+    if class_name:
+        query = query.filter(Mark.class_name == class_name)
+    return query.order_by(Mark.total_marks_obtained.desc(), Mark.student_id).limit(limit)
+
+
+# ---- full rebuild (rebuild_leaderboards.py) ----
+
+def rebuild_statements(exam_id: Optional[int] = None) -> list:
+    """DELETE + INSERT ... SELECT GROUP BY + percentage UPDATE, for one exam or all"""
+    absent = Mark.is_absent.is_(True) | Mark.total_marks_obtained.is_(None)
+    source = (
+        select(
+            Mark.exam_id, Mark.student_id,
+            *[func.max(getattr(Mark, name)) for name in _DETAIL_COLUMNS],
+            func.sum(case((absent, 0), else_=Mark.total_marks_obtained)),
+            func.sum(func.coalesce(Mark.max_marks, 0)),
+            func.count(Mark.id),
+            func.sum(case((absent, 0), else_=1)),
+        )
+        .group_by(Mark.exam_id, Mark.student_id)
+    )
+    clear = delete(ExamScore)
+    refresh = percentage_update()
+    if exam_id is not None:
+        source = source.filter(Mark.exam_id == exam_id)
+        clear = clear.filter(ExamScore.exam_id == exam_id)
+        refresh = percentage_update(ExamScore.exam_id == exam_id)
+    fill = insert(ExamScore).from_select(["exam_id", "student_id", *_DETAIL_COLUMNS, *_DELTA_COLUMNS], source)
+    return [clear, fill, refresh]
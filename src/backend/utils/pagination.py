@@ -0,0 +1,202 @@
+"""
+Pagination helpers for the denormalized list endpoints
+Supports classic offset pagination and keyset (cursor) pagination on (sort_by, id)
+"""
+from fastapi import HTTPException
+from sqlalchemy import Float, or_, and_, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, time
+from typing import Any, List, Optional
+import base64
+import json
+from utils.encoders import model_columns, encode_rows
+from utils.projection import column_names
+
+
+def get_sort_column(model, sort_by: Optional[str]):
+    """Return the mapped column for sort_by, or None if it is not a real column"""
+    if sort_by and sort_by in model.__table__.columns:
+        return getattr(model, sort_by)
+    return None
+
+
+def cursor_supported(sort_column) -> bool:
+    """
+    Float columns cannot be seeked: a single-precision stored value never equals the
+    double that comes back from the JSON cursor, so ties would repeat or skip rows
+    """
+    return sort_column is None or not isinstance(sort_column.type, Float)
+
+
+def _serialize_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return value
+
+
+def _deserialize_value(column, value: Any) -> Any:
+    """Convert a cursor value back to the Python type of the sort column"""
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type in (datetime, date, time) and isinstance(value, str):
+        return python_type.fromisoformat(value)
+    return value
+
+
+def encode_cursor(sort_by: str, sort_order: str, value: Any, row_id: int) -> str:
+    """Build an opaque cursor pointing just after the given row"""
+    payload = {"s": sort_by, "o": sort_order, "v": _serialize_value(value), "id": row_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, dict) or "id" not in payload:
+            raise ValueError("missing id")
+        return payload
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _seek_condition(model, sort_column, descending: bool, value: Any, row_id: int):
+    """
+    WHERE clause selecting rows strictly after (value, row_id) in (sort_column, id) order.
+    NULLs sort first in ascending order and last in descending order (MySQL semantics).
+    """
+    id_column = model.id
+    if sort_column is None:
+        return id_column < row_id if descending else id_column > row_id
+
+    if descending:
+        if value is None:
+            return and_(sort_column.is_(None), id_column < row_id)
+        return or_(
+            sort_column < value,
+            sort_column.is_(None),
+            and_(sort_column == value, id_column < row_id)
+        )
+
+    if value is None:
+        return or_(
+            sort_column.isnot(None),
+            and_(sort_column.is_(None), id_column > row_id)
+        )
+    return or_(
+        sort_column > value,
+        and_(sort_column == value, id_column > row_id)
+    )
+
+
+async def count_rows(db: AsyncSession, query) -> int:
+    """SELECT COUNT(*) over a filtered select() statement"""
+    return await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+
+def apply_ordering(query, model, sort_by: Optional[str] = "id", sort_order: str = "asc"):
+    """Order by (sort_by, id) so every page boundary is deterministic"""
+    sort_column = get_sort_column(model, sort_by)
+    descending = sort_order == "desc"
+    order = []
+    if sort_column is not None and sort_column.key != "id":
+        order.append(sort_column.desc() if descending else sort_column.asc())
+    order.append(model.id.desc() if descending else model.id.asc())
+    return query.order_by(*order)
+
+
+async def paginate(
+    db: AsyncSession,
+    query,
+    model,
+    skip: int = 0,
+    limit: int = 100,
+    sort_by: Optional[str] = "id",
+    sort_order: str = "asc",
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    order_by: Optional[list] = None,
+    fields: Optional[List[str]] = None
+) -> dict:
+    """
+    Paginate a filtered select() statement
+
+    - Offset mode (default): OFFSET skip LIMIT limit
+    - Cursor mode (cursor=...): seeks past the (sort_by, id) position in the cursor,
+      so deep pages cost the same as the first one
+    - include_total=False skips the COUNT(*) query entirely
+    - order_by: computed sort expressions (e.g. search relevance) used instead of
+      sort_by; offset mode only, since such values cannot be encoded in a cursor
+
+    Every response carries next_cursor (None on the last page, and when sorting by a
+    Float column, which cursor mode rejects), so a client can start with offset
+    mode and continue with cursors.
+
+    Rows are fetched as plain column tuples (only the requested fields, if any)
+    and returned as dicts by the model's precompiled row encoder - no ORM
+    instances are built. Wrap the result in json_response() to skip jsonable_encoder.
+    """
+    if limit < 1 or skip < 0:
+        raise HTTPException(status_code=400, detail="limit must be at least 1 and skip at least 0")
+    sort_column = get_sort_column(model, sort_by)
+    if sort_column is not None and sort_column.key == "id":
+        sort_column = None
+    sort_key = sort_column.key if sort_column is not None else "id"
+    descending = sort_order == "desc"
+
+    total_count = await count_rows(db, query) if include_total else None
+
+    keys = tuple(column_names(model, fields, sort_key)) if fields else model_columns(model)
+    query = query.with_only_columns(*[getattr(model, key) for key in keys])
+
+    if order_by is not None:
+        if cursor:
+            raise HTTPException(status_code=400, detail="Cursor pagination is not available for this ordering")
+        rows = encode_rows(keys, (await db.execute(
+            query.order_by(*order_by, model.id.asc()).offset(skip).limit(limit)
+        )).all())
+        return {
+            "total": total_count,
+            "page": skip // limit + 1,
+            "page_size": limit,
+            "total_pages": (total_count + limit - 1) // limit if total_count is not None else None,
+            "next_cursor": None,
+            "data": rows
+        }
+
+    query = apply_ordering(query, model, sort_by, sort_order)
+
+    if cursor:
+        if not cursor_supported(sort_column):
+            raise HTTPException(status_code=400, detail=f"Cursor pagination is not available when sorting by {sort_key}")
+        position = decode_cursor(cursor)
+        if position.get("s") != sort_key or position.get("o") != sort_order:
+            raise HTTPException(status_code=400, detail="Cursor does not match sort_by/sort_order")
+        value = _deserialize_value(sort_column, position.get("v")) if sort_column is not None else None
+        query = query.filter(_seek_condition(model, sort_column, descending, value, position["id"]))
+    elif skip:
+        query = query.offset(skip)
+
+    rows = encode_rows(keys, (await db.execute(query.limit(limit + 1))).all())
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if cursor_supported(sort_column):
+            last = rows[-1]
+            last_value = last[sort_key] if sort_column is not None else None
+            next_cursor = encode_cursor(sort_key, sort_order, last_value, last["id"])
+
+    return {
+        "total": total_count,
+        "page": None if cursor else skip // limit + 1,
+        "page_size": limit,
+        "total_pages": (total_count + limit - 1) // limit if total_count is not None else None,
+        "next_cursor": next_cursor,
+        "data": rows
+    }
@@ -0,0 +1,57 @@
+"""
+Sparse fieldsets (?fields=) for list and detail endpoints
+The denormalized tables are wide (students has ~150 columns, several of them
+Text), while grids usually need a handful. fields=id,full_name,class_name turns
+into load_only() on the SELECT, so unused columns are neither read from the
+database nor serialized.
+"""
+from fastapi import HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from typing import List, Optional
+
+
+def fields_param(
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,full_name,class_name (default: all)")
+) -> Optional[List[str]]:
+    """Shared dependency - parses ?fields= into a list of names"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    return names or None
+
+
+def column_names(model, fields: List[str], *required: Optional[str]) -> List[str]:
+    """Validated column names for fields, plus id and any required columns"""
+    columns = model.__table__.columns
+    unknown = [name for name in fields if name not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    names = ["id"] + [name for name in required if name and name in columns] + fields
+    return list(dict.fromkeys(names))
+
+
+def apply_fields(query, model, fields: Optional[List[str]], *required: Optional[str]):
+    """
+    Restrict a select(model) statement to the requested columns
+    required: columns the caller reads itself (e.g. the sort column for cursors).
+    Unloaded attributes raise instead of lazy loading, which async sessions cannot do.
+    """
+    if not fields:
+        return query
+    names = column_names(model, fields, *required)
+    return query.options(load_only(*[getattr(model, name) for name in names], raiseload=True))
+
+
+async def get_with_fields(db: AsyncSession, model, row_id: int, fields: Optional[List[str]] = None):
+    """db.get() that honours ?fields="""
+    if not fields:
+        return await db.get(model, row_id)
+    return await db.scalar(apply_fields(select(model), model, fields).filter(model.id == row_id))
+
+
+async def fetch_columns(db: AsyncSession, model, row_id: int, *names: str):
+    """One row with only the named columns (attribute access like the model), or None"""
+    columns = [getattr(model, name) for name in names]
+    return (await db.execute(select(*columns).filter(model.id == row_id))).first()
@@ -0,0 +1,243 @@
+"""
+Propagation of denormalized copies
+Most tables carry copies of their sources' columns (students.class_name from
+classes, marks.exam_name from exams, ...). COPIES lists every such copy, so an
+update handler only has to say which source row it changed:
+
+    before = propagation.snapshot(class_obj)
+    ... apply the update, commit ...
+    await propagation.propagate_changes(class_obj, before)
+
+The copies are then rewritten with set-based UPDATE ... WHERE class_id = :id
+statements, one batch of ids and one commit at a time, so renaming a class never
+holds locks on all of its marks at once.
+
+With PROPAGATION_ASYNC the jobs go to a single background worker (started in
+main.py) and the PUT returns as soon as the source row is committed; one worker
+keeps jobs in order, so the last rename wins. Copies that drift anyway (e.g. the
+process stopped with jobs queued) are repaired by resync_denormalized.py.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select, update
+from config import settings
+from database import AsyncSessionLocal
+from models_denormalized import (
+    School, User, Student, Teacher, Class, Exam, Subject, Attendance, Mark,
+    FeeStructure, FeePayment, Timetable, TransportRoute, AttendanceRollup, ExamScore
+)
+from utils.reference_cache import CACHED_MODELS, reference_cache
+
+
+@dataclass(frozen=True)
+class Copy:
+    target: Any                          # model holding the copy
+    key: str                             # its column referencing the source id
+    columns: Tuple[Tuple[str, str], ...]  # (target column, source column)
+
+
+def _copy(target, key: str, **columns: str) -> Copy:
+    return Copy(target, key, tuple(columns.items()))
+
+
+_STUDENT = dict(student_name="full_name", admission_no="admission_no", roll_no="roll_no")
+_CLASS_TEACHER = dict(class_teacher_name="full_name", class_teacher_email="email", class_teacher_phone="phone")
+
+COPIES: Dict[Any, List[Copy]] = {
+    School: [
+        _copy(Student, "school_id", school_name="school_name", school_code="school_code",
+              school_address="address", school_city="city", school_state="state",
+              school_phone="phone", school_email="email"),
+        _copy(Teacher, "school_id", school_name="school_name", school_code="school_code",
+              school_address="address", school_city="city", school_phone="phone"),
+    ] + [
+        _copy(model, "school_id", school_name="school_name")
+        for model in (User, Class, Exam, Subject, Attendance, Mark, FeeStructure, FeePayment, Timetable, TransportRoute)
+    ],
+    Class: [
+        _copy(Student, "class_id", class_name="class_name", section="section", class_section="class_section",
+              room_number="room_number", class_teacher_id="class_teacher_id",
+              class_teacher_name="class_teacher_name", class_teacher_email="class_teacher_email",
+              class_teacher_phone="class_teacher_phone"),
+        _copy(FeeStructure, "class_id", class_name="class_name"),
+    ] + [
+        _copy(model, "class_id", class_name="class_name", section="section")
+        for model in (Subject, Attendance, Mark, FeePayment, Timetable, ExamScore)
+    ],
+    Teacher: [
+        _copy(Class, "class_teacher_id", **_CLASS_TEACHER),
+        _copy(Student, "class_teacher_id", **_CLASS_TEACHER),
+        _copy(Subject, "teacher_id", teacher_name="full_name", teacher_email="email", teacher_phone="phone"),
+        _copy(Timetable, "teacher_id", teacher_name="full_name"),
+        _copy(Attendance, "marked_by_id", marked_by_name="full_name"),
+        _copy(Mark, "entered_by_id", entered_by_name="full_name"),
+    ],
+    Student: [
+        _copy(model, "student_id", **_STUDENT) for model in (Attendance, Mark, FeePayment)
+    ] + [
+        _copy(AttendanceRollup, "student_id", student_name="full_name"),
+        _copy(ExamScore, "student_id", student_name="full_name", roll_no="roll_no"),
+    ],
+    Subject: [
+        _copy(Attendance, "subject_id", subject_name="subject_name"),
+        _copy(Mark, "subject_id", subject_name="subject_name", subject_code="subject_code"),
+        _copy(Timetable, "subject_id", subject_name="subject_name"),
+    ],
+    Exam: [
+        _copy(Mark, "exam_id", exam_name="exam_name", exam_code="exam_code", exam_type="exam_type"),
+    ],
+    TransportRoute: [
+        _copy(Student, "route_id", route_name="route_name", route_number="route_number",
+              vehicle_number="vehicle_number", driver_name="driver_name", driver_phone="driver_phone"),
+    ],
+}
+
+_stats = {"jobs": 0, "queued": 0, "failed": 0, "rows_updated": 0, "statements": 0, "last_error": None}
+
+
+def source_columns(model) -> Tuple[str, ...]:
+    """Columns of model that are copied somewhere"""
+    names = [source for copy in COPIES.get(model, ()) for _, source in copy.columns]
+    return tuple(dict.fromkeys(names))
+
+
+def snapshot(instance) -> Dict[str, Any]:
+    """Values of the copied columns, taken before an update"""
+    return {name: getattr(instance, name) for name in source_columns(type(instance))}
+
+
+def changed_copies(model, changes: Dict[str, Any]) -> List[Tuple[Copy, Dict[str, Any]]]:
+    """(copy, {target column: new value}) for every copy touched by changes"""
+    result = []
+    for copy in COPIES.get(model, ()):
+        values = {target: changes[source] for target, source in copy.columns if source in changes}
+        if values:
+            result.append((copy, values))
+    return result
+
+
+async def _update_copy(copy: Copy, source_id: int, values: Dict[str, Any], batch_size: int) -> int:
+    """UPDATE target SET ... WHERE key = :source_id, batch_size rows per statement and commit"""
+    target = copy.target
+    key = getattr(target, copy.key)
+    last_id, updated = 0, 0
+    async with AsyncSessionLocal() as session:
+        while True:
+            ids = (await session.execute(
+                select(target.id).filter(key == source_id, target.id > last_id).order_by(target.id).limit(batch_size)
+            )).scalars().all()
+            if not ids:
+                break
+            await session.execute(
+                update(target).filter(target.id.in_(ids)).values(values)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+            if target in CACHED_MODELS:
+                await reference_cache.invalidate(target, *ids)
+            _stats["statements"] += 1
+            updated += len(ids)
+            last_id = ids[-1]
+            if len(ids) < batch_size:
+                break
+    return updated
+
+
+async def propagate(model, source_id: int, changes: Dict[str, Any]) -> Dict[str, int]:
+    """Rewrite every copy of the changed source columns, returning rows updated per table"""
+    batch_size = settings.PROPAGATION_BATCH_SIZE
+    updated: Dict[str, int] = {}
+    for copy, values in changed_copies(model, changes):
+        rows = await _update_copy(copy, source_id, values, batch_size)
+        table = copy.target.__tablename__
+        updated[table] = updated.get(table, 0) + rows
+    _stats["jobs"] += 1
+    _stats["rows_updated"] += sum(updated.values())
+    return updated
+
+
+class PropagationWorker:
+    """Single background task draining the propagation queue in order"""
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self) -> None:
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Finish the queued jobs, then stop"""
+        if not self.running:
+            return
+        await self.queue.join()
+        self.task.cancel()
+        self.task = None
+
+    def submit(self, model, source_id: int, changes: Dict[str, Any]) -> None:
+        self.queue.put_nowait((model, source_id, changes))
+        _stats["queued"] += 1
+
+    async def _run(self) -> None:
+        while True:
+            model, source_id, changes = await self.queue.get()
+            try:
+                await propagate(model, source_id, changes)
+            except Exception as e:
+                _stats["failed"] += 1
+                _stats["last_error"] = f"{model.__tablename__} {source_id}: {e}"
+                print(f"❌ Propagation of {model.__tablename__} {source_id} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+
+worker = PropagationWorker()
+
+
+async def propagate_changes(instance, before: Dict[str, Any]) -> Optional[Dict[str, int]]:
+    """
+    Propagate whatever copied columns changed since snapshot(instance) was taken
+    Call after the source row is committed. Runs inline (returning rows updated
+    per table) unless the background worker is running, which queues it.
+    """
+    changes = {name: getattr(instance, name) for name, old in before.items() if getattr(instance, name) != old}
+    if not changes:
+        return None
+    if worker.running:
+        worker.submit(type(instance), instance.id, changes)
+        return None
+    return await propagate(type(instance), instance.id, changes)
+
+
+def resync_statement(source, copy: Copy, first_id: int, last_id: int):
+    """
+    Set-based repair of one copy for target ids in [first_id, last_id]:
+    UPDATE target SET col = (SELECT source.col FROM source WHERE source.id = target.key), ...
+    """
+    target = copy.target
+    key = getattr(target, copy.key)
+    values = {
+        target_column: select(getattr(source, source_column)).filter(source.id == key).scalar_subquery()
+        for target_column, source_column in copy.columns
+    }
+    return (
+        update(target)
+        .filter(target.id.between(first_id, last_id), key.in_(select(source.id)))
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "async": worker.running,
+        "queue_depth": worker.queue.qsize() if worker.running else 0,
+        "batch_size": settings.PROPAGATION_BATCH_SIZE,
+    }
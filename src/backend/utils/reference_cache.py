@@ -0,0 +1,225 @@
+"""
+Read-through cache for reference rows (schools, classes, subjects, fee structures)
+These change a few times a term but are read on nearly every request - by their
+detail endpoints and by enrichment (utils/enrichment.Lookup) in create_student,
+create_exam, create_timetable, ... Rows are cached as column values under
+ref:<table>:<id> for REFERENCE_CACHE_TTL_SECONDS; the PUT/DELETE handlers of
+these models, and propagation when it rewrites their copied columns, call
+invalidate().
+
+REFERENCE_CACHE_BACKEND picks where entries live:
+- "memory" (default): an LRU per worker process
+- "redis": any Redis-protocol server at REDIS_URL (redis-server, Valkey, KeyDB
+  running next to the app), shared by every worker so one invalidation reaches
+  all of them. Needs the redis package; a backend error is counted and treated
+  as a miss, never as a failed request.
+
+Rows served from the cache are detached copies - read them, never add them to a session.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+import orjson
+from sqlalchemy import Date, DateTime, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+from models_denormalized import School, Class, Subject, FeeStructure
+from utils.projection import column_names
+
+CACHED_MODELS = (School, Class, Subject, FeeStructure)
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry expiry (one per worker)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get_many(self, keys: List[str]) -> Dict[str, dict]:
+        found, now = {}, time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = dict(entry[1])  # callers may adjust their copy
+        return found
+
+    async def set_many(self, items: Dict[str, dict], ttl: int) -> None:
+        expires = time.monotonic() + ttl
+        with self._lock:
+            for key, values in items.items():
+                self._entries[key] = (expires, values)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete_many(self, keys: List[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Entries as orjson blobs with SET ... EX, shared by every worker"""
+
+    def __init__(self, url: str):
+        import redis.asyncio  # optional dependency, only needed for this backend
+        self.client = redis.asyncio.from_url(url)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, dict]:
+        blobs = await self.client.mget(keys)
+        return {key: orjson.loads(blob) for key, blob in zip(keys, blobs) if blob is not None}
+
+    async def set_many(self, items: Dict[str, dict], ttl: int) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, values in items.items():
+                pipe.set(key, orjson.dumps(values), ex=ttl)
+            await pipe.execute()
+
+    async def delete_many(self, keys: List[str]) -> None:
+        await self.client.delete(*keys)
+
+    def size(self) -> Optional[int]:
+        return None  # shared keyspace - not tracked per worker
+
+
+def make_backend():
+    if settings.REFERENCE_CACHE_BACKEND == "redis":
+        return RedisBackend(settings.REDIS_URL)
+    return MemoryBackend(settings.REFERENCE_CACHE_MAX_ENTRIES)
+
+
+def _key(model, row_id: int) -> str:
+    return f"ref:{model.__tablename__}:{row_id}"
+
+
+def _revive(model, values: dict) -> dict:
+    """Dates come back from JSON backends as ISO strings"""
+    for column in model.__table__.columns:
+        value = values.get(column.key)
+        if isinstance(value, str):
+            if isinstance(column.type, DateTime):
+                values[column.key] = datetime.fromisoformat(value)
+            elif isinstance(column.type, Date):
+                values[column.key] = date.fromisoformat(value)
+    return values
+
+
+class ReferenceCache:
+    """Read-through access to CACHED_MODELS rows by id, with hit/miss counters per table"""
+
+    def __init__(self):
+        self._backend = None
+        self._stats = {
+            model.__tablename__: {"hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+            for model in CACHED_MODELS
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return settings.REFERENCE_CACHE_TTL_SECONDS > 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = make_backend()
+        return self._backend
+
+    async def get_values_many(self, db: AsyncSession, model, ids: Iterable[int]) -> Dict[int, dict]:
+        """Column values of the existing rows among ids; misses are read with one IN query and stored"""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+        stats = self._stats[model.__tablename__]
+        found: Dict[int, dict] = {}
+        if self.enabled:
+            try:
+                cached = await self.backend.get_many([_key(model, row_id) for row_id in ids])
+            except Exception:
+                stats["errors"] += 1
+                cached = {}
+            for row_id in ids:
+                values = cached.get(_key(model, row_id))
+                if values is not None:
+                    found[row_id] = _revive(model, values)
+            stats["hits"] += len(found)
+            stats["misses"] += len(ids) - len(found)
+        missing = [row_id for row_id in ids if row_id not in found]
+        if missing:
+            columns = model.__table__.columns
+            rows = (await db.execute(select(*columns).filter(model.id.in_(missing)))).mappings().all()
+            loaded = {row["id"]: dict(row) for row in rows}
+            found.update(loaded)
+            if self.enabled and loaded:
+                try:
+                    await self.backend.set_many(
+                        {_key(model, row_id): values for row_id, values in loaded.items()},
+                        settings.REFERENCE_CACHE_TTL_SECONDS
+                    )
+                except Exception:
+                    stats["errors"] += 1
+        return found
+
+    async def get_many(self, db: AsyncSession, model, ids: Iterable[int]) -> Dict[int, Any]:
+        """Detached model instances keyed by id (absent ids are left out)"""
+        return {row_id: model(**values) for row_id, values in (await self.get_values_many(db, model, ids)).items()}
+
+    async def get_values(self, db: AsyncSession, model, row_id: int, version: Optional[datetime] = None) -> Optional[dict]:
+        """
+        version: the row's current updated_at/created_at when the caller already read it
+        (ETag check); a cached copy from before another worker's update is then refreshed
+        """
+        values = (await self.get_values_many(db, model, [row_id])).get(row_id)
+        if values is not None and version is not None and (values.get("updated_at") or values.get("created_at")) != version:
+            await self.invalidate(model, row_id)
+            values = (await self.get_values_many(db, model, [row_id])).get(row_id)
+        return values
+
+    async def get_fields(self, db: AsyncSession, model, row_id: int, fields: Optional[List[str]] = None,
+                         version: Optional[datetime] = None) -> Optional[dict]:
+        """Detail-endpoint read honouring ?fields="""
+        values = await self.get_values(db, model, row_id, version)
+        if values is None or not fields:
+            return values
+        return {name: values[name] for name in column_names(model, fields)}
+
+    async def get(self, db: AsyncSession, model, row_id: int):
+        return (await self.get_many(db, model, [row_id])).get(row_id)
+
+    async def invalidate(self, model, *ids: int) -> None:
+        """Drop rows after they changed (PUT/DELETE, propagation)"""
+        if not ids or not self.enabled:
+            return
+        stats = self._stats[model.__tablename__]
+        stats["invalidations"] += len(ids)
+        try:
+            await self.backend.delete_many([_key(model, row_id) for row_id in ids])
+        except Exception:
+            stats["errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        tables = {}
+        for table, counters in self._stats.items():
+            lookups = counters["hits"] + counters["misses"]
+            tables[table] = {**counters, "hit_ratio": round(counters["hits"] / lookups, 3) if lookups else None}
+        return {
+            "backend": settings.REFERENCE_CACHE_BACKEND,
+            "ttl_seconds": settings.REFERENCE_CACHE_TTL_SECONDS,
+            "size": self._backend.size() if self._backend is not None else 0,
+            "tables": tables,
+        }
+
+
+reference_cache = ReferenceCache()
@@ -0,0 +1,181 @@
+"""
+Report cards - per-student totals, grades and ranks for an exam or a CCE term
+All marks of the exam(s) are read with one streaming query (only the columns
+needed), summed per student, and graded/ranked column-wise like utils/grading:
+
+    cards = await generate_report_cards(db, exams)
+
+CCE sets (see CCE_MARKS_SYSTEM.md) add up raw marks across their exams, e.g.
+term1 = FA1 (20) + FA2 (20) + SA1 (80) per subject, and the percentage is total
+obtained / total max. An absent subject counts as 0 out of its max marks.
+
+Ranks are standard competition ranks ("1, 2, 2, 4") by percentage, highest
+first: class_rank across all sections of a class name in the school,
+section_rank within the student's own class (class_id). With write_back the
+students' current_percentage, current_grade and current_rank (= section rank)
+are updated in batched executemany UPDATEs.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from models_denormalized import Mark, Student
+from utils.grading import compute_results, pass_percentage
+
+CCE_SETS = {
+    "term1": ("FA1", "FA2", "SA1"),
+    "term2": ("FA3", "FA4", "SA2"),
+    "annual": ("FA1", "FA2", "SA1", "FA3", "FA4", "SA2"),
+}
+
+REPORT_CARD_BATCH_SIZE = 5000  # marks rows per streamed partition
+WRITE_BACK_BATCH_SIZE = 1000   # students per executemany UPDATE
+
+
+def exam_label(exam) -> str:
+    return exam.exam_code or exam.exam_name
+
+
+def rank_within(groups: Sequence[Any], scores: Sequence[Optional[float]]) -> List[Optional[int]]:
+    """Competition rank of each score inside its group, highest first; None scores are not ranked"""
+    ranks: List[Optional[int]] = [None] * len(scores)
+    order = sorted((i for i, score in enumerate(scores) if score is not None), key=lambda i: (groups[i], -scores[i]))
+    group, previous, position, rank = None, None, 0, 0
+    for i in order:
+        if position == 0 or groups[i] != group:
+            group, previous, position = groups[i], None, 0
+        position += 1
+        if scores[i] != previous:
+            rank, previous = position, scores[i]
+        ranks[i] = rank
+    return ranks
+
+
+async def generate_report_cards(
+    db: AsyncSession,
+    exams: Sequence[Any],
+    class_id: Optional[int] = None,
+    include_subjects: bool = False,
+    write_back: bool = True
+) -> Dict[str, Any]:
+    """
+    Report cards for every student with marks in exams, or only for one class_id; the caller commits
+    With class_id, every section of that class name is still loaded so class_rank stays
+    a rank across sections; only the requested section is returned and written back.
+    """
+    labels = {exam.id: exam_label(exam) for exam in exams}
+    if all(exam.max_marks and exam.min_pass_marks is not None for exam in exams):
+        pass_mark = pass_percentage(sum(exam.max_marks for exam in exams), sum(exam.min_pass_marks for exam in exams))
+    else:
+        pass_mark = pass_percentage(None, None)
+
+    statement = (
+        select(
+            Mark.student_id, Mark.student_name, Mark.roll_no, Mark.school_id, Mark.class_id,
+            Mark.class_name, Mark.section, Mark.exam_id, Mark.subject_name,
+            Mark.total_marks_obtained, Mark.max_marks, Mark.is_absent
+        )
+        .filter(Mark.exam_id.in_(list(labels)))
+        .execution_options(yield_per=REPORT_CARD_BATCH_SIZE)
+    )
+    if class_id:
+        section = (await db.execute(
+            select(Mark.school_id, Mark.class_name)
+            .filter(Mark.exam_id.in_(list(labels)), Mark.class_id == class_id)
+            .limit(1)
+        )).first()
+        if section is None or section.class_name is None:
+            statement = statement.filter(Mark.class_id == class_id)
+        else:
+            statement = statement.filter(
+                Mark.class_name == section.class_name,
+                Mark.school_id == section.school_id if section.school_id is not None else Mark.school_id.is_(None)
+            )
+
+    # Parallel per-student columns, positions assigned in arrival order
+    position: Dict[int, int] = {}
+    students: List[Any] = []
+    obtained: List[float] = []
+    maximum: List[float] = []
+    sat: List[bool] = []
+    subjects: List[Dict[str, dict]] = []
+
+    result = await db.stream(statement)
+    async for rows in result.partitions():
+        for row in rows:
+            i = position.get(row.student_id)
+            if i is None:
+                i = position[row.student_id] = len(students)
+                students.append(row)
+                obtained.append(0.0)
+                maximum.append(0.0)
+                sat.append(False)
+                subjects.append({})
+            score = None if row.is_absent else row.total_marks_obtained
+            if score is not None:
+                obtained[i] += score
+                sat[i] = True
+            maximum[i] += row.max_marks or 0
+            if include_subjects:
+                subject = subjects[i].setdefault(row.subject_name, {"exams": {}, "obtained": 0.0, "max_marks": 0.0})
+                subject["exams"][labels[row.exam_id]] = score
+                subject["obtained"] += score or 0
+                subject["max_marks"] += row.max_marks or 0
+
+    # A student absent from every paper gets no percentage, grade or rank
+    results = compute_results(
+        [total if taken else None for total, taken in zip(obtained, sat)],
+        maximum,
+        pass_mark
+    )
+    percentages = results["percentage"]
+    class_ranks = rank_within([(s.school_id or 0, s.class_name or "") for s in students], percentages)
+    section_ranks = rank_within([s.class_id or 0 for s in students], percentages)
+    selected = [i for i, s in enumerate(students) if not class_id or s.class_id == class_id]
+
+    if write_back and selected:
+        values = [
+            {
+                "id": students[i].student_id,
+                "current_percentage": percentages[i],
+                "current_grade": results["grade"][i],
+                "current_rank": section_ranks[i],
+            }
+            for i in selected
+        ]
+        for start in range(0, len(values), WRITE_BACK_BATCH_SIZE):
+            await db.execute(update(Student), values[start:start + WRITE_BACK_BATCH_SIZE])
+
+    cards = []
+    for i in selected:
+        s = students[i]
+        card = {
+            "student_id": s.student_id,
+            "student_name": s.student_name,
+            "roll_no": s.roll_no,
+            "class_id": s.class_id,
+            "class_name": s.class_name,
+            "section": s.section,
+            "total_obtained": obtained[i],
+            "total_max_marks": maximum[i],
+            "percentage": percentages[i],
+            "grade": results["grade"][i],
+            "result": results["pass_status"][i],
+            "class_rank": class_ranks[i],
+            "section_rank": section_ranks[i],
+        }
+        if include_subjects:
+            card["subjects"] = subjects[i]
+        cards.append(card)
+    cards.sort(key=lambda card: (card["class_id"] or 0, card["section_rank"] or len(cards) + 1, card["student_id"]))
+
+    return {
+        "exams": [labels[exam.id] for exam in exams],
+        "exam_ids": [exam.id for exam in exams],
+        "pass_percentage": round(pass_mark, 2),
+        "students": len(cards),
+        "passed": sum(results["pass_status"][i] == "pass" for i in selected),
+        "failed": sum(results["pass_status"][i] == "fail" for i in selected),
+        "absent": sum(results["pass_status"][i] == "absent" for i in selected),
+        "written_back": write_back,
+        "report_cards": cards,
+    }
@@ -0,0 +1,156 @@
+"""
+Sequence allocator for per-school numbers (admission_no, roll_no, employee_id, ...)
+Numbers come from a counter row in the sequences table that is incremented
+atomically, instead of scanning existing rows for the current maximum.
+
+- MySQL: UPDATE sequences SET value = LAST_INSERT_ID(value + n) - one statement,
+  the new value is read back from the connection without another row read
+- Other databases: SELECT ... FOR UPDATE, then increment
+
+With SEQUENCE_BLOCK_SIZE > 1 each worker reserves a block of numbers in a short
+transaction of its own and hands them out from memory, so concurrent admissions
+or bulk imports do not queue on the counter row lock. Numbers left in a block
+when the worker stops are skipped (gaps), never reused.
+"""
+import asyncio
+import re
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from config import settings
+from database import AsyncSessionLocal
+from models_denormalized import Sequence
+
+SeedFunction = Callable[[], Awaitable[int]]
+
+# (school_id, name) -> [next number to hand out, last number reserved]
+_blocks: Dict[Tuple[int, str], List[int]] = {}
+_block_locks: Dict[Tuple[int, str], asyncio.Lock] = {}
+
+
+async def max_numeric_suffix(db: AsyncSession, column, prefix: str, *filters, max_digits: int = 6) -> int:
+    """
+    Largest number following prefix in existing values - seeds a new sequence once
+    Suffixes longer than max_digits are ignored: the old admission_no generator
+    produced values like 202620260002 by re-reading the year as part of the number.
+    """
+    query = select(column).filter(column != None, column.startswith(prefix, autoescape=True), *filters)
+    pattern = re.compile(r"\d{1,%d}" % max_digits)
+
+    max_num = 0
+    for value in (await db.execute(query)).scalars().all():
+        suffix = value[len(prefix):]
+        if pattern.fullmatch(suffix):
+            max_num = max(max_num, int(suffix))
+    return max_num
+
+
+async def _create_sequence(db: AsyncSession, school_key: int, name: str, seed: Optional[SeedFunction]) -> None:
+    """Insert the counter row; losing a creation race to another request is fine"""
+    start = await seed() if seed else 0
+    try:
+        async with db.begin_nested():
+            db.add(Sequence(school_id=school_key, name=name, value=start))
+    except IntegrityError:
+        pass
+
+
+async def _increment_mysql(db: AsyncSession, school_key: int, name: str, count: int) -> Optional[int]:
+    result = await db.execute(
+        update(Sequence)
+        .filter(Sequence.school_id == school_key, Sequence.name == name)
+        .values(value=func.last_insert_id(Sequence.value + count))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return None
+    return await db.scalar(select(func.last_insert_id()))
+
+
+async def _increment_locked(db: AsyncSession, school_key: int, name: str, count: int) -> Optional[int]:
+    sequence = await db.scalar(
+        select(Sequence)
+        .filter(Sequence.school_id == school_key, Sequence.name == name)
+        .with_for_update()
+        # Re-read the locked row even if this session already holds a copy of it
+        .execution_options(populate_existing=True)
+    )
+    if sequence is None:
+        return None
+    sequence.value += count
+    await db.flush()
+    return sequence.value
+
+
+async def reserve(
+    db: AsyncSession,
+    name: str,
+    school_id: Optional[int] = None,
+    count: int = 1,
+    seed: Optional[SeedFunction] = None
+) -> int:
+    """
+    Atomically advance a sequence by count inside the caller's transaction
+    Returns the last number of the reserved range (first = last - count + 1).
+    seed() is awaited once, when the row does not exist yet, to continue
+    numbering from data created before the sequence existed.
+    """
+    school_key = school_id or 0
+    increment = _increment_mysql if db.bind.dialect.name == "mysql" else _increment_locked
+
+    last = await increment(db, school_key, name, count)
+    if last is None:
+        await _create_sequence(db, school_key, name, seed)
+        last = await increment(db, school_key, name, count)
+    return last
+
+
+async def _reserve_block(name: str, school_id: Optional[int], size: int, seed: Optional[SeedFunction]) -> int:
+    """Reserve a block in a separate, immediately committed transaction"""
+    async with AsyncSessionLocal() as block_db:
+        last = await reserve(block_db, name, school_id, size, seed)
+        await block_db.commit()
+    return last
+
+
+async def next_value(
+    db: AsyncSession,
+    name: str,
+    school_id: Optional[int] = None,
+    seed: Optional[SeedFunction] = None,
+    block_size: Optional[int] = None
+) -> int:
+    """
+    Allocate the next number of a sequence
+    block_size (default SEQUENCE_BLOCK_SIZE) > 1 serves numbers from a
+    per-worker block; 1 increments the counter row in the caller's transaction.
+    """
+    block_size = block_size or settings.SEQUENCE_BLOCK_SIZE
+    if block_size <= 1:
+        return await reserve(db, name, school_id, 1, seed)
+
+    key = (school_id or 0, name)
+    lock = _block_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        block = _blocks.get(key)
+        if block is None or block[0] > block[1]:
+            last = await _reserve_block(name, school_id, block_size, seed)
+            block = _blocks[key] = [last - block_size + 1, last]
+        value = block[0]
+        block[0] += 1
+    return value
+
+
+async def next_values(
+    db: AsyncSession,
+    name: str,
+    count: int,
+    school_id: Optional[int] = None,
+    seed: Optional[SeedFunction] = None
+) -> List[int]:
+    """Allocate count consecutive numbers with a single counter update (bulk inserts)"""
+    if count <= 0:
+        return []
+    last = await reserve(db, name, school_id, count, seed)
+    return list(range(last - count + 1, last + 1))
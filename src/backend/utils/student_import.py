@@ -0,0 +1,148 @@
+"""
+CSV parsing and row validation for the bulk student import
+Accepts the frontend template headers (firstName, admissionNo, dob, ...) as well
+as Student column names. Rows are read lazily and handed out in chunks.
+"""
+import codecs
+import csv
+from datetime import date, datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from models_denormalized import Student
+
+# Template header (normalized) -> Student column
+HEADER_ALIASES = {
+    "firstname": "first_name",
+    "lastname": "last_name",
+    "admissionno": "admission_no",
+    "rollno": "roll_no",
+    "class": "class_name",
+    "dob": "date_of_birth",
+    "zipcode": "pincode",
+}
+
+# Filled in by the import itself, never taken from the file
+PROTECTED_COLUMNS = {
+    "id", "user_id", "school_id", "school_code", "school_name", "school_address", "school_city",
+    "school_state", "school_phone", "school_email", "created_at", "created_by", "updated_at",
+    "admission_date", "full_name", "age", "class_section",
+}
+
+REQUIRED_COLUMNS = ("first_name",)
+GENDERS = {"male": "Male", "female": "Female", "other": "Other"}
+STATUSES = {"active", "inactive", "suspended", "passed_out", "transferred"}
+TRUE_VALUES = {"true", "yes", "y", "1"}
+FALSE_VALUES = {"false", "no", "n", "0"}
+
+
+def _normalize_header(header: str) -> str:
+    return "".join(ch for ch in header.strip().lower() if ch.isalnum())
+
+
+def map_headers(headers: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Map CSV headers to Student columns
+    Returns ({csv_header: column}, [ignored headers])
+    """
+    columns = {_normalize_header(column.key): column.key for column in Student.__table__.columns}
+    mapping, ignored = {}, []
+    for header in headers:
+        normalized = _normalize_header(header or "")
+        column = HEADER_ALIASES.get(normalized) or columns.get(normalized)
+        if column and column not in PROTECTED_COLUMNS:
+            mapping[header] = column
+        else:
+            ignored.append(header)
+    return mapping, ignored
+
+
+def iter_csv_chunks(stream: BinaryIO, chunk_size: int) -> Iterator[Tuple[List[str], List[Tuple[int, Dict[str, str]]]]]:
+    """
+    Decode and parse an uploaded file lazily
+    Yields (headers, [(line_number, row), ...]) chunks of at most chunk_size rows.
+    """
+    text = codecs.getreader("utf-8-sig")(stream, errors="replace")
+    reader = csv.DictReader(text)
+    headers = reader.fieldnames or []
+    chunk = []
+    for row in reader:
+        if not any((value or "").strip() for value in row.values() if isinstance(value, str)):
+            continue  # blank line
+        chunk.append((reader.line_num, row))
+        if len(chunk) >= chunk_size:
+            yield headers, chunk
+            chunk = []
+    if chunk:
+        yield headers, chunk
+
+
+def _convert(column_name: str, value: str):
+    """Convert one cell to the Python type of its column, raising ValueError with a message"""
+    column = Student.__table__.columns[column_name]
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is date:
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError(f"{column_name}: '{value}' is not a YYYY-MM-DD date")
+    if python_type is bool:
+        lowered = value.lower()
+        if lowered in TRUE_VALUES:
+            return True
+        if lowered in FALSE_VALUES:
+            return False
+        raise ValueError(f"{column_name}: '{value}' is not true/false")
+    if python_type in (int, float):
+        try:
+            return python_type(value)
+        except ValueError:
+            raise ValueError(f"{column_name}: '{value}' is not a number")
+    if python_type is str and getattr(column.type, "length", None) and len(value) > column.type.length:
+        raise ValueError(f"{column_name}: longer than {column.type.length} characters")
+    return value
+
+
+def validate_row(row: Dict[str, str], mapping: Dict[str, str]) -> Tuple[dict, List[str]]:
+    """Turn one CSV row into Student column values; returns (data, errors)"""
+    data, errors = {}, []
+    if row.get(None):
+        errors.append("row has more values than the header")
+    for header, column_name in mapping.items():
+        value = (row.get(header) or "").strip()
+        if not value:
+            continue
+        try:
+            data[column_name] = _convert(column_name, value)
+        except ValueError as e:
+            errors.append(str(e))
+
+    for column_name in REQUIRED_COLUMNS:
+        if not data.get(column_name):
+            errors.append(f"{column_name} is required")
+
+    if "gender" in data:
+        gender = GENDERS.get(data["gender"].lower())
+        if gender:
+            data["gender"] = gender
+        else:
+            errors.append(f"gender: '{data['gender']}' must be Male, Female or Other")
+
+    if "status" in data:
+        status = data["status"].lower()
+        if status in STATUSES:
+            data["status"] = status
+            data["is_active"] = status == "active"
+        else:
+            errors.append(f"status: '{data['status']}' is not a valid status")
+
+    if "email" in data and "@" not in data["email"]:
+        errors.append(f"email: '{data['email']}' is not an email address")
+
+    return data, errors
+
+
+def class_key(class_name: Optional[str], section: Optional[str]) -> Tuple[str, str]:
+    """Case-insensitive lookup key for a class by name and section"""
+    return (class_name or "").strip().lower(), (section or "").strip().lower()
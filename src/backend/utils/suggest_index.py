@@ -0,0 +1,258 @@
+"""
+In-memory type-ahead index for students and teachers
+One index per (entity, school), built lazily on the first /suggest call and
+kept current by the create/update/delete handlers of this worker. Other
+workers' changes are picked up by a periodic rebuild (SUGGEST_INDEX_TTL_SECONDS).
+
+Lookups never touch the database:
+- words shorter than 3 characters match word prefixes (prefix map)
+- longer words match anywhere (trigram postings, then a substring check)
+"""
+import asyncio
+import bisect
+import re
+import time
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from config import settings
+from models_denormalized import Student, Teacher
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+PREFIX_LENGTH = 2  # prefixes kept in the prefix map; longer words go through trigrams
+
+
+def _words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def _trigrams(word: str) -> Set[str]:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class SchoolIndex:
+    """Prefix and trigram postings for one school's records, plus a name-sorted order for ranking"""
+
+    def __init__(self, fields: Tuple[str, ...]):
+        self.fields = fields
+        self.records: Dict[int, dict] = {}
+        self.texts: Dict[int, str] = {}  # " word word ..." - substring and word-prefix checks
+        self.names: Dict[int, str] = {}
+        self.order: List[Tuple[str, int]] = []  # (lowercased full_name, id), kept sorted
+        self.prefixes: Dict[str, Set[int]] = {}
+        self.trigrams: Dict[str, Set[int]] = {}
+        self.built_at = time.monotonic()
+
+    @staticmethod
+    def _keys(words: Iterable[str]) -> Tuple[Set[str], Set[str]]:
+        prefixes, trigrams = set(), set()
+        for word in words:
+            for length in range(1, min(PREFIX_LENGTH, len(word)) + 1):
+                prefixes.add(word[:length])
+            trigrams |= _trigrams(word)
+        return prefixes, trigrams
+
+    def add(self, record: dict, keep_sorted: bool = True) -> None:
+        """Index one record - bulk loads pass keep_sorted=False and call order.sort() once"""
+        record_id = record["id"]
+        if record_id in self.records:
+            self.remove(record_id)
+        words = _words(" ".join(str(record[field]) for field in self.fields if record.get(field)))
+        self.records[record_id] = record
+        self.texts[record_id] = " " + " ".join(words)
+        self.names[record_id] = (record.get("full_name") or "").lower()
+        if keep_sorted:
+            bisect.insort(self.order, (self.names[record_id], record_id))
+        else:
+            self.order.append((self.names[record_id], record_id))
+        prefixes, trigrams = self._keys(words)
+        for key in prefixes:
+            self.prefixes.setdefault(key, set()).add(record_id)
+        for key in trigrams:
+            self.trigrams.setdefault(key, set()).add(record_id)
+
+    def remove(self, record_id: int) -> None:
+        if self.records.pop(record_id, None) is None:
+            return
+        entry = (self.names.pop(record_id), record_id)
+        position = bisect.bisect_left(self.order, entry)
+        if position < len(self.order) and self.order[position] == entry:
+            del self.order[position]
+        prefixes, trigrams = self._keys(self.texts.pop(record_id).split())
+        for key in prefixes:
+            postings = self.prefixes.get(key)
+            if postings:
+                postings.discard(record_id)
+        for key in trigrams:
+            postings = self.trigrams.get(key)
+            if postings:
+                postings.discard(record_id)
+
+    def _candidates(self, word: str) -> Set[int]:
+        """Records that may contain word - trigram hits still need a substring check for longer words"""
+        if len(word) <= PREFIX_LENGTH:
+            return self.prefixes.get(word, set())
+        postings = [self.trigrams.get(gram, set()) for gram in _trigrams(word)]
+        return min(postings, key=len)
+
+    def _take(self, postings: List[Set[int]], accept, limit: int, exclude: Set[int]) -> List[int]:
+        """
+        Up to limit records present in every postings set and passing accept, in name order
+        Small pools are filtered and sorted; large ones are walked in name order,
+        which stops after a few steps because matches are dense. When even the
+        smallest set covers most of the school the intersection is skipped.
+        """
+        pool, *others = sorted(postings, key=len)
+        if len(pool) * 2 <= len(self.order):
+            pool, others = pool.intersection(*others), []
+
+        def wanted(record_id: int) -> bool:
+            return record_id not in exclude and all(record_id in other for other in others) and accept(record_id)
+
+        if len(pool) * 8 < len(self.order):
+            found = [record_id for record_id in pool if wanted(record_id)]
+            found.sort(key=lambda record_id: (self.names[record_id], record_id))
+            return found[:limit]
+        found = []
+        for _, record_id in self.order:
+            if record_id in pool and wanted(record_id):
+                found.append(record_id)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def search(self, query: str, limit: int) -> List[dict]:
+        """
+        Records matching every word of query, best first:
+        full_name starts with the query, then every word matches a word prefix,
+        then substring matches - alphabetical within each group.
+        Each group stops as soon as it has enough records, so the cost follows
+        the records returned rather than the size of the match set.
+        """
+        words = _words(query)
+        if not words:
+            return []
+        candidates = [self._candidates(word) for word in words]
+        if not all(candidates):
+            return []
+        verify = [word for word in words if len(word) > PREFIX_LENGTH]
+
+        def contains_words(record_id: int) -> bool:
+            text = self.texts[record_id]
+            return all(word in text for word in verify)
+
+        starts = [" " + word for word in verify]
+
+        def word_prefixes(record_id: int) -> bool:
+            text = self.texts[record_id]
+            return all(start in text for start in starts)
+
+        # Names starting with the query are a contiguous run of the sorted order
+        name_prefix = " ".join(words)
+        results: List[int] = []
+        position = bisect.bisect_left(self.order, (name_prefix, -1))
+        while position < len(self.order) and len(results) < limit:
+            name, record_id = self.order[position]
+            if not name.startswith(name_prefix):
+                break
+            if all(record_id in postings for postings in candidates) and contains_words(record_id):
+                results.append(record_id)
+            position += 1
+
+        if len(results) < limit:
+            # Every word must also start a word of the record
+            leading = [self.prefixes.get(word[:PREFIX_LENGTH], set()) for word in words]
+            results += self._take(candidates + leading, word_prefixes, limit - len(results), set(results))
+        if len(results) < limit:
+            results += self._take(candidates, contains_words, limit - len(results), set(results))
+        return [self.records[record_id] for record_id in results]
+
+
+class SuggestIndex:
+    """Per-school indexes of one entity (students or teachers)"""
+
+    def __init__(self, model, fields: Tuple[str, ...]):
+        self.model = model
+        self.fields = fields
+        self._schools: Dict[int, SchoolIndex] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._record_schools: Dict[int, int] = {}  # record id -> school index holding it
+
+    @staticmethod
+    def _value(source, key: str, default=None):
+        if isinstance(source, dict):
+            return source.get(key, default)
+        return getattr(source, key, default)
+
+    async def _build(self, db: AsyncSession, school_id: Optional[int]) -> SchoolIndex:
+        columns = [self.model.id] + [getattr(self.model, field) for field in self.fields]
+        query = select(*columns).filter(or_(self.model.is_active == True, self.model.is_active.is_(None)))
+        if school_id:
+            query = query.filter(self.model.school_id == school_id)
+        index = SchoolIndex(self.fields)
+        for row in (await db.execute(query)).all():
+            index.add(row._asdict(), keep_sorted=False)
+            if school_id:
+                self._record_schools[row.id] = school_id
+        index.order.sort()
+        return index
+
+    async def get(self, db: AsyncSession, school_id: Optional[int]) -> SchoolIndex:
+        """Index for a school, built on first use and rebuilt after the TTL"""
+        key = school_id or 0
+        index = self._schools.get(key)
+        if index is not None and time.monotonic() - index.built_at < settings.SUGGEST_INDEX_TTL_SECONDS:
+            return index
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            index = self._schools.get(key)
+            if index is None or time.monotonic() - index.built_at >= settings.SUGGEST_INDEX_TTL_SECONDS:
+                index = self._schools[key] = await self._build(db, school_id)
+        return index
+
+    def _targets(self, school_id: Optional[int]) -> Iterable[SchoolIndex]:
+        # The school's own index plus the all-schools index (key 0) if either is built
+        for key in {school_id or 0, 0}:
+            index = self._schools.get(key)
+            if index is not None:
+                yield index
+
+    def upsert(self, source) -> None:
+        """
+        Add or refresh a record after create/update (no-op for schools not loaded yet)
+        A record that moved school is dropped from its previous school's index.
+        """
+        record = {key: self._value(source, key) for key in ("id",) + self.fields}
+        active = self._value(source, "is_active", True)
+        school_id = self._value(source, "school_id")
+        previous = self._record_schools.get(record["id"])
+        if previous is not None and previous != school_id:
+            # Moved to another school - drop it from the old school's index
+            old_index = self._schools.get(previous)
+            if old_index is not None:
+                old_index.remove(record["id"])
+            del self._record_schools[record["id"]]
+        if school_id and active is not False:
+            self._record_schools[record["id"]] = school_id
+        for index in self._targets(school_id):
+            if active is False:
+                index.remove(record["id"])
+            else:
+                index.add(record)
+
+    def remove(self, record_id: int, school_id: Optional[int]) -> None:
+        self._record_schools.pop(record_id, None)
+        for index in self._targets(school_id):
+            index.remove(record_id)
+
+    def invalidate(self, school_id: Optional[int] = None) -> None:
+        """Force a rebuild on next use (bulk changes)"""
+        if school_id is None:
+            self._schools.clear()
+        else:
+            self._schools.pop(school_id, None)
+            self._schools.pop(0, None)
+
+
+student_suggestions = SuggestIndex(Student, ("full_name", "admission_no", "roll_no", "phone", "email"))
+teacher_suggestions = SuggestIndex(Teacher, ("full_name", "employee_id", "phone", "email"))
@@ -0,0 +1,81 @@
+"""
+Short-TTL in-process cache of authenticated users
+get_current_user runs on every authenticated request; caching the user row
+for a few seconds saves a users-table round trip (and a pooled connection) per request.
+
+Entries are plain column values, and every hit returns a new detached User,
+so one request can never see another request's in-memory changes.
+Handlers that change a user call invalidate(); other workers' copies expire
+after USER_CACHE_TTL_SECONDS.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import settings
+from models_denormalized import User
+
+_COLUMNS = tuple(column.key for column in User.__table__.columns)
+
+_entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+_usernames_by_id: Dict[int, str] = {}
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def enabled() -> bool:
+    return settings.USER_CACHE_TTL_SECONDS > 0
+
+
+def get(username: str) -> Optional[User]:
+    """Cached user for username, or None when absent or expired"""
+    if not enabled():
+        return None
+    with _lock:
+        entry = _entries.get(username)
+        if entry is None or entry[0] < time.monotonic():
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(username)
+        _stats["hits"] += 1
+        values = entry[1]
+    return User(**values)
+
+
+def put(user: User) -> None:
+    """Store a snapshot of a freshly loaded user"""
+    if not enabled():
+        return
+    values = {key: getattr(user, key) for key in _COLUMNS}
+    with _lock:
+        _entries[user.username] = (time.monotonic() + settings.USER_CACHE_TTL_SECONDS, values)
+        _entries.move_to_end(user.username)
+        _usernames_by_id[user.id] = user.username
+        while len(_entries) > settings.USER_CACHE_MAX_ENTRIES:
+            _, (_, evicted) = _entries.popitem(last=False)
+            _usernames_by_id.pop(evicted["id"], None)
+
+
+def invalidate(username: Optional[str] = None, user_id: Optional[int] = None) -> None:
+    """Drop a user by username and/or id (covers renamed users)"""
+    with _lock:
+        if user_id is not None:
+            old_username = _usernames_by_id.pop(user_id, None)
+            if old_username:
+                _entries.pop(old_username, None)
+        if username is not None:
+            entry = _entries.pop(username, None)
+            if entry:
+                _usernames_by_id.pop(entry[1]["id"], None)
+        _stats["invalidations"] += 1
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+        _usernames_by_id.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "size": len(_entries), "ttl_seconds": settings.USER_CACHE_TTL_SECONDS}